@@ -0,0 +1,210 @@
+import asyncio
+import aiohttp
+from bs4 import BeautifulSoup
+from cloudscraper import CloudScraper
+
+# Local packages
+from . import parsers
+from .metrics import metrics
+from .fetcher import FetchError
+from .helpers import (
+    filter_new_videos,
+    parse_video_cards,
+    parse_video_page,
+)
+
+# -------------------------------------
+# Asyncio fetching helpers
+# -------------------------------------
+
+# Status codes Cloudflare answers with when the clearance is missing
+CHALLENGE_STATUS = (403, 429, 503)
+
+
+class AsyncScraper:
+    def __init__(self, scraper: CloudScraper, per_host: int) -> None:
+        """Asyncio http engine sharing the cloudscraper challenge session
+
+        Requests are sent with the headers and cookies of the blocking
+        scraper, so the Cloudflare clearance it solved stays valid. When a
+        request gets challenged, the blocking scraper solves it again and
+        the fresh cookies are copied over.
+
+        Args:
+            scraper (CloudScraper): Scraper engine holding the clearance
+            per_host (int): Maximum number of open connections per host
+        """
+        self.scraper = scraper
+        self.per_host = max(1, per_host)
+        self.session: aiohttp.ClientSession = None
+        self._solving: asyncio.Lock = None
+    # <-- End of __init__()
+
+    async def __aenter__(self) -> "AsyncScraper":
+        connector = aiohttp.TCPConnector(limit_per_host=self.per_host)
+        self.session = aiohttp.ClientSession(
+            headers=dict(self.scraper.headers), connector=connector
+        )
+        self._solving = asyncio.Lock()
+        self._copy_cookies()
+        return self
+    # <-- End of __aenter__()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.session.close()
+        self.session = None
+    # <-- End of __aexit__()
+
+    def _copy_cookies(self) -> None:
+        """Copy cookies of the blocking scraper to the asyncio session"""
+        self.session.cookie_jar.update_cookies(
+            {cookie.name: cookie.value for cookie in self.scraper.cookies}
+        )
+    # <-- End of _copy_cookies()
+
+    async def solve(self, url: str) -> bytes:
+        """Let the blocking scraper solve the challenge for given url
+
+        Args:
+            url (str): Challenged url
+
+        Raises:
+            FetchError: When the page still is not served
+
+        Returns:
+            bytes: Webpage content fetched by the blocking scraper
+        """
+        # Only one blocking request at a time, others wait for its cookies
+        async with self._solving:
+            response = await asyncio.to_thread(self.scraper.get, url)
+            self._copy_cookies()
+        if not 200 <= response.status_code < 300:
+            raise FetchError(url, f"status {response.status_code}")
+        return response.content
+    # <-- End of solve()
+
+    async def get(self, url: str) -> bytes:
+        """Fetch a webpage
+
+        Args:
+            url (str): Url to fetch
+
+        Raises:
+            FetchError: When the page is answered with an error status,
+            error pages never reach the parsers
+
+        Returns:
+            bytes: Webpage content
+        """
+        with metrics.timer("http_request"):
+            async with self.session.get(url) as response:
+                status = response.status
+                if status not in CHALLENGE_STATUS:
+                    content = await response.read()
+
+            metrics.add("http_requests", status=status)
+            if status in CHALLENGE_STATUS:
+                # Counted under the challenge status, solved by the blocking
+                # scraper
+                content = await self.solve(url)
+            elif not 200 <= status < 300:
+                raise FetchError(url, f"status {status}")
+
+        metrics.add("http_bytes", len(content))
+        return content
+    # <-- End of get()
+
+# <-- End of class AsyncScraper
+
+
+async def get_videos_async(
+    scraper: AsyncScraper,
+    response: BeautifulSoup,
+    model: str,
+    limit: int = 0,
+    known: set[tuple[str, str]] = None,
+) -> list[dict[str, str]]:
+    """Asyncio counterpart of helpers.get_videos
+
+    Args:
+        scraper (AsyncScraper): Asyncio scraper engine
+        response (BeautifulSoup): Webpage content of the model
+        model (str): Name of the model
+        limit (int, optional): Number of videos to scrape. Defaults to 0.
+        known (set[tuple[str, str]], optional): (id, link) of videos already
+        in database, their video pages are not fetched. Defaults to None.
+
+    Returns:
+        list[dict[str, str]]: List of videos in the order of model page
+    """
+    content = parse_video_cards(response, model, limit)
+    await fetch_video_pages_async(scraper, content, known)
+
+    return content
+# <-- End of get_videos_async()
+
+
+async def fetch_video_pages_async(
+    scraper: AsyncScraper,
+    content: list[dict],
+    known: set[tuple[str, str]] = None,
+) -> None:
+    """Asyncio counterpart of helpers.fetch_video_pages
+
+    Args:
+        scraper (AsyncScraper): Asyncio scraper engine
+        content (list[dict]): Videos parsed from model pages
+        known (set[tuple[str, str]], optional): (id, link) of videos already
+        in database, their video pages are not fetched. Defaults to None.
+    """
+    # Fetch all new video pages at once, gather keeps the order of content
+    new_videos = filter_new_videos(content, known)
+    pages = await asyncio.gather(
+        *(scraper.get(video["link"]) for video in new_videos)
+    )
+
+    for video, page in zip(new_videos, pages):
+        parse_video_page(video, page)
+# <-- End of fetch_video_pages_async()
+
+
+async def fetch_model_avatar_async(scraper: AsyncScraper, url: str) -> str:
+    """Asyncio counterpart of helpers.fetch_model_avatar
+
+    Args:
+        scraper (AsyncScraper): Asyncio scraper engine
+        url (str): Link to model webpage
+
+    Returns:
+        str: Model avatar image source
+    """
+    return parsers.parse_avatar(parsers.parse_html(await scraper.get(url)))
+# <-- End of fetch_model_avatar_async()
+
+
+async def fetch_model_async(
+    scraper: AsyncScraper,
+    model: str,
+    url: str,
+    known: set[tuple[str, str]] = None,
+) -> tuple[str, list[dict]]:
+    """Fetch a model page once, then scrape its avatar and videos
+
+    Args:
+        scraper (AsyncScraper): Asyncio scraper engine
+        model (str): Name of the model
+        url (str): Link to model webpage
+        known (set[tuple[str, str]], optional): (id, link) of videos already
+        in database. Defaults to None.
+
+    Returns:
+        tuple[str, list[dict]]: Model avatar and videos of the model
+    """
+    tree = parsers.parse_html(await scraper.get(url))
+    avatar = parsers.parse_avatar(tree)
+    content = parsers.parse_cards(tree, model)
+    del tree
+
+    await fetch_video_pages_async(scraper, content, known)
+    return avatar, content
+# <-- End of fetch_model_async()
@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlsplit
+
+# Local packages
+from .fetcher import FetchError
+from .constants import (
+    cache_ttls,
+    cache_default_ttl,
+    cache_max_size,
+    cache_resize_interval,
+)
+
+# -------------------------------------
+# On-disk http response cache
+# -------------------------------------
+
+
+class CachedResponse:
+    def __init__(
+        self,
+        url: str,
+        content: bytes,
+        status_code: int = 200,
+        headers: dict = None,
+        from_cache: bool = False,
+    ) -> None:
+        """Minimal response object served by CachedSession
+
+        Args:
+            url (str): Requested url
+            content (bytes): Response body
+            status_code (int, optional): Http status code. Defaults to 200.
+            headers (dict, optional): Response headers. Defaults to None.
+            from_cache (bool, optional): True if body was read from disk.
+            Defaults to False.
+        """
+        self.url = url
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or dict()
+        self.from_cache = from_cache
+    # <-- End of __init__()
+
+# <-- End of class CachedResponse
+
+
+class CachedSession:
+    def __init__(
+        self,
+        scraper,
+        cache_dir: str,
+        max_size: int = cache_max_size,
+        ttls: dict[str, int] = cache_ttls,
+        offline: bool = False,
+    ) -> None:
+        """Wrap a scraper session with an on-disk response cache
+
+        Each url is stored as a body file and a metadata file named after
+        the url hash. Fresh entries are served from disk, stale entries are
+        revalidated with ETag / Last-Modified when the server sent them.
+        Least recently used entries are evicted once the bodies exceed
+        max_size bytes.
+
+        Args:
+            scraper (CloudScraper): Scraper engine, or any session wrapper
+            cache_dir (str): Directory holding cached responses
+            max_size (int, optional): Maximum total size of cached bodies in
+            bytes. Defaults to cache_max_size.
+            ttls (dict[str, int], optional): Seconds to live for urls whose
+            path contains the key. Defaults to cache_ttls.
+            offline (bool, optional): Serve every request from disk, no
+            matter how old. Defaults to False.
+        """
+        self.scraper = scraper
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.ttls = ttls
+        self.offline = offline
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._size = 0
+        self._sized = float("-inf")
+        self._evict()
+    # <-- End of __init__()
+
+    def ttl(self, url: str) -> int:
+        """Get seconds to live of given url
+
+        Args:
+            url (str): Requested url
+
+        Returns:
+            int: Seconds a cached response of the url stays fresh
+        """
+        path = urlsplit(url).path
+        for pattern, ttl in self.ttls.items():
+            if pattern in path:
+                return ttl
+        return cache_default_ttl
+    # <-- End of ttl()
+
+    def _paths(self, url: str) -> tuple[str, str]:
+        """Get body and metadata file paths of given url
+
+        Args:
+            url (str): Requested url
+
+        Returns:
+            tuple[str, str]: Path to body file and metadata file
+        """
+        key = hashlib.sha256(url.encode()).hexdigest()
+        path = os.path.join(self.cache_dir, key)
+        return path + ".body", path + ".json"
+    # <-- End of _paths()
+
+    def _load(self, url: str) -> tuple[dict, bytes]:
+        """Load cached metadata and body of given url
+
+        Entries evicted meanwhile, by another thread or by another process
+        sharing the directory, are misses.
+
+        Args:
+            url (str): Requested url
+
+        Returns:
+            tuple[dict, bytes]: Metadata and body, (None, None) on miss
+        """
+        body_path, meta_path = self._paths(url)
+        try:
+            with self._lock:
+                with open(meta_path, "r") as file:
+                    meta = json.load(file)
+                with open(body_path, "rb") as file:
+                    body = file.read()
+                # Touch body file, its mtime is the last access for eviction
+                os.utime(body_path)
+        except (OSError, ValueError):
+            return None, None
+
+        return meta, body
+    # <-- End of _load()
+
+    def _store(self, url: str, response) -> None:
+        """Save a response to disk and evict old entries when over size
+
+        Args:
+            url (str): Requested url
+            response (requests.Response): Response with status code 200
+        """
+        body_path, meta_path = self._paths(url)
+        meta = {
+            "url": url,
+            "stored": time.time(),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+
+        with self._lock:
+            try:
+                self._size -= os.path.getsize(body_path)
+            except OSError:
+                pass
+
+            # Write to temporary files first, a crash never leaves half
+            # written entries behind
+            for path, data, mode in (
+                (body_path, response.content, "wb"),
+                (meta_path, json.dumps(meta), "w"),
+            ):
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, mode) as file:
+                    file.write(data)
+                os.replace(tmp_path, path)
+
+            self._size += len(response.content)
+            if self._size > self.max_size or \
+                    time.monotonic() - self._sized > cache_resize_interval:
+                self._evict()
+    # <-- End of _store()
+
+    def _touch(self, url: str) -> None:
+        """Mark a revalidated entry fresh again, an entry evicted meanwhile
+        is stored again by the next miss
+
+        Args:
+            url (str): Requested url
+        """
+        _, meta_path = self._paths(url)
+        tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+        try:
+            with self._lock:
+                with open(meta_path, "r") as file:
+                    meta = json.load(file)
+
+                meta["stored"] = time.time()
+                with open(tmp_path, "w") as file:
+                    json.dump(meta, file)
+                os.replace(tmp_path, meta_path)
+        except (OSError, ValueError):
+            pass
+    # <-- End of _touch()
+
+    def _evict(self) -> None:
+        """Size the directory again, then remove least recently used
+        entries until size fits max_size"""
+        # Shard processes sharing the directory store and evict too, the
+        # running total only counts the writes of this one
+        bodies = list()
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".body"):
+                continue
+            body_path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(body_path)
+            except OSError:
+                continue
+            bodies.append((stat.st_mtime, stat.st_size, body_path))
+
+        self._size = sum(size for _, size, _ in bodies)
+        self._sized = time.monotonic()
+        if self._size <= self.max_size:
+            return
+        bodies.sort()
+
+        for _, size, body_path in bodies:
+            if self._size <= self.max_size:
+                break
+
+            self._size -= size
+            meta_path = body_path[: -len(".body")] + ".json"
+            for path in (body_path, meta_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+    # <-- End of _evict()
+
+    def get(self, url: str, **kwargs) -> CachedResponse:
+        """Get a response from disk, or from network when missing or stale
+
+        Args:
+            url (str): Url to fetch
+
+        Raises:
+            FetchError: When offline and url is not cached, only the model
+            of the url is skipped
+
+        Returns:
+            CachedResponse: Response of the url
+        """
+        meta, body = self._load(url)
+
+        if self.offline:
+            if meta is None:
+                raise FetchError(url, "not cached")
+            return CachedResponse(url, body, from_cache=True)
+
+        if meta is not None and time.time() - meta["stored"] < self.ttl(url):
+            return CachedResponse(url, body, from_cache=True)
+
+        # Revalidate stale entry when the server supports it
+        headers = dict(kwargs.pop("headers", None) or dict())
+        if meta is not None:
+            if meta["etag"]:
+                headers["If-None-Match"] = meta["etag"]
+            if meta["last_modified"]:
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = self.scraper.get(url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and meta is not None:
+            self._touch(url)
+            return CachedResponse(url, body, from_cache=True)
+
+        if response.status_code == 200:
+            self._store(url, response)
+
+        return CachedResponse(
+            url, response.content, response.status_code, response.headers
+        )
+    # <-- End of get()
+
+# <-- End of class CachedSession
@@ -0,0 +1,131 @@
+import sys
+import random
+
+# Local packages
+from .metrics import metrics
+
+# -------------------------------------
+# Read optimized video catalog
+# -------------------------------------
+
+
+class Video:
+    """Compact read only copy of a saved video, see schema.py for fields"""
+
+    __slots__ = (
+        "id",
+        "name",
+        "model",
+        "image",
+        "link",
+        "views",
+        "likes",
+        "tags",
+        "uploaded",
+        "subtitle",
+    )
+
+    def __init__(self, doc: dict) -> None:
+        self.id = doc["id"]
+        self.name = doc["name"]
+        # Model names and tags repeat across the catalog, share one copy
+        self.model = sys.intern(doc["model"])
+        self.image = doc.get("image")
+        self.link = doc["link"]
+        self.views = doc.get("views", 0)
+        self.likes = doc.get("likes", 0)
+        self.tags = tuple(sys.intern(tag) for tag in doc.get("tags", ()))
+        self.uploaded = doc.get("uploaded", 0)
+        self.subtitle = doc.get("subtitle", False)
+    # <-- End of __init__()
+
+    def __getitem__(self, field: str):
+        # Templates read videos like the documents they come from
+        return getattr(self, field)
+    # <-- End of __getitem__()
+
+    def to_dict(self) -> dict:
+        """Copy the video into a plain dict
+
+        Returns:
+            dict: Video fields
+        """
+        return {field: getattr(self, field) for field in self.__slots__}
+    # <-- End of to_dict()
+
+# <-- End of class Video
+
+
+class Catalog:
+    def __init__(self, docs) -> None:
+        """Videos grouped by model, built once and queried many times
+
+        Args:
+            docs (Iterable[dict]): Saved videos, in database order
+        """
+        self.videos: list[Video] = [Video(doc) for doc in docs]
+        self.by_model: dict[str, list[Video]] = dict()
+
+        for video in self.videos:
+            self.by_model.setdefault(video.model, list()).append(video)
+
+        # Models sorted newest first so far, sorting waits for the first
+        # query of each model
+        self._sorted: set[str] = set()
+    # <-- End of __init__()
+
+    @classmethod
+    def from_table(cls, db) -> "Catalog":
+        """Build a catalog of every video of a table
+
+        Args:
+            db (Table | SQLiteTable): Videos table
+
+        Returns:
+            Catalog: The catalog
+        """
+        docs = db.all()
+        metrics.add("db_rows_scanned", len(docs), op="catalog")
+        return cls(docs)
+    # <-- End of from_table()
+
+    def __len__(self) -> int:
+        return len(self.videos)
+    # <-- End of __len__()
+
+    def __iter__(self):
+        return iter(self.videos)
+    # <-- End of __iter__()
+
+    def newest(self, model: str, k: int) -> list[Video]:
+        """Get newest videos of a model, ties keep database order
+
+        Args:
+            model (str): Model name
+            k (int): Number of videos
+
+        Returns:
+            list[Video]: At most k videos, newest first
+        """
+        videos = self.by_model.get(model)
+        if videos is None or k <= 0:
+            return list()
+
+        if model not in self._sorted:
+            # Stable sort, equal upload days keep database order
+            videos.sort(key=lambda video: video.uploaded, reverse=True)
+            self._sorted.add(model)
+
+        return videos[:k]
+    # <-- End of newest()
+
+    def random_video(self) -> Video:
+        """Pick a random video
+
+        Returns:
+            Video: Any video of the catalog
+        """
+        return random.choice(self.videos)
+    # <-- End of random_video()
+
+# <-- End of class Catalog
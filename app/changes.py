@@ -0,0 +1,131 @@
+import time
+from tinydb.table import Document
+
+# Local packages
+from . import database_helpers as db_h
+
+# -------------------------------------
+# Change feed
+# -------------------------------------
+#
+# Every fetch appends one run to the runs table: the videos it inserted and
+# the views and likes existing videos gained. Runs are never updated, their
+# document id is the run id. Email and report jobs keep a cursor, the last
+# run they processed, and read only the runs after it instead of diffing
+# the whole videos table.
+
+
+class ChangeFeed:
+    def __init__(self, db) -> None:
+        """Append only feed of the changes of every fetch run
+
+        Args:
+            db (DatabaseSession): Database session, checkpoints are
+            committed right away
+        """
+        self.db = db
+    # <-- End of __init__()
+
+    def append(
+        self, changes: dict, started: float, finished: float = None
+    ) -> int:
+        """Record the changes of a fetch run
+
+        Args:
+            changes (dict): "inserted" and "updated" lists filled by
+            db_upsert_videos
+            started (float): Epoch time the run started
+            finished (float, optional): Epoch time the run finished.
+            Defaults to None, which reads the clock.
+
+        Returns:
+            int: Run id
+        """
+        return db_h.db_append_run(self.db, {
+            "started": started,
+            "finished": finished or time.time(),
+            "inserted": changes["inserted"],
+            "updated": changes["updated"],
+        })
+    # <-- End of append()
+
+    def since(self, run_id: int = 0) -> list[Document]:
+        """Read runs after a run, in time proportional to their number
+
+        Args:
+            run_id (int, optional): Last run already processed. Defaults to
+            0, every run still in the feed.
+
+        Returns:
+            list[Document]: Runs in order, doc_id is the run id
+        """
+        return db_h.db_runs_after(self.db, run_id)
+    # <-- End of since()
+
+    def cursor(self, reader: str) -> int:
+        """Last run a reader has processed, 0 for a new reader"""
+        return db_h.db_read_cursor(self.db, reader)
+    # <-- End of cursor()
+
+    def read(self, reader: str) -> list[Document]:
+        """Read runs a reader has not processed yet, the cursor only moves
+        on checkpoint(), so a reader crashing before it reads them again
+
+        Args:
+            reader (str): Name of the reader, e.g. "weekly_email"
+
+        Returns:
+            list[Document]: Runs in order, doc_id is the run id
+        """
+        return self.since(self.cursor(reader))
+    # <-- End of read()
+
+    def checkpoint(self, reader: str, runs: list[Document]) -> None:
+        """Move the cursor of a reader past runs it has processed
+
+        Args:
+            reader (str): Name of the reader
+            runs (list[Document]): Result of read(), nothing moves when
+            empty
+        """
+        if len(runs) > 0:
+            db_h.db_save_cursor(self.db, reader, runs[-1].doc_id)
+            self.db.commit()
+    # <-- End of checkpoint()
+
+# <-- End of class ChangeFeed
+
+
+def new_videos(runs: list[dict]) -> list[dict]:
+    """Videos inserted by runs, in the order they were inserted
+
+    Args:
+        runs (list[dict]): Runs of the feed
+
+    Returns:
+        list[dict]: Inserted videos
+    """
+    return [video for run in runs for video in run["inserted"]]
+# <-- End of new_videos()
+
+
+def video_deltas(runs: list[dict]) -> dict[tuple[str, str], dict]:
+    """Views and likes gained by videos over runs
+
+    Args:
+        runs (list[dict]): Runs of the feed
+
+    Returns:
+        dict[tuple[str, str], dict]: [key]: (id, link), [value]: model,
+        views and likes gained over all runs
+    """
+    deltas = dict()
+    for run in runs:
+        for delta in run["updated"]:
+            key = (delta["id"], delta["link"])
+            if key not in deltas:
+                deltas[key] = {"model": delta["model"], "views": 0, "likes": 0}
+            deltas[key]["views"] += delta["views"]
+            deltas[key]["likes"] += delta["likes"]
+    return deltas
+# <-- End of video_deltas()
@@ -18,5 +18,93 @@ default_models = {
 
 default_avatar = 'https://raw.githubusercontent.com/konsav/email-templates/master/images/list-item.png'
 
-weekly_command = '{workspace}/.venv/bin/python3 {workspace}/runner.py send -w -- {emails}'
-daily_command = '{workspace}/.venv/bin/python3 {workspace}/runner.py send -d -- {emails}'
+# Built-in jobs of the scheduler daemon, emails go to the recipients
+# environment variable, dow None means every day of the week
+scheduler_jobs = {
+    'daily': {'minute': 0, 'hour': 0, 'dow': None},
+    'weekly': {'minute': 0, 'hour': 0, 'dow': ['SUN']},
+    'fetch': {'minute': 0, 'hour': 23, 'dow': None},
+    'retention': {'minute': 30, 'hour': 3, 'dow': ['SUN']},
+    # Every hour, sends emails waiting for a retry
+    'dispatch': {'minute': 45, 'hour': None, 'dow': None},
+}
+# Seconds between two checks of the schedules table
+scheduler_poll = 30
+
+# Smtp settings, providers cap emails per connection
+smtp_host = 'smtp.gmail.com'
+smtp_port = 587
+smtp_pool_size = 2
+smtp_max_messages = 100
+
+# Email dispatch settings, backoff doubles after every failed attempt
+dispatch_workers = 4
+dispatch_rate = 5.0  # Emails per second
+dispatch_max_attempts = 5
+dispatch_backoff = 30
+dispatch_max_backoff = 15 * 60
+dispatch_batch_size = 50
+
+# Concurrent fetch settings
+max_workers = 8
+max_requests_per_host = 4
+# Options of the nightly fetch, shared by fetch_runner and the scheduler
+# daemon so they never drift apart. Shards take them without resume.
+fetch_options = {
+    'workers': max_workers,
+    'incremental': True,
+    'cache': True,
+    'resume': True,
+}
+# Seconds the journal of a crashed fetch is resumed from, older pages are
+# stale and fetched again
+fetch_journal_max_age = 24 * 60 * 60
+
+# Retention of saved data, 0 turns a limit off. Expired videos are moved
+# to gzipped JSON lines archives in data/archive.
+retention_per_model = 1000  # Newest videos kept per model
+retention_max_age = 5 * 365 * 24 * 60 * 60  # Seconds since upload
+retention_outbox_age = 30 * 24 * 60 * 60  # Seconds since an email was sent
+retention_runs_age = 90 * 24 * 60 * 60  # Seconds since a fetch run finished
+
+# Adaptive request rate per host, see fetcher.AdaptiveSession. Rate and
+# concurrency grow by a step after every healthy response and are cut by
+# fetch_decrease when the host throttles.
+fetch_rate = 8.0  # Starting requests per second
+fetch_min_rate = 0.2
+fetch_max_rate = 20.0
+fetch_rate_step = 0.5
+fetch_decrease = 0.5
+# Retries of a throttled or failed request, waits are jittered and double
+# after every attempt
+fetch_retries = 4
+fetch_backoff = 1.0
+fetch_max_backoff = 60
+# Failures in a row opening the circuit breaker of a host, and seconds it
+# stays open, doubled every time it opens again
+breaker_failures = 5
+breaker_cooldown = 30
+breaker_max_cooldown = 10 * 60
+
+# Response cache settings, ttls are matched against url path in seconds
+cache_ttls = {
+    '/models/': 60 * 60,
+    '/videos/': 30 * 24 * 60 * 60,
+}
+cache_default_ttl = 60 * 60
+cache_max_size = 512 * 1024 * 1024
+# Seconds between two sizings of the cache directory, processes sharing it
+# do not see each other's writes otherwise
+cache_resize_interval = 60
+
+# Query string of the listing pages after the first one on a model page
+model_page_query = (
+    '?mode=async&function=get_block&block_id=list_videos_common_videos_list'
+    '&sort_by=post_date&from={page}'
+)
+
+# Database file of each storage backend in data directory
+db_files = {
+    'tinydb': 'db.json',
+    'sqlite': 'db.sqlite3',
+}
@@ -1,20 +1,144 @@
-import numpy as np
+import os
+import random
+import hashlib
+from typing import Iterable
+from itertools import chain
+from contextlib import nullcontext
 from tinydb import TinyDB, Query
+from tinydb.table import Document
 
 # Local packages
-from .helpers import convert_timestamp, format_video_names
-from .constants import default_models, default_avatar
+from .templates import format_video_names
+from .schema import SCHEMA_VERSION, migrate_video, video_upload_epoch
+from .catalog import Catalog
+from .metrics import metrics
+from .constants import default_models, default_avatar, default_subjects
+from .sqlite_storage import SQLiteDB, SQLiteTable, migrate_tinydb
+
+# -------------------------------------
+# Database backend functions
+# -------------------------------------
+
+# File extensions opened with the SQLite backend
+sqlite_extensions = (".sqlite", ".sqlite3", ".db")
+
+
+def open_db(db_path: str):
+    """Open database with the backend matching its file extension
+
+    A new SQLite database is filled from the TinyDB json file next to it,
+    e.g. db.sqlite3 from db.json, the first time it is opened, and again on
+    later opens until one copy succeeded.
+
+    Args:
+        db_path (str): Path to database, json for TinyDB, .sqlite, .sqlite3
+        or .db for SQLite
+
+    Returns:
+        TinyDB | SQLiteDB: Database object
+    """
+    if not db_path.endswith(sqlite_extensions):
+        return TinyDB(db_path)
+
+    db = SQLiteDB(db_path)
+    migrate_tinydb(os.path.splitext(db_path)[0] + ".json", db)
+    return db
+# <-- End of open_db()
+
+
+def db_transaction(db):
+    """Group writes of a database or table in one transaction, TinyDB
+    writes are not grouped
+
+    Args:
+        db (TinyDB | SQLiteDB | SQLiteTable | DatabaseSession): Database or
+        table
+
+    Returns:
+        ContextManager: Transaction context
+    """
+    if hasattr(db, "transaction"):
+        return db.transaction()
+    return nullcontext()
+# <-- End of db_transaction()
+
+
+def _find(db, **fields) -> list[Document]:
+    """Find documents whose fields equal given values, indexed on SQLite"""
+    if isinstance(db, SQLiteTable):
+        return db.find(**fields)
+    return db.search(Query().fragment(fields))
+# <-- End of _find()
+
+
+def _contains(db, **fields) -> bool:
+    """Check if any document has fields equal to given values"""
+    return len(_find(db, **fields)) > 0
+# <-- End of _contains()
+
+
+def db_schema_version(db) -> int:
+    """Read video schema version of a database
+
+    Args:
+        db (TinyDB | SQLiteDB | DatabaseSession): Database
+
+    Returns:
+        int: Schema version, 1 for databases older than versioning
+    """
+    docs = db.table("meta").all()
+    return docs[0]["schema"] if len(docs) > 0 else 1
+# <-- End of db_schema_version()
+
+
+def db_migrate(db) -> int:
+    """Convert every video of a database to the current schema, see
+    schema.py, and record the new version. Up to date databases are left
+    untouched.
+
+    Args:
+        db (TinyDB | SQLiteDB | DatabaseSession): Database
+
+    Returns:
+        int: Number of videos converted
+    """
+    if db_schema_version(db) >= SCHEMA_VERSION:
+        return 0
+
+    videos = db.table("videos")
+    meta = db.table("meta")
+
+    with db_transaction(db):
+        if isinstance(videos, SQLiteTable):
+            docs = {doc.doc_id: migrate_video(doc) for doc in videos.all()}
+            videos.replace(docs)
+            count = len(docs)
+        else:
+            count = len(videos)
+            # Private TinyDB hook, rewrites the table with one storage write
+            videos._update_table(
+                lambda table: table.update(
+                    {doc_id: migrate_video(doc) for doc_id, doc in table.items()}
+                )
+            )
+
+        meta.truncate()
+        meta.insert({"schema": SCHEMA_VERSION})
+
+    return count
+# <-- End of db_migrate()
 
 # -------------------------------------
 # Database helper functions
 # -------------------------------------
 
 
-def read_models(db_path: str, table: str) -> dict[str, str]:
+def read_models(db_path, table: str) -> dict[str, str]:
     """Read all models from database model table, and load to buffer
 
     Args:
-        db_path (str): Path to database
+        db_path (str | DatabaseSession): Path to database, or an opened
+        database
         table (str): Name of models table
 
     Returns:
@@ -22,7 +146,9 @@ def read_models(db_path: str, table: str) -> dict[str, str]:
         [value]: link to model webpage
     """
     models = dict()
-    db = TinyDB(db_path).table(table)
+    if isinstance(db_path, str):
+        db_path = open_db(db_path)
+    db = db_path.table(table)
 
     if len(db) == 0:
         for model, url in default_models.items():
@@ -56,9 +182,8 @@ def db_insert_model(
         bool: True if it inserted model, False otherwise
     """
     flag = False
-    query = Query()
 
-    if not db.contains(query["model"] == model):
+    if not _contains(db, model=model):
         flag = True
 
         # Structure document object
@@ -85,52 +210,235 @@ def db_update_model(db: TinyDB, model: str, avatar: str = default_avatar) -> boo
         bool: True if it updated avatar, False otherwise
     """
     flag = False
-    query = Query()["model"] == model
 
-    doc = db.search(query)[0]
+    doc = _find(db, model=model)[0]
     if (not doc["avatar"] == avatar) and (not avatar == default_avatar):
         flag = True
         # When avatar is not default avatar and they are different
-        db.update({"avatar": avatar}, query)
+        db.update({"avatar": avatar}, doc_ids=[doc.doc_id])
 
     return flag
 # <-- End of db_update_model()
 
 
-def db_insert_videos(db: TinyDB, content: list[dict]) -> bool:
-    """Insert only new data to database
+def db_remove_model(db: TinyDB, model: str) -> bool:
+    """Remove model from database
 
     Args:
-        db (TinyDB): The database object for saving data
+        db (TinyDB): Models database
+        model (str): Model name
+
+    Returns:
+        bool: True if it removed model, False otherwise
+    """
+    doc_ids = [doc.doc_id for doc in _find(db, model=model)]
+
+    if len(doc_ids) > 0:
+        db.remove(doc_ids=doc_ids)
+
+    return len(doc_ids) > 0
+# <-- End of db_remove_model()
+
+
+def db_model_watermarks(db: TinyDB) -> dict[str, str]:
+    """Read the watermark of every model
+
+    Args:
+        db (TinyDB): Models database
+
+    Returns:
+        dict[str, str]: [key]: model name, [value]: link of newest video
+        saved by the last fetch
+    """
+    return {
+        model["model"]: model["watermark"]
+        for model in db.all()
+        if model.get("watermark")
+    }
+# <-- End of db_model_watermarks()
+
+
+def db_update_watermark(db: TinyDB, model: str, link: str) -> None:
+    """Save link of the newest video of a model as its watermark
+
+    Args:
+        db (TinyDB): Models database
+        model (str): Model name
+        link (str): Link of the newest video on the model page
+    """
+    doc_ids = [doc.doc_id for doc in _find(db, model=model)]
+    db.update({"watermark": link}, doc_ids=doc_ids)
+# <-- End of db_update_watermark()
+
+
+@metrics.timed("db", op="known_videos")
+def db_known_videos(db: TinyDB) -> set[tuple[str, str]]:
+    """Collect (id, link) of every video in database
+
+    Args:
+        db (TinyDB): Videos database
+
+    Returns:
+        set[tuple[str, str]]: (id, link) of all saved videos
+    """
+    if isinstance(db, SQLiteTable):
+        known = set(db.select("id", "link"))
+    else:
+        known = {(video["id"], video["link"]) for video in db.all()}
+
+    metrics.add("db_rows_scanned", len(known), op="known_videos")
+    return known
+# <-- End of db_known_videos()
+
+
+def db_upsert_videos(
+    db: TinyDB, content: Iterable[dict], changes: dict = None
+) -> bool:
+    """Insert new videos and refresh views and likes of existing videos in
+    one batch
+
+    The table is read once to map (id, link) to document ids, then every
+    insert and update is applied to that snapshot, which is written back
+    with a single storage write. Content may be a stream, e.g. a whole
+    fetch, it is consumed inside that one write, the db timer leaves out
+    the time spent producing it.
+
+    Args:
+        db (TinyDB): Videos database
+        content (Iterable[dict]): Scraped videos
+        changes (dict, optional): Collects the changes of the batch, new
+        videos are appended to its "inserted" list and views and likes
+        deltas of existing videos to its "updated" list, see
+        _video_delta(). Defaults to None.
 
     Returns:
         bool: True if there's new data save to database, False
         otherwise
     """
-    # Set flag
-    flag = False
+    with metrics.timer("db", op="upsert_videos") as timer:
+        content = timer.exclude(content)
+        if isinstance(db, SQLiteTable):
+            return _sqlite_upsert_videos(db, content, changes)
+        return _tinydb_upsert_videos(db, content, changes)
+# <-- End of db_upsert_videos()
 
-    # Set query
-    query = Query()
 
-    # Loop through all videos of a model
-    for video in content:
-        # Query database to get video with same id and link
-        video_query = query.fragment({"id": video["id"], "link": video["link"]})
+def _tinydb_upsert_videos(
+    db: TinyDB, content: Iterable[dict], changes: dict = None
+) -> bool:
+    """TinyDB path of db_upsert_videos, one read and one write of the
+    table"""
+    inserted = list()
+    updated = 0
+
+    def upsert(table: dict) -> None:
+        nonlocal updated
+        # Map (id, link) to document id, the only full pass over the table
+        index = {
+            (doc["id"], doc["link"]): doc_id for doc_id, doc in table.items()
+        }
+        metrics.add("db_rows_scanned", len(table), op="upsert_videos")
+
+        for video in content:
+            key = (video["id"], video["link"])
+
+            if key not in index:
+                # TinyDB hands out document ids, keep its counter in sync
+                doc_id = db._get_next_id()
+                table[doc_id] = dict(video)
+                index[key] = doc_id
+                inserted.append(doc_id)
+                if changes is not None:
+                    changes["inserted"].append(dict(video))
+            else:
+                updated += 1
+                # A copy, the cached document stays as it is when the
+                # stream raises and the table is never written
+                doc = table[index[key]] = dict(table[index[key]])
+                if changes is not None:
+                    _video_delta(changes, doc, video)
+                doc["views"] = video["views"]
+                if "likes" in video:
+                    doc["likes"] = video["likes"]
+
+    # Nothing to write, the table is neither read nor written
+    content = iter(content)
+    first = next(content, None)
+    if first is not None:
+        content = chain([first], content)
+        # Private TinyDB hook, the only way to batch reads and writes
+        db._update_table(upsert)
+
+    metrics.add("db_rows_written", len(inserted), op="insert_videos")
+    metrics.add("db_rows_written", updated, op="update_videos")
+    return len(inserted) > 0
+# <-- End of _tinydb_upsert_videos()
+
+
+def _sqlite_upsert_videos(
+    db: SQLiteTable, content: Iterable[dict], changes: dict = None
+) -> bool:
+    """SQLite counterpart of db_upsert_videos, one indexed lookup per video
+    and a single transaction"""
+    inserted = updated = 0
+
+    with db.transaction():
+        for video in content:
+            docs = db.find(id=video["id"], link=video["link"])
+
+            if len(docs) == 0:
+                inserted += 1
+                db.insert(video)
+                if changes is not None:
+                    changes["inserted"].append(dict(video))
+            else:
+                updated += 1
+                if changes is not None:
+                    _video_delta(changes, docs[0], video)
+                fields = {"views": video["views"]}
+                if "likes" in video:
+                    fields["likes"] = video["likes"]
+                db.update(fields, doc_ids=[docs[0].doc_id])
+
+    # Indexed lookups only read the rows they match
+    metrics.add("db_rows_scanned", updated, op="upsert_videos")
+    metrics.add("db_rows_written", inserted, op="insert_videos")
+    metrics.add("db_rows_written", updated, op="update_videos")
+    return inserted > 0
+# <-- End of _sqlite_upsert_videos()
+
+
+def _video_delta(changes: dict, doc: dict, video: dict) -> None:
+    """Append views and likes gained by a saved video, when it gained any,
+    to the "updated" list of changes"""
+    views = video["views"] - doc.get("views", 0)
+    likes = video["likes"] - doc.get("likes", 0) if "likes" in video else 0
+
+    if views != 0 or likes != 0:
+        changes["updated"].append({
+            "id": video["id"],
+            "link": video["link"],
+            "model": video["model"],
+            "views": views,
+            "likes": likes,
+        })
+# <-- End of _video_delta()
 
-        # Check if query result is not zero
-        is_video_exist = len(db.search(video_query)) > 0
 
-        # Check if video already exist in database
-        if not is_video_exist:
-            flag = True
-            # If not exist insert to database
-            db.insert(video)
-        else:
-            db.update({"views": video["views"]}, video_query)
+def db_insert_videos(db: TinyDB, content: list[dict]) -> bool:
+    """Insert only new data to database, refresh views and likes of
+    existing videos
 
-    return flag
-# <-- End of insert_new_only_db()
+    Args:
+        db (TinyDB): The database object for saving data
+        content (list[dict]): Scraped videos
+
+    Returns:
+        bool: True if there's new data save to database, False
+        otherwise
+    """
+    return db_upsert_videos(db, content)
+# <-- End of db_insert_videos()
 
 
 def db_cleanup(db: TinyDB, models: dict[str, str]) -> None:
@@ -140,37 +448,134 @@ def db_cleanup(db: TinyDB, models: dict[str, str]) -> None:
         db (TinyDB): Videos database
         models (dict[str, str]): Models buffer
     """
-    query = Query()
-
     # Remove all videos of model not in models buffer
-    db.remove(query["model"].test(lambda x: x not in models))
+    if isinstance(db, SQLiteTable):
+        db.remove_not_in("model", models)
+    else:
+        db_remove_videos(
+            db, [doc.doc_id for doc in db.all() if doc["model"] not in models]
+        )
 # <-- End of db_cleanup()
 
 
-def db_select_videos(db: TinyDB, models: list[str]) -> list[dict]:
-    """Randomly select videos from database for email content.
+def db_expired_videos(
+    db,
+    models,
+    per_model: int = 0,
+    before: int = 0,
+) -> list[Document]:
+    """Find videos falling out of retention
+
+    A video expires when its model is gone, when newer videos of its model
+    fill the per model cap, or when it was uploaded before the cutoff. The
+    newest videos are the ones db_select_videos picks, so weekly emails are
+    never affected by a cap of 2 or more.
 
     Args:
-        db (TinyDB): Videos database
-        models (list[str]): List of wanted models to watch
+        db (TinyDB | SQLiteTable): Videos table
+        models (Iterable[str]): Models still watched
+        per_model (int, optional): Videos kept per model, 0 keeps all.
+        Defaults to 0.
+        before (int, optional): Epoch seconds, older uploads expire, 0
+        keeps all. Defaults to 0.
 
     Returns:
-        list[dict]: List of randomly selected videos
+        list[Document]: Expired videos in database order
     """
-    query = Query()
-    videos = np.array([])
+    models = set(models)
+
+    if isinstance(db, SQLiteTable):
+        # Each rule walks an index, documents matching several are merged
+        expired = {doc.doc_id: doc for doc in db.find_not_in("model", models)}
+        if per_model > 0:
+            for doc in db.find_overflow("model", "upload_time", per_model):
+                expired[doc.doc_id] = doc
+        if before > 0:
+            for doc in db.find_below("upload_time", before):
+                expired[doc.doc_id] = doc
+        metrics.add("db_rows_scanned", len(expired), op="expired_videos")
+        return [expired[doc_id] for doc_id in sorted(expired)]
+
+    docs = db.all()
+    metrics.add("db_rows_scanned", len(docs), op="expired_videos")
+    by_model: dict[str, list[Document]] = dict()
+    expired = set()
+
+    def uploaded(doc: Document) -> int:
+        # Unknown upload days rank last and never expire by age, as NULL
+        # does in SQLite
+        epoch = video_upload_epoch(doc)
+        return 0 if epoch is None else epoch
+
+    for doc in docs:
+        if doc["model"] not in models:
+            expired.add(doc.doc_id)
+        elif 0 < uploaded(doc) < before:
+            expired.add(doc.doc_id)
+        by_model.setdefault(doc["model"], list()).append(doc)
+
+    if per_model > 0:
+        for videos in by_model.values():
+            # Newest first, ties keep database order like Catalog.newest
+            videos.sort(key=uploaded, reverse=True)
+            expired.update(doc.doc_id for doc in videos[per_model:])
+
+    return [doc for doc in docs if doc.doc_id in expired]
+# <-- End of db_expired_videos()
+
+
+def db_remove_videos(db, doc_ids: list[int]) -> int:
+    """Remove videos by document id in one write
 
-    for model in models:
-        model_videos = np.array(db.search(query.model == model))
+    Args:
+        db (TinyDB | SQLiteTable): Videos table
+        doc_ids (list[int]): Ids of videos to remove
 
-        # format videos
-        convert_timestamp(model_videos)
-        format_video_names(model_videos)
+    Returns:
+        int: Number of videos removed
+    """
+    doc_ids = list(doc_ids)
+    if len(doc_ids) > 0:
+        # Primary key lookups on SQLite, one pass over the table on TinyDB
+        db.remove(doc_ids=doc_ids)
 
-        model_videos = np.array(
-            sorted(model_videos, key=lambda v: v["upload time"], reverse=True)
-        )
-        videos = np.append(videos, model_videos[:2])
+    metrics.add("db_rows_written", len(doc_ids), op="remove_videos")
+    return len(doc_ids)
+# <-- End of db_remove_videos()
+
+
+@metrics.timed("db", op="select_videos")
+def db_select_videos(db, models: list[str], k: int = 2) -> list[dict]:
+    """Select newest videos of each model from database for email content.
+
+    Args:
+        db (Catalog | TinyDB): Catalog of videos, or videos table which a
+        catalog is built from
+        models (list[str]): List of wanted models to watch
+        k (int, optional): Number of videos per model. Defaults to 2.
+
+    Returns:
+        list[dict]: Newest videos of every model, newest first, in the order
+        of models
+    """
+    if isinstance(db, SQLiteTable):
+        # Index on (model, upload_time) reads only k rows per model
+        videos = [
+            dict(video)
+            for model in models
+            for video in db.find_sorted("upload_time", k, model=model)
+        ]
+        metrics.add("db_rows_scanned", len(videos), op="select_videos")
+    else:
+        catalog = db if isinstance(db, Catalog) else Catalog.from_table(db)
+        videos = [
+            video.to_dict()
+            for model in models
+            for video in catalog.newest(model, k)
+        ]
+
+    # format videos
+    format_video_names(videos)
 
     return videos
 # <-- End of db_select_videos()
@@ -181,7 +586,8 @@ def db_insert_schedule(
     email: str,
     minute: int,
     hour: int,
-    dow: list[str]
+    dow: list[str],
+    template: str = "weekly"
 ) -> None:
     """Insert email schedule record into database.
 
@@ -191,17 +597,45 @@ def db_insert_schedule(
         minute (int): At which minute email to be sent
         hour (int): At which hour email to be sent
         dow (list[str]): At which day of the week email to be sent
+        template (str, optional): "daily" or "weekly" email. Defaults to
+        "weekly".
     """
-    query = Query().fragment({'minute': minute, 'hour': hour, 'dow': dow})
+    docs = _find(db, minute=minute, hour=hour, dow=dow, template=template)
 
-    if not db.contains(query):
+    if len(docs) == 0:
         db.insert({'emails': [email], 'minute': minute,
-                  'hour': hour, 'dow': dow})
+                  'hour': hour, 'dow': dow, 'template': template})
     else:
-        db.update(lambda x: x['emails'].append(email), query)
+        emails = docs[0]['emails'] + [email]
+        db.update({'emails': emails}, doc_ids=[docs[0].doc_id])
 # <-- End of db_insert_schedule()
 
 
+def db_find_schedule(
+    db: TinyDB,
+    minute: int,
+    hour: int,
+    dow: list[str],
+    template: str = "weekly"
+) -> Document:
+    """Find the email schedule record of a time slot
+
+    Args:
+        db (TinyDB): Schedule database
+        minute (int): At which minute email to be sent
+        hour (int): At which hour email to be sent
+        dow (list[str]): At which day of the week email to be sent
+        template (str, optional): "daily" or "weekly" email. Defaults to
+        "weekly".
+
+    Returns:
+        Document: Schedule record, None if nobody subscribes to the slot
+    """
+    docs = _find(db, minute=minute, hour=hour, dow=dow, template=template)
+    return docs[0] if len(docs) > 0 else None
+# <-- End of db_find_schedule()
+
+
 def db_remove_schedule(db: TinyDB, email: str) -> None:
     """Remove all jobs of the specified email from the database
 
@@ -209,10 +643,282 @@ def db_remove_schedule(db: TinyDB, email: str) -> None:
         db (TinyDB): Schedule database
         email (str): Email address to be removed
     """
-    query = Query()['emails'].test(lambda x: email in x)
+    with db_transaction(db):
+        for doc in db.all():
+            if email not in doc['emails']:
+                continue
+
+            emails = [x for x in doc['emails'] if x != email]
+            if len(emails) > 0:
+                db.update({'emails': emails}, doc_ids=[doc.doc_id])
+            else:
+                # Remove schedules nobody subscribes to
+                db.remove(doc_ids=[doc.doc_id])
+# <-- End of db_remove_schedule()
 
-    db.update(lambda x: x['emails'].remove(email), query)
 
-    query = Query()['emails'].test(lambda x: len(x) == 0)
-    db.remove(query)
-# <-- End of db_remove_schedule()
+def db_enqueue_emails(db, bodies: dict[str, str], subject: str = None) -> int:
+    """Queue one email per recipient in the outbox table, bodies shared by
+    several recipients are saved once in email_bodies table
+
+    Args:
+        db (TinyDB | SQLiteDB | DatabaseSession): Database
+        bodies (dict[str, str]): [key]: email address, [value]: email body
+        subject (str, optional): Subject line. Defaults to None, which picks
+        a random default subject.
+
+    Returns:
+        int: Number of emails queued
+    """
+    outbox = db.table("outbox")
+    contents = db.table("email_bodies")
+    subject = subject or random.choice(default_subjects)
+    digests = dict()  # [key]: body, [value]: digest
+
+    with db_transaction(db):
+        for body in bodies.values():
+            if body in digests:
+                continue
+
+            digest = hashlib.sha256(body.encode()).hexdigest()
+            if not _contains(contents, digest=digest):
+                contents.insert({"digest": digest, "body": body})
+            digests[body] = digest
+
+        outbox.insert_multiple([
+            {
+                "recipient": recipient,
+                "digest": digests[body],
+                "subject": subject,
+                "status": "pending",
+                "attempts": 0,
+                "next_try": 0,
+                "error": None,
+            }
+            for recipient, body in bodies.items()
+        ])
+
+    return len(bodies)
+# <-- End of db_enqueue_emails()
+
+
+def db_pending_emails(db, now: float = float("inf")) -> list[Document]:
+    """Find queued emails waiting to be sent
+
+    Args:
+        db (TinyDB | SQLiteDB | DatabaseSession): Database
+        now (float, optional): Only emails due at this epoch time. Defaults
+        to every pending email.
+
+    Returns:
+        list[Document]: Pending emails in queue order
+    """
+    return [
+        doc
+        for doc in _find(db.table("outbox"), status="pending")
+        if doc["next_try"] <= now
+    ]
+# <-- End of db_pending_emails()
+
+
+def db_email_body(db, digest: str) -> str:
+    """Read a queued email body
+
+    Args:
+        db (TinyDB | SQLiteDB | DatabaseSession): Database
+        digest (str): Digest of the body
+
+    Returns:
+        str: The email body
+    """
+    return _find(db.table("email_bodies"), digest=digest)[0]["body"]
+# <-- End of db_email_body()
+
+
+def db_update_email(db, doc_id: int, fields: dict) -> None:
+    """Record delivery status of a queued email
+
+    Args:
+        db (TinyDB | SQLiteDB | DatabaseSession): Database
+        doc_id (int): Id of the queued email
+        fields (dict): Fields to set, e.g. status, attempts, next_try
+    """
+    db.table("outbox").update(fields, doc_ids=[doc_id])
+# <-- End of db_update_email()
+
+
+def db_prune_outbox(db, before: float) -> int:
+    """Remove emails sent before a time, then bodies no email refers to
+
+    Args:
+        db (TinyDB | SQLiteDB | DatabaseSession): Database
+        before (float): Epoch seconds
+
+    Returns:
+        int: Number of emails removed
+    """
+    outbox = db.table("outbox")
+    contents = db.table("email_bodies")
+
+    with db_transaction(db):
+        sent = [
+            doc.doc_id
+            for doc in _find(outbox, status="sent")
+            if doc.get("sent_at", 0) < before
+        ]
+        if len(sent) > 0:
+            outbox.remove(doc_ids=sent)
+
+        used = {doc["digest"] for doc in outbox.all()}
+        unused = [
+            doc.doc_id for doc in contents.all() if doc["digest"] not in used
+        ]
+        if len(unused) > 0:
+            contents.remove(doc_ids=unused)
+
+    return len(sent)
+# <-- End of db_prune_outbox()
+
+
+def db_email_status(db) -> dict[str, int]:
+    """Count queued emails by delivery status
+
+    Args:
+        db (TinyDB | SQLiteDB | DatabaseSession): Database
+
+    Returns:
+        dict[str, int]: [key]: pending, sent or failed, [value]: count
+    """
+    counts = {"pending": 0, "sent": 0, "failed": 0}
+    for doc in db.table("outbox").all():
+        counts[doc["status"]] += 1
+    return counts
+# <-- End of db_email_status()
+
+
+# -------------------------------------
+# Change feed functions
+# -------------------------------------
+
+
+def db_append_run(db, run: dict) -> int:
+    """Append the changes of a fetch run to the runs table, runs are never
+    updated
+
+    Args:
+        db (TinyDB | SQLiteDB | DatabaseSession): Database
+        run (dict): started, finished, inserted and updated, see
+        db_upsert_videos
+
+    Returns:
+        int: Run id, greater than the id of every earlier run
+    """
+    runs = db.table("runs")
+
+    if isinstance(runs, SQLiteTable):
+        # The runs table is AUTOINCREMENT, see table_autoincrement
+        run_id = runs.insert(run)
+    else:
+        # TinyDB counts ids on from the highest id left in the table, the
+        # last run id is kept aside the way sqlite_sequence keeps it
+        sequences = db.table("sequences")
+        docs = _find(sequences, name="runs")
+        if len(docs) > 0:
+            run_id = runs.insert(Document(run, doc_id=docs[0]["seq"] + 1))
+            sequences.update({"seq": run_id}, doc_ids=[docs[0].doc_id])
+        else:
+            run_id = runs.insert(run)
+            sequences.insert({"name": "runs", "seq": run_id})
+    metrics.add("db_rows_written", 1, op="append_run")
+    return run_id
+# <-- End of db_append_run()
+
+
+@metrics.timed("db", op="runs_after")
+def db_runs_after(db, run_id: int = 0) -> list[Document]:
+    """Read runs appended after a run, reading only those runs
+
+    Args:
+        db (TinyDB | SQLiteDB | DatabaseSession): Database
+        run_id (int, optional): Last run already read. Defaults to 0, every
+        run.
+
+    Returns:
+        list[Document]: Runs in the order they were appended
+    """
+    runs = db.table("runs")
+
+    if isinstance(runs, SQLiteTable):
+        docs = runs.find_after(run_id)
+    elif run_id > 0 and runs.get(doc_id=run_id) is not None:
+        # Run ids are consecutive, walk them by primary key
+        docs = list()
+        doc = runs.get(doc_id=run_id + 1)
+        while doc is not None:
+            docs.append(doc)
+            doc = runs.get(doc_id=doc.doc_id + 1)
+    else:
+        # First read, or the last run read was pruned since
+        docs = [doc for doc in runs.all() if doc.doc_id > run_id]
+
+    metrics.add("db_rows_scanned", len(docs), op="runs_after")
+    return docs
+# <-- End of db_runs_after()
+
+
+def db_read_cursor(db, reader: str) -> int:
+    """Read the last run a reader of the change feed has processed
+
+    Args:
+        db (TinyDB | SQLiteDB | DatabaseSession): Database
+        reader (str): Name of the reader, e.g. "weekly_email"
+
+    Returns:
+        int: Run id, 0 when the reader never saved a checkpoint
+    """
+    docs = _find(db.table("cursors"), reader=reader)
+    return docs[0]["run"] if len(docs) > 0 else 0
+# <-- End of db_read_cursor()
+
+
+def db_save_cursor(db, reader: str, run_id: int) -> None:
+    """Save the last run a reader of the change feed has processed
+
+    Args:
+        db (TinyDB | SQLiteDB | DatabaseSession): Database
+        reader (str): Name of the reader
+        run_id (int): Run id
+    """
+    cursors = db.table("cursors")
+    docs = _find(cursors, reader=reader)
+
+    if len(docs) > 0:
+        cursors.update({"run": run_id}, doc_ids=[docs[0].doc_id])
+    else:
+        cursors.insert({"reader": reader, "run": run_id})
+# <-- End of db_save_cursor()
+
+
+def db_prune_runs(db, before: float) -> int:
+    """Remove runs finished before a time, readers behind them skip to the
+    oldest run left
+
+    Args:
+        db (TinyDB | SQLiteDB | DatabaseSession): Database
+        before (float): Epoch seconds
+
+    Returns:
+        int: Number of runs removed
+    """
+    runs = db.table("runs")
+
+    if isinstance(runs, SQLiteTable):
+        docs = runs.find_below("finished", before)
+    else:
+        docs = [doc for doc in runs.all() if doc["finished"] < before]
+    doc_ids = [doc.doc_id for doc in docs]
+
+    if len(doc_ids) > 0:
+        runs.remove(doc_ids=doc_ids)
+    return len(doc_ids)
+# <-- End of db_prune_runs()
@@ -0,0 +1,153 @@
+import os
+import json
+from tinydb import TinyDB
+from tinydb.storages import Storage
+from tinydb.middlewares import CachingMiddleware
+
+# Local packages
+from . import database_helpers as db_h
+
+# -------------------------------------
+# Shared database session
+# -------------------------------------
+
+
+class AtomicJSONStorage(Storage):
+    def __init__(self, path: str, **kwargs) -> None:
+        """TinyDB json storage replacing the file atomically on write
+
+        The new state is written to a temporary file, synced, then moved
+        over the database file, so a crash never leaves a half written
+        database behind.
+
+        Args:
+            path (str): Path to database file
+        """
+        super().__init__()
+        self.path = path
+        self.kwargs = kwargs
+    # <-- End of __init__()
+
+    def read(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # Empty file, let TinyDB initialize the database
+            if os.path.getsize(self.path) == 0:
+                return None
+            raise
+    # <-- End of read()
+
+    def write(self, data: dict) -> None:
+        tmp_path = self.path + ".tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, **self.kwargs)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(tmp_path, self.path)
+    # <-- End of write()
+
+# <-- End of class AtomicJSONStorage
+
+
+class DeferredCachingMiddleware(CachingMiddleware):
+    """Caching middleware writing to storage only when flushed"""
+
+    WRITE_CACHE_SIZE = float("inf")
+
+    def read(self) -> dict:
+        if self.cache is None:
+            # A missing database is cached as empty too, read it once only
+            self.cache = self.storage.read() or dict()
+        return self.cache
+    # <-- End of read()
+
+# <-- End of class DeferredCachingMiddleware
+
+
+class DatabaseSession:
+    def __init__(self, db_path: str) -> None:
+        """Long lived database handle shared by a whole run
+
+        TinyDB json files are read once, then served from memory. Writes
+        stay in memory until commit() or close(), which replace the file in
+        one atomic write. SQLite writes go straight to the database, grouped
+        by transaction().
+
+        Args:
+            db_path (str): Path to database, see database_helpers.open_db
+        """
+        self.db_path = db_path
+
+        if db_path.endswith(db_h.sqlite_extensions):
+            self.db = db_h.open_db(db_path)
+        else:
+            # Names are mostly Japanese, storing them as utf-8 instead of
+            # \u escapes halves their size on disk
+            self.db = TinyDB(
+                db_path,
+                storage=DeferredCachingMiddleware(AtomicJSONStorage),
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+    # <-- End of __init__()
+
+    def __enter__(self) -> "DatabaseSession":
+        return self
+    # <-- End of __enter__()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+    # <-- End of __exit__()
+
+    def table(self, name: str):
+        """Get a table of the session
+
+        Args:
+            name (str): Name of the table
+
+        Returns:
+            Table | SQLiteTable: The table
+        """
+        return self.db.table(name)
+    # <-- End of table()
+
+    def transaction(self):
+        """Group writes in one transaction
+
+        Returns:
+            ContextManager: Transaction context
+        """
+        return db_h.db_transaction(self.db)
+    # <-- End of transaction()
+
+    def commit(self) -> None:
+        """Write deferred changes to disk"""
+        if isinstance(self.db, TinyDB):
+            self.db.storage.flush()
+    # <-- End of commit()
+
+    def compact(self) -> None:
+        """Shrink the database file to its live documents
+
+        TinyDB files are rewritten whole on every commit, SQLite files keep
+        the pages of deleted rows until vacuumed.
+        """
+        if isinstance(self.db, TinyDB):
+            self.commit()
+        else:
+            self.db.vacuum()
+    # <-- End of compact()
+
+    def close(self) -> None:
+        """Commit deferred changes and release the database"""
+        self.commit()
+        self.db.close()
+    # <-- End of close()
+
+# <-- End of class DatabaseSession
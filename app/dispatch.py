@@ -0,0 +1,205 @@
+import re
+import time
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Local packages
+from . import database_helpers as db_h
+from .mailer import Mailer, make_message
+from .constants import (
+    dispatch_workers,
+    dispatch_rate,
+    dispatch_max_attempts,
+    dispatch_backoff,
+    dispatch_max_backoff,
+    dispatch_batch_size,
+)
+
+# -------------------------------------
+# Persistent email dispatch queue
+# -------------------------------------
+#
+# Rendered emails are queued in the outbox table of the database, one per
+# recipient. A Dispatcher drains the queue with a pool of sender threads
+# and records the delivery status of every email, so a crashed run picks
+# up the emails it did not send yet.
+
+
+def parse_recipients(value: str) -> list[str]:
+    """Split the recipients environment variable into addresses
+
+    Args:
+        value (str): Addresses separated by commas, semicolons or spaces,
+        optionally written as a python list
+
+    Returns:
+        list[str]: Email addresses, duplicates removed
+    """
+    addresses = (
+        address.strip("[]'\"") for address in re.split(r"[\s,;]+", value or "")
+    )
+    return list(dict.fromkeys(address for address in addresses if address))
+# <-- End of parse_recipients()
+
+
+class RateLimiter:
+    def __init__(self, rate: float) -> None:
+        """Space out calls of acquire() to at most rate per second across
+        threads
+
+        Args:
+            rate (float): Calls per second, 0 for no limit
+        """
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+    # <-- End of __init__()
+
+    def acquire(self) -> None:
+        """Wait for the next free slot"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
+    # <-- End of acquire()
+
+# <-- End of class RateLimiter
+
+
+class Dispatcher:
+    def __init__(
+        self,
+        db,
+        mailer: Mailer,
+        workers: int = dispatch_workers,
+        rate: float = dispatch_rate,
+        max_attempts: int = dispatch_max_attempts,
+        backoff: float = dispatch_backoff,
+        max_backoff: float = dispatch_max_backoff,
+        batch_size: int = dispatch_batch_size,
+    ) -> None:
+        """Drain the outbox table of a database
+
+        Only sender threads talk to the smtp server, the database is read
+        and written by the calling thread alone.
+
+        Args:
+            db (DatabaseSession): Database holding the queue
+            mailer (Mailer): Mailer shared by sender threads
+            workers (int, optional): Sender threads. Defaults to
+            dispatch_workers.
+            rate (float, optional): Emails per second. Defaults to
+            dispatch_rate.
+            max_attempts (int, optional): Attempts before an email is marked
+            failed. Defaults to dispatch_max_attempts.
+            backoff (float, optional): Seconds before the first retry,
+            doubled after every failure. Defaults to dispatch_backoff.
+            max_backoff (float, optional): Longest wait between attempts.
+            Defaults to dispatch_max_backoff.
+            batch_size (int, optional): Emails sent between two commits.
+            Defaults to dispatch_batch_size.
+        """
+        self.db = db
+        self.mailer = mailer
+        self.workers = workers
+        self.limiter = RateLimiter(rate)
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.batch_size = batch_size
+
+        self._bodies: dict[str, str] = dict()  # [key]: digest
+    # <-- End of __init__()
+
+    def _send(self, email: dict, body: str) -> tuple[str, bool]:
+        """Send one queued email, runs in a sender thread
+
+        Args:
+            email (dict): Queued email
+            body (str): Its body
+
+        Returns:
+            tuple[str, bool]: Error message, None on success, and whether
+            retrying is pointless
+        """
+        self.limiter.acquire()
+        message = make_message(
+            self.mailer.user, [email["recipient"]], body, email["subject"]
+        )
+
+        try:
+            self.mailer.send(message)
+        except smtplib.SMTPRecipientsRefused as error:
+            return str(error), True
+        except smtplib.SMTPResponseException as error:
+            # 5xx replies are permanent, 4xx are worth another try
+            return str(error), error.smtp_code >= 500
+        except (smtplib.SMTPException, OSError) as error:
+            return str(error) or type(error).__name__, False
+
+        return None, False
+    # <-- End of _send()
+
+    def _record(self, email: dict, error: str, permanent: bool) -> None:
+        """Save the outcome of an attempt
+
+        Args:
+            email (dict): Queued email
+            error (str): Error message, None on success
+            permanent (bool): Give up without retrying
+        """
+        attempts = email["attempts"] + 1
+        fields = {"attempts": attempts, "error": error}
+
+        if error is None:
+            fields["status"] = "sent"
+            fields["sent_at"] = time.time()
+        elif permanent or attempts >= self.max_attempts:
+            fields["status"] = "failed"
+        else:
+            delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+            fields["next_try"] = time.time() + delay
+
+        db_h.db_update_email(self.db, email.doc_id, fields)
+    # <-- End of _record()
+
+    def _body(self, digest: str) -> str:
+        """Read a body once per run"""
+        if digest not in self._bodies:
+            self._bodies[digest] = db_h.db_email_body(self.db, digest)
+        return self._bodies[digest]
+    # <-- End of _body()
+
+    def run(self) -> dict[str, int]:
+        """Send every pending email due now, once
+
+        Emails failing with a temporary error are left pending with a later
+        next_try, the next dispatch sends them, so a run never waits out a
+        retry delay.
+
+        Returns:
+            dict[str, int]: Number of emails per delivery status
+        """
+        due = db_h.db_pending_emails(self.db, time.time())
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            for start in range(0, len(due), self.batch_size):
+                futures = dict()
+                for email in due[start:start + self.batch_size]:
+                    body = self._body(email["digest"])
+                    futures[executor.submit(self._send, email, body)] = email
+
+                for future in as_completed(futures):
+                    self._record(futures[future], *future.result())
+
+                # Sent emails survive a crash from here on
+                self.db.commit()
+
+        return db_h.db_email_status(self.db)
+    # <-- End of run()
+
+# <-- End of class Dispatcher
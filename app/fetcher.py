@@ -0,0 +1,358 @@
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+from cloudscraper import CloudScraper
+
+# Local packages
+from .metrics import metrics
+from .constants import (
+    max_requests_per_host,
+    fetch_rate,
+    fetch_min_rate,
+    fetch_max_rate,
+    fetch_rate_step,
+    fetch_decrease,
+    fetch_retries,
+    fetch_backoff,
+    fetch_max_backoff,
+    breaker_failures,
+    breaker_cooldown,
+    breaker_max_cooldown,
+)
+
+# -------------------------------------
+# Concurrent fetching helpers
+# -------------------------------------
+
+
+# Statuses of a host shedding load, its rate and concurrency are cut
+THROTTLE_STATUS = (429, 503)
+# Statuses worth another try, 52x are Cloudflare failing to reach origin
+RETRY_STATUS = (429, 500, 502, 503, 504, 520, 521, 522, 523, 524)
+# Statuses returned to the caller, 304 answers a revalidation of the cache
+OK_STATUS = (304,)
+
+
+class FetchError(Exception):
+    def __init__(self, url: str, reason: str) -> None:
+        """A request still failing after every retry
+
+        Args:
+            url (str): Requested url
+            reason (str): Last status code or error
+        """
+        super().__init__(f"{url}: {reason}")
+        self.url = url
+        self.reason = reason
+    # <-- End of __init__()
+
+# <-- End of class FetchError
+
+
+def _retry_after(response) -> float:
+    """Seconds asked by a Retry-After header, 0 without one"""
+    if response is None:
+        return 0.0
+    try:
+        return max(0.0, float(response.headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        # Missing, or an http date, the backoff covers those
+        return 0.0
+# <-- End of _retry_after()
+
+
+def _cloudflare_block(response) -> bool:
+    """Check if a 403 comes from Cloudflare refusing the client, which
+    backs off like a throttled host, rather than from the origin"""
+    if response is None or response.status_code != 403:
+        return False
+    server = response.headers.get("Server") or ""
+    return server.lower() == "cloudflare" or \
+        "cf-mitigated" in response.headers
+# <-- End of _cloudflare_block()
+
+
+class HostController:
+    def __init__(
+        self,
+        concurrency: int,
+        rate: float = fetch_rate,
+        min_rate: float = fetch_min_rate,
+        max_rate: float = fetch_max_rate,
+        step: float = fetch_rate_step,
+        decrease: float = fetch_decrease,
+        failures: int = breaker_failures,
+        cooldown: float = breaker_cooldown,
+        max_cooldown: float = breaker_max_cooldown,
+    ) -> None:
+        """Pace requests to one host with additive increase, multiplicative
+        decrease of both concurrency and rate, behind a circuit breaker
+
+        Every healthy response adds step requests per second and about one
+        slot per window of concurrent requests. A throttled one multiplies
+        both by decrease. After failures in a row the breaker opens: nothing
+        is sent for cooldown seconds, doubled each time it opens again, then
+        one request at a time probes the host.
+
+        Args:
+            concurrency (int): Maximum requests in flight
+            rate (float, optional): Starting requests per second. Defaults
+            to fetch_rate.
+            min_rate (float, optional): Floor of the rate. Defaults to
+            fetch_min_rate.
+            max_rate (float, optional): Ceiling of the rate. Defaults to
+            fetch_max_rate.
+            step (float, optional): Rate added per healthy response.
+            Defaults to fetch_rate_step.
+            decrease (float, optional): Share of rate and concurrency kept
+            after throttling. Defaults to fetch_decrease.
+            failures (int, optional): Failures in a row opening the breaker.
+            Defaults to breaker_failures.
+            cooldown (float, optional): Seconds the breaker first stays
+            open. Defaults to breaker_cooldown.
+            max_cooldown (float, optional): Longest time the breaker stays
+            open. Defaults to breaker_max_cooldown.
+        """
+        self.max_concurrency = max(1, concurrency)
+        self.concurrency = float(self.max_concurrency)
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.step = step
+        self.decrease = decrease
+        self.failure_limit = failures
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self.in_flight = 0
+        self.failures = 0  # Failures in a row
+        self.trips = 0  # Openings of the breaker in a row
+        self.open_until = 0.0
+        self._next = 0.0  # Earliest start of the next request
+        self._cond = threading.Condition()
+    # <-- End of __init__()
+
+    def acquire(self) -> None:
+        """Wait until the breaker is closed, a slot is free and the rate
+        allows one more request"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self.open_until > now:
+                    self._cond.wait(self.open_until - now)
+                elif self.in_flight >= int(self.concurrency):
+                    self._cond.wait()
+                else:
+                    break
+
+            self.in_flight += 1
+            slot = max(now, self._next)
+            self._next = slot + 1 / self.rate
+
+        if slot > now:
+            time.sleep(slot - now)
+    # <-- End of acquire()
+
+    def release(self, outcome: str, retry_after: float = 0) -> None:
+        """Free the slot of a finished request and adapt to its outcome
+
+        Args:
+            outcome (str): "ok" for any answer of a healthy host, "throttled"
+            for 429 / 503 and Cloudflare 403, "failed" for other errors
+            retry_after (float, optional): Seconds the host asked to wait.
+            Defaults to 0.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+
+            if outcome == "ok":
+                self.failures = 0
+                self.trips = 0
+                self.concurrency = min(
+                    self.max_concurrency,
+                    self.concurrency + 1 / self.concurrency,
+                )
+                self.rate = min(self.max_rate, self.rate + self.step)
+            else:
+                if outcome == "throttled":
+                    self.concurrency = max(
+                        1.0, self.concurrency * self.decrease
+                    )
+                    self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._next = max(self._next, now + retry_after)
+                self.failures += 1
+
+                if self.failures >= self.failure_limit:
+                    cooldown = min(
+                        self.max_cooldown, self.cooldown * 2 ** self.trips
+                    )
+                    self.open_until = now + max(cooldown, retry_after)
+                    # Half open once the cooldown is over, one probe at a
+                    # time until the host answers again
+                    self.concurrency = 1.0
+                    self.failures = 0
+                    self.trips += 1
+                    metrics.add("breaker_opens")
+
+            self._cond.notify_all()
+    # <-- End of release()
+
+# <-- End of class HostController
+
+
+class AdaptiveSession:
+    def __init__(
+        self,
+        scraper: CloudScraper,
+        per_host: int = max_requests_per_host,
+        rate: float = fetch_rate,
+        retries: int = fetch_retries,
+        backoff: float = fetch_backoff,
+        max_backoff: float = fetch_max_backoff,
+        **controller,
+    ) -> None:
+        """Wrap a scraper session, pacing each host with a HostController
+        and retrying throttled or failed requests
+
+        Retries wait a random time up to backoff doubled every attempt, so
+        parallel workers do not retry in lockstep. Error pages never reach
+        the parsers: a request failing every attempt, or answered with
+        another error status, raises FetchError.
+
+        Args:
+            scraper (CloudScraper): Shared scraper engine
+            per_host (int, optional): Maximum number of in-flight requests
+            per host. Defaults to max_requests_per_host.
+            rate (float, optional): Starting requests per second per host.
+            Defaults to fetch_rate.
+            retries (int, optional): Retries after the first attempt.
+            Defaults to fetch_retries.
+            backoff (float, optional): Longest wait before the first retry.
+            Defaults to fetch_backoff.
+            max_backoff (float, optional): Longest wait before any retry.
+            Defaults to fetch_max_backoff.
+            controller: Other arguments of every HostController
+        """
+        self.scraper = scraper
+        self.per_host = per_host
+        self.rate = rate
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._options = controller
+
+        self._lock = threading.Lock()
+        self._controllers: dict[str, HostController] = dict()
+    # <-- End of __init__()
+
+    def controller(self, url: str) -> HostController:
+        """Get the controller of the host of given url
+
+        Args:
+            url (str): Url about to be requested
+
+        Returns:
+            HostController: Controller of the url's host
+        """
+        host = urlsplit(url).netloc
+
+        with self._lock:
+            if host not in self._controllers:
+                self._controllers[host] = HostController(
+                    self.per_host, self.rate, **self._options
+                )
+            return self._controllers[host]
+    # <-- End of controller()
+
+    def get(self, url: str, **kwargs):
+        """Send a GET request, retrying until the host answers properly
+
+        Args:
+            url (str): Url to fetch
+
+        Raises:
+            FetchError: When every attempt was throttled or failed, or the
+            host answered with a status other than 2xx or 304
+
+        Returns:
+            requests.Response: Response of the request
+        """
+        controller = self.controller(url)
+
+        for attempt in range(self.retries + 1):
+            controller.acquire()
+            response = error = None
+
+            try:
+                response = self.scraper.get(url, **kwargs)
+            except OSError as exc:
+                # Connection errors and timeouts of requests are OSErrors
+                error = exc
+            except BaseException:
+                controller.release("failed")
+                raise
+
+            blocked = _cloudflare_block(response)
+            if error is None and not blocked and \
+                    response.status_code not in RETRY_STATUS:
+                # Any answer, even an error page, comes from a healthy host
+                controller.release("ok")
+                status = response.status_code
+                if 200 <= status < 300 or status in OK_STATUS:
+                    return response
+                raise FetchError(url, f"status {status}")
+
+            throttled = blocked or (
+                error is None and response.status_code in THROTTLE_STATUS
+            )
+            controller.release(
+                "throttled" if throttled else "failed", _retry_after(response)
+            )
+
+            if attempt < self.retries:
+                metrics.add("http_retries")
+                time.sleep(
+                    random.uniform(
+                        0, min(self.max_backoff, self.backoff * 2 ** attempt)
+                    )
+                )
+
+        reason = repr(error) if error is not None else \
+            f"status {response.status_code}"
+        raise FetchError(url, reason)
+    # <-- End of get()
+
+# <-- End of class AdaptiveSession
+
+
+class MeteredSession:
+    def __init__(self, scraper: CloudScraper) -> None:
+        """Wrap a scraper session, recording latency, status and size of
+        every response in the run metrics
+
+        Args:
+            scraper (CloudScraper): Shared scraper engine
+        """
+        self.scraper = scraper
+    # <-- End of __init__()
+
+    def get(self, url: str, **kwargs):
+        """Send a GET request and record it
+
+        Args:
+            url (str): Url to fetch
+
+        Returns:
+            requests.Response: Response of the request
+        """
+        with metrics.timer("http_request"):
+            response = self.scraper.get(url, **kwargs)
+
+        metrics.add("http_requests", status=response.status_code)
+        metrics.add("http_bytes", len(response.content))
+        return response
+    # <-- End of get()
+
+# <-- End of class MeteredSession
@@ -1,14 +1,13 @@
-import os
-import random
-import smtplib
 import datetime
-import numpy as np
 from bs4 import BeautifulSoup
 from cloudscraper import CloudScraper
-from email.message import EmailMessage
+from concurrent.futures import Executor
 
 # Local packages
-from .constants import default_subjects, default_avatar
+from . import parsers
+from .mailer import Mailer, make_message
+from .metrics import metrics
+from .constants import default_avatar, model_page_query
 
 # -------------------------------------
 # Web scraping helper functions
@@ -47,14 +46,10 @@ def get_tags(response: BeautifulSoup) -> list[str]:
     Returns:
         list[str]: Tags for this video
     """
-    tags = np.array([])
     html = response.find("h5", {"class": "tags h6-md"})
 
     # Loop through every tag
-    for tag in html.find_all("a"):
-        tags = np.append(tags, tag.contents[0])
-
-    return tags.tolist()
+    return [str(tag.contents[0]) for tag in html.find_all("a")]
 # <-- End of get_tags()
 
 
@@ -90,8 +85,144 @@ def get_date(response: BeautifulSoup) -> datetime:
 # <-- End of get_date()
 
 
+def parse_video_card(html: BeautifulSoup, model: str) -> dict:
+    """Parse a video card on the model page
+
+    Args:
+        html (BeautifulSoup): Video card element of the model page
+        model (str): Name of the model
+
+    Returns:
+        dict: Video data without tags and upload time
+    """
+    video = dict()
+
+    # Add model name to video
+    video["model"] = model
+
+    # Parse video id and video name
+    raw_name = html.h6.contents[0].contents[0].split(" ")
+    video_id = raw_name[0]
+    name = " ".join(raw_name[1:])
+
+    video["id"] = video_id
+    video["name"] = name
+
+    # Parse video image source
+    video["image"] = html.img["data-src"]
+
+    # Parse video link
+    video["link"] = html.a["href"]
+
+    # Parse video view count
+    subtitle = html.find("p", {"class": "sub-title"})
+    views = subtitle.contents[2].replace(" ", "").strip("\n")
+    views = int(views)
+    video["views"] = views
+
+    # Parse video like count
+    likes = subtitle.contents[4].replace(" ", "").strip("\n")
+    likes = int(likes)
+    video["likes"] = likes
+
+    return video
+# <-- End of parse_video_card()
+
+
+def parse_video_page(video: dict, page: bytes) -> None:
+    """Add tags, upload day and subtitle flag from the video page, the
+    video then follows the current schema, see schema.py
+
+    Args:
+        video (dict): Video parsed from the model page
+        page (bytes): Webpage content of the video
+    """
+    # Get video tags and upload day
+    video["tags"], video["uploaded"] = parsers.parse_video_details(page)
+
+    # Check if there's subtitle
+    video["subtitle"] = "中文字幕" in video["tags"]
+# <-- End of parse_video_page()
+
+
+def filter_new_videos(
+    content: list[dict], known: set[tuple[str, str]] = None
+) -> list[dict]:
+    """Filter out videos already in database
+
+    Args:
+        content (list[dict]): Videos parsed from the model page
+        known (set[tuple[str, str]], optional): (id, link) of videos already
+        in database. Defaults to None, which treats every video as new.
+
+    Returns:
+        list[dict]: Videos whose video page still needs to be fetched
+    """
+    if not known:
+        return content
+
+    return [
+        video for video in content if (video["id"], video["link"]) not in known
+    ]
+# <-- End of filter_new_videos()
+
+
+def parse_video_cards(
+    response: BeautifulSoup, model: str, limit: int = 0
+) -> list[dict]:
+    """Parse all video cards on a model page
+
+    Args:
+        response (BeautifulSoup): Webpage content of the model
+        model (str): Name of the model
+        limit (int, optional): Number of videos to parse. Defaults to 0.
+
+    Returns:
+        list[dict]: Videos without tags and upload time
+    """
+    return [
+        parse_video_card(html, model)
+        for html in response.find_all(
+            "div", {"class": "col-6 col-sm-4 col-lg-3"}, limit=limit
+        )
+    ]
+# <-- End of parse_video_cards()
+
+
+def fetch_video_pages(
+    scraper: CloudScraper,
+    content: list[dict],
+    executor: Executor = None,
+    known: set[tuple[str, str]] = None,
+) -> None:
+    """Fetch video pages of new videos and add their details
+
+    Args:
+        scraper (CloudScraper): Scraper engine
+        content (list[dict]): Videos parsed from model pages
+        executor (Executor, optional): Executor to fetch video pages in
+        parallel. Defaults to None, which fetches them one by one.
+        known (set[tuple[str, str]], optional): (id, link) of videos already
+        in database, their video pages are not fetched. Defaults to None.
+    """
+    # Fetch video pages of new videos, results keep the order of content
+    new_videos = filter_new_videos(content, known)
+    mapper = map if executor is None else executor.map
+    pages = mapper(lambda video: scraper.get(video["link"]).content, new_videos)
+
+    for video, page in zip(new_videos, pages):
+        parse_video_page(video, page)
+# <-- End of fetch_video_pages()
+
+
+@metrics.timed("get_videos")
 def get_videos(
-    scraper: CloudScraper, response: BeautifulSoup, model: str, limit: int = 0
+    scraper: CloudScraper,
+    response: BeautifulSoup,
+    model: str,
+    limit: int = 0,
+    executor: Executor = None,
+    known: set[tuple[str, str]] = None,
 ) -> list[dict[str, str]]:
     """Scrape videos data on jable.tv
 
@@ -100,71 +231,152 @@ def get_videos(
         response (BeautifulSoup): Webpage content of the model
         model (str): Name of the model
         limit (int, optional): Number of videos to scrape. Defaults to 0.
+        executor (Executor, optional): Executor to fetch video pages in
+        parallel. Defaults to None, which fetches them one by one.
+        known (set[tuple[str, str]], optional): (id, link) of videos already
+        in database, their video pages are not fetched. Defaults to None.
+
+    Returns:
+        list[dict[str, str]]: List of videos in the order of model page,
+        known videos only carry the data of the model page
+    """
+    content = parse_video_cards(response, model, limit)
+    fetch_video_pages(scraper, content, executor, known)
+
+    return content
+# <-- End of get_videos()
+
+
+def get_page_count(response: BeautifulSoup) -> int:
+    """Read number of listing pages from the pagination of a model page
+
+    Args:
+        response (BeautifulSoup): Webpage content of the model
 
     Returns:
-        list[dict[str, str]]: [description]
+        int: Number of listing pages, 1 when there's no pagination
     """
-    content = list()
+    count = 1
+    html = response.find("ul", {"class": "pagination"})
 
-    # Loop through model page
-    for html in response.find_all(
-        "div", {"class": "col-6 col-sm-4 col-lg-3"}, limit=limit
-    ):
-        video = dict()
+    if html is None:  # When all videos fit in one page
+        return count
 
-        # Add model name to video
-        video["model"] = model
+    for link in html.find_all("a", {"class": "page-link"}):
+        for parameter in link.get("data-parameters", "").split(";"):
+            key, _, value = parameter.partition(":")
+            if key == "from" and value.isdigit():
+                count = max(count, int(value))
 
-        # Parse video id and video name
-        raw_name = html.h6.contents[0].contents[0].split(" ")
-        video_id = raw_name[0]
-        name = " ".join(raw_name[1:])
+    return count
+# <-- End of get_page_count()
 
-        video["id"] = video_id
-        video["name"] = name
 
-        # Parse video image source
-        video["image"] = html.img["data-src"]
+def model_page_url(url: str, page: int) -> str:
+    """Build the url of a listing page of a model
 
-        # Parse video link
-        video["link"] = html.a["href"]
+    Args:
+        url (str): Link to model webpage
+        page (int): Page number, starts from 1
 
-        # Parse video view count
-        subtitle = html.find("p", {"class": "sub-title"})
-        views = subtitle.contents[2].replace(" ", "").strip("\n")
-        views = int(views)
-        video["views"] = views
+    Returns:
+        str: Url of the listing page
+    """
+    if page == 1:
+        return url
+    return url + model_page_query.format(page=page)
+# <-- End of model_page_url()
 
-        # Parse video like count
-        likes = subtitle.contents[4].replace(" ", "").strip("\n")
-        likes = int(likes)
-        video["likes"] = likes
 
-        # Fetch video page
-        video_page = BeautifulSoup(scraper.get(video["link"]).content, "lxml")
+def _walk_pages(fetch_page, count: int, watermark: str, links: set[str]):
+    """Yield listing pages one by one until the watermark video shows up
 
-        # Get video tags
-        video["tags"] = get_tags(video_page)
-        # Get video upload time
-        video["upload time"] = get_date(video_page)
+    Args:
+        fetch_page (Callable[[int], list[dict]]): Fetch and parse a page
+        count (int): Number of listing pages
+        watermark (str): Link of newest video saved last time
+        links (set[str]): Links seen so far, filled in by the caller
 
-        # Check if there's subtitle
-        if "中文字幕" in video["tags"]:
-            video["subtitile"] = True
-        else:
-            video["subtitle"] = False
+    Yields:
+        list[dict]: Videos of the next listing page
+    """
+    for page in range(2, count + 1):
+        if watermark in links:
+            break
+        yield fetch_page(page)
+# <-- End of _walk_pages()
+
+
+@metrics.timed("crawl_model")
+def crawl_model(
+    scraper: CloudScraper,
+    page: bytes,
+    url: str,
+    model: str,
+    watermark: str = None,
+    backfill: bool = False,
+    executor: Executor = None,
+    known: set[tuple[str, str]] = None,
+) -> list[dict[str, str]]:
+    """Scrape videos over the listing pages of a model, newest first
 
-        # Add video to model content
-        content.append(video)
+    Pages are fetched one by one until the page holding the watermark
+    video, so a daily run usually touches the first page only. Without a
+    watermark, or when backfilling, every page is fetched, in parallel when
+    an executor is given.
+
+    Args:
+        scraper (CloudScraper): Scraper engine
+        page (bytes): Webpage content of the first page of the model
+        url (str): Link to model webpage
+        model (str): Name of the model
+        watermark (str, optional): Link of newest video saved last time.
+        Defaults to None.
+        backfill (bool, optional): Crawl all pages regardless of the
+        watermark. Defaults to False.
+        executor (Executor, optional): Executor to fetch pages in parallel.
+        Defaults to None.
+        known (set[tuple[str, str]], optional): (id, link) of videos already
+        in database, their video pages are not fetched. Defaults to None.
+
+    Returns:
+        list[dict[str, str]]: List of videos in the order of listing pages
+    """
+    tree = parsers.parse_html(page)
+    content = parsers.parse_cards(tree, model)
+    count = parsers.parse_page_count(tree)
+    links = {video["link"] for video in content}
+    del tree
+
+    def fetch_page(page: int) -> list[dict]:
+        page_url = model_page_url(url, page)
+        html = parsers.parse_html(scraper.get(page_url).content)
+        return parsers.parse_cards(html, model)
+
+    if watermark is None or backfill:
+        mapper = map if executor is None else executor.map
+        pages = mapper(fetch_page, range(2, count + 1))
+    else:
+        pages = _walk_pages(fetch_page, count, watermark, links)
+
+    for videos in pages:
+        for video in videos:
+            # Listing can shift while crawling, skip repeated cards
+            if video["link"] not in links:
+                links.add(video["link"])
+                content.append(video)
+
+    fetch_video_pages(scraper, content, executor, known)
 
     return content
-# <-- End of get_videos()
+# <-- End of crawl_model()
 
 # -------------------------------------
 # Email helper functions
 # -------------------------------------
 
 
+@metrics.timed("send_email")
 def send_email(recipients: list[str], body: str) -> None:
     """Send email with given body to given recipients
 
@@ -172,41 +384,6 @@ def send_email(recipients: list[str], body: str) -> None:
         recipients (list[str]): List of recipients' email address
         body (str): Body of the email
     """
-    gmail = os.getenv('gmail')
-    app_pw = os.getenv('app_password')
-    server = smtplib.SMTP("smtp.gmail.com", 587)
-
-    server.ehlo()
-    server.starttls()
-    server.ehlo()
-    server.login(gmail, app_pw)
-
-    message = EmailMessage()
-    message["From"] = gmail
-    message["To"] = ", ".join(recipients)
-    message["Subject"] = random.choice(default_subjects)
-    message.set_content(body, subtype="html")
-
-    server.send_message(message)
-
-    server.quit()
+    with Mailer() as mailer:
+        mailer.send(make_message(mailer.user, recipients, body))
 # <-- End of send_mail()
-
-
-def convert_timestamp(videos: list[dict]) -> None:
-    for video in videos:
-        video["upload time"] = datetime.datetime.strptime(
-            video["upload time"], "%m/%d/%Y"
-        )
-# <-- End of convert_timestamp()
-
-
-def format_video_names(videos: list[dict]) -> None:
-    CHAR_LIMIT = 30
-    CHAR_LIMIT_WITH_DOT = CHAR_LIMIT - 3
-    for video in videos:
-        video["name"] = (
-            video["name"] if len(video["name"]) < CHAR_LIMIT else
-            video["name"][:CHAR_LIMIT_WITH_DOT] + "..."
-        )
-# <-- End of format_video_names()
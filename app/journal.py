@@ -0,0 +1,120 @@
+import os
+import json
+import time
+from typing import Iterable, Iterator
+
+# Local packages
+from .metrics import metrics
+from .constants import fetch_journal_max_age
+
+# -------------------------------------
+# Fetch journal
+# -------------------------------------
+#
+# Every model is appended to the journal, and synced, as soon as its pages
+# are parsed, before its videos reach the database. A fetch crashing half
+# way leaves the completed models in the journal: the next fetch replays
+# them into the database and only fetches the others. The journal is removed
+# once the database commit of the fetch succeeded.
+
+
+class Journal:
+    def __init__(
+        self, path: str, max_age: int = fetch_journal_max_age
+    ) -> None:
+        """Write-ahead journal of the models completed by a fetch
+
+        Args:
+            path (str): Path to the journal file
+            max_age (int, optional): Seconds a journal is resumed from.
+            Defaults to fetch_journal_max_age.
+        """
+        self.path = path
+        self.max_age = max_age
+    # <-- End of __init__()
+
+    def replay(self, models: dict[str, str]) -> dict[str, tuple]:
+        """Read the models completed by a previous fetch
+
+        A record torn by a crash is cut off, so the next record starts on a
+        line of its own. A journal older than max_age is discarded.
+
+        Args:
+            models (dict[str, str]): Models still watched, others are
+            dropped
+
+        Returns:
+            dict[str, tuple]: [key]: model name, [value]: avatar and videos,
+            in the order they were completed
+        """
+        try:
+            if time.time() - os.path.getmtime(self.path) > self.max_age:
+                self.truncate()
+                return dict()
+            with open(self.path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return dict()
+
+        done = dict()
+        offset = 0
+        for line in data.splitlines(keepends=True):
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("Torn record")
+                record = json.loads(line)
+            except ValueError:
+                break
+            offset += len(line)
+            if record["model"] in models:
+                done[record["model"]] = (record["avatar"], record["videos"])
+
+        if offset < len(data):
+            with open(self.path, "r+b") as file:
+                file.truncate(offset)
+
+        metrics.add("models_replayed", len(done))
+        return done
+    # <-- End of replay()
+
+    def record(self, models: dict[str, str], results: Iterable) -> Iterator:
+        """Append every completed model to the journal while passing the
+        results on
+
+        Args:
+            models (dict[str, str]): Fetched models
+            results (Iterable[tuple[str, list[dict]]]): Avatar and videos of
+            every model, in the order of models, None for models which
+            failed, those are not recorded and fetched again on resume
+
+        Yields:
+            Iterator[tuple[str, list[dict]]]: results, each one synced to
+            the journal first
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as file:
+            for (model, url), result in zip(models.items(), results):
+                if result is not None:
+                    avatar, videos = result
+                    record = {
+                        "model": model,
+                        "url": url,
+                        "avatar": avatar,
+                        "videos": videos,
+                    }
+                    file.write(json.dumps(record, ensure_ascii=False))
+                    file.write("\n")
+                    file.flush()
+                    os.fsync(file.fileno())
+                yield result
+    # <-- End of record()
+
+    def truncate(self) -> None:
+        """Forget every completed model, the fetch is saved"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+    # <-- End of truncate()
+
+# <-- End of class Journal
@@ -0,0 +1,233 @@
+import os
+import queue
+import random
+import smtplib
+import threading
+from email.message import EmailMessage
+
+# Local packages
+from .metrics import metrics
+from .constants import (
+    default_subjects,
+    smtp_host,
+    smtp_port,
+    smtp_pool_size,
+    smtp_max_messages,
+)
+
+# -------------------------------------
+# Pooled smtp mailer
+# -------------------------------------
+
+# Errors after which a connection is thrown away and the send retried once
+_dropped = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+def make_message(
+    sender: str, recipients: list[str], body: str, subject: str = None
+) -> EmailMessage:
+    """Build an html email
+
+    Args:
+        sender (str): From address
+        recipients (list[str]): To addresses
+        body (str): Html body of the email
+        subject (str, optional): Subject line. Defaults to None, which picks
+        a random default subject.
+
+    Returns:
+        EmailMessage: The email
+    """
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = ", ".join(recipients)
+    message["Subject"] = subject or random.choice(default_subjects)
+    message.set_content(body, subtype="html")
+    return message
+# <-- End of make_message()
+
+
+class Mailer:
+    def __init__(
+        self,
+        user: str = None,
+        password: str = None,
+        host: str = smtp_host,
+        port: int = smtp_port,
+        pool_size: int = smtp_pool_size,
+        max_messages: int = smtp_max_messages,
+        starttls: bool = True,
+        timeout: float = 30,
+    ) -> None:
+        """Send emails over a pool of authenticated smtp connections
+
+        Connections are opened on demand, at most pool_size of them, and
+        reused for every following email. A connection is renewed after
+        max_messages emails, and replaced transparently when the server
+        dropped it.
+
+        Args:
+            user (str, optional): Login user. Defaults to None, which reads
+            gmail environment variable.
+            password (str, optional): Login password. Defaults to None,
+            which reads app_password environment variable.
+            host (str, optional): Smtp server. Defaults to smtp_host.
+            port (int, optional): Smtp port. Defaults to smtp_port.
+            pool_size (int, optional): Maximum open connections. Defaults to
+            smtp_pool_size.
+            max_messages (int, optional): Emails sent per connection before
+            it is renewed. Defaults to smtp_max_messages.
+            starttls (bool, optional): Upgrade connections to tls. Defaults
+            to True.
+            timeout (float, optional): Socket timeout in seconds. Defaults
+            to 30.
+        """
+        self.user = user or os.getenv("gmail")
+        self.password = password or os.getenv("app_password")
+        self.host = host
+        self.port = port
+        self.max_messages = max_messages
+        self.starttls = starttls
+        self.timeout = timeout
+
+        # Idle connections, and a slot for every connection allowed
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        # [key]: connection, [value]: emails sent over it
+        self._sent: dict[smtplib.SMTP, int] = dict()
+        self._lock = threading.Lock()
+        self.connections = 0  # Connections opened so far
+    # <-- End of __init__()
+
+    def __enter__(self) -> "Mailer":
+        return self
+    # <-- End of __enter__()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+    # <-- End of __exit__()
+
+    def _connect(self) -> smtplib.SMTP:
+        """Open and authenticate a new connection
+
+        Returns:
+            smtplib.SMTP: Ready connection
+        """
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        server.ehlo()
+        if self.starttls:
+            server.starttls()
+            server.ehlo()
+        if self.user:
+            server.login(self.user, self.password)
+
+        with self._lock:
+            self.connections += 1
+            self._sent[server] = 0
+        metrics.add("smtp_connections")
+        return server
+    # <-- End of _connect()
+
+    def _discard(self, server: smtplib.SMTP) -> None:
+        """Close a connection, ignoring servers which already left"""
+        with self._lock:
+            self._sent.pop(server, None)
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+    # <-- End of _discard()
+
+    def _acquire(self) -> smtplib.SMTP:
+        """Take an idle connection, or open one"""
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        try:
+            return self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+    # <-- End of _acquire()
+
+    def _release(self, server: smtplib.SMTP) -> None:
+        """Give a connection back to the pool, renewing worn out ones"""
+        if server is not None:
+            if self._sent.get(server, 0) >= self.max_messages:
+                self._discard(server)
+            else:
+                self._idle.put(server)
+        self._slots.release()
+    # <-- End of _release()
+
+    @metrics.timed("smtp_send")
+    def send(self, message: EmailMessage) -> None:
+        """Send an email, reconnecting once if the connection dropped
+
+        Args:
+            message (EmailMessage): The email
+
+        Raises:
+            smtplib.SMTPException: When the server refuses the email
+        """
+        server = self._acquire()
+
+        try:
+            try:
+                server.send_message(message)
+            except _dropped:
+                # Idle connections time out on the server side, retry on a
+                # fresh one
+                metrics.add("smtp_reconnects")
+                self._discard(server)
+                server = None
+                server = self._connect()
+                server.send_message(message)
+        except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+            # Refused email, the connection itself is still usable
+            metrics.add("smtp_emails", status="refused")
+            self._release(server)
+            raise
+        except BaseException:
+            metrics.add("smtp_emails", status="error")
+            if server is not None:
+                self._discard(server)
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._sent[server] += 1
+        metrics.add("smtp_emails", status="sent")
+        self._release(server)
+    # <-- End of send()
+
+    def send_many(self, messages) -> int:
+        """Send emails one after another over pooled connections
+
+        Args:
+            messages (Iterable[EmailMessage]): The emails
+
+        Returns:
+            int: Number of emails sent
+        """
+        count = 0
+        for message in messages:
+            self.send(message)
+            count += 1
+        return count
+    # <-- End of send_many()
+
+    def close(self) -> None:
+        """Close every idle connection"""
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(server)
+    # <-- End of close()
+
+# <-- End of class Mailer
@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import threading
+import functools
+from typing import Callable, Iterable, Iterator
+
+# -------------------------------------
+# Run metrics
+# -------------------------------------
+#
+# Stages record their wall time and counters into the process registry,
+# each record is a clock read and a dict update under a lock, so metrics
+# stay on in production. At the end of a run the registry is written as a
+# JSON report and as a Prometheus textfile for node-exporter.
+
+# Prefix of every Prometheus metric name
+prefix = "jable"
+
+
+def _key(name: str, labels: dict) -> tuple:
+    """Hashable key of a metric and its labels"""
+    return (name, tuple(sorted(labels.items())))
+# <-- End of _key()
+
+
+def _labels(pairs: tuple) -> str:
+    """Render labels in Prometheus text format"""
+    if len(pairs) == 0:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+# <-- End of _labels()
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "labels", "begin", "excluded")
+
+    def __init__(self, metrics: "Metrics", name: str, labels: dict) -> None:
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.excluded = 0.0
+    # <-- End of __init__()
+
+    def __enter__(self) -> "_Timer":
+        self.begin = time.perf_counter()
+        return self
+    # <-- End of __enter__()
+
+    def __exit__(self, *exc) -> None:
+        self.metrics.observe(
+            self.name,
+            time.perf_counter() - self.begin - self.excluded,
+            **self.labels,
+        )
+    # <-- End of __exit__()
+
+    def exclude(self, items: Iterable) -> Iterator:
+        """Pass a lazy stream through, the time spent producing its items
+        is left out of the stage, e.g. the fetch feeding a database write
+
+        Args:
+            items (Iterable): Stream consumed inside the timed block
+
+        Yields:
+            Iterator: items
+        """
+        items = iter(items)
+        while True:
+            begin = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                self.excluded += time.perf_counter() - begin
+            yield item
+    # <-- End of exclude()
+
+# <-- End of class _Timer
+
+
+class Metrics:
+    def __init__(self) -> None:
+        """Thread safe registry of stage timings and counters"""
+        # [key]: (name, labels), [value]: [count, total seconds, max seconds]
+        self._timings: dict[tuple, list] = dict()
+        # [key]: (name, labels), [value]: total
+        self._counters: dict[tuple, float] = dict()
+        self._lock = threading.Lock()
+        self.started = time.time()
+    # <-- End of __init__()
+
+    def reset(self) -> None:
+        """Forget everything recorded, a new run starts"""
+        with self._lock:
+            self._timings.clear()
+            self._counters.clear()
+            self.started = time.time()
+    # <-- End of reset()
+
+    def add(self, name: str, value: float = 1, **labels) -> None:
+        """Increase a counter
+
+        Args:
+            name (str): Counter name, e.g. "http_bytes"
+            value (float, optional): Increment. Defaults to 1.
+            labels: Label values of the counter
+        """
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    # <-- End of add()
+
+    def observe(self, stage: str, seconds: float, **labels) -> None:
+        """Record one run of a stage
+
+        Args:
+            stage (str): Stage name, e.g. "fetch"
+            seconds (float): Wall time of the run
+            labels: Extra label values of the stage
+        """
+        key = _key(stage, labels)
+        with self._lock:
+            timing = self._timings.get(key)
+            if timing is None:
+                self._timings[key] = [1, seconds, seconds]
+            else:
+                timing[0] += 1
+                timing[1] += seconds
+                timing[2] = max(timing[2], seconds)
+    # <-- End of observe()
+
+    def timer(self, stage: str, **labels) -> _Timer:
+        """Time the body of a with statement as a run of a stage
+
+        Args:
+            stage (str): Stage name
+            labels: Extra label values of the stage
+
+        Returns:
+            _Timer: Context manager recording on exit, also on errors
+        """
+        return _Timer(self, stage, labels)
+    # <-- End of timer()
+
+    def timed(self, stage: str, **labels) -> Callable:
+        """Decorator timing every call of a function as a run of a stage
+
+        Args:
+            stage (str): Stage name
+            labels: Extra label values of the stage
+
+        Returns:
+            Callable: Decorator
+        """
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                begin = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(
+                        stage, time.perf_counter() - begin, **labels
+                    )
+            return wrapper
+        return decorator
+    # <-- End of timed()
+
+    def counter(self, name: str, **labels) -> float:
+        """Current value of a counter, 0 when never increased"""
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+    # <-- End of counter()
+
+    def report(self, job: str = None) -> dict:
+        """Snapshot of everything recorded
+
+        Args:
+            job (str, optional): Name of the run. Defaults to None.
+
+        Returns:
+            dict: Run report, stages and counters with labels
+        """
+        with self._lock:
+            timings = sorted(self._timings.items())
+            counters = sorted(self._counters.items())
+
+        return {
+            "job": job,
+            "started": self.started,
+            "finished": time.time(),
+            "stages": [
+                {
+                    "stage": name,
+                    "labels": dict(labels),
+                    "count": count,
+                    "seconds": total,
+                    "max_seconds": longest,
+                }
+                for (name, labels), (count, total, longest) in timings
+            ],
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in counters
+            ],
+        }
+    # <-- End of report()
+
+    def to_prometheus(self, job: str) -> str:
+        """Render everything recorded in Prometheus text format
+
+        Stages become the stage_seconds family, labelled by stage and job,
+        counters become one _total family each.
+
+        Args:
+            job (str): Name of the run, added as job label
+
+        Returns:
+            str: Textfile content
+        """
+        with self._lock:
+            timings = sorted(self._timings.items())
+            counters = sorted(self._counters.items())
+
+        lines = list()
+        family = f"{prefix}_stage_seconds"
+
+        if len(timings) > 0:
+            lines.append(f"# HELP {family} Wall time spent in each stage.")
+            lines.append(f"# TYPE {family} summary")
+        for suffix, column in (("sum", 1), ("count", 0)):
+            for (name, labels), timing in timings:
+                pairs = (("job", job), ("stage", name)) + labels
+                lines.append(
+                    f"{family}_{suffix}{_labels(pairs)} {timing[column]}"
+                )
+        if len(timings) > 0:
+            lines.append(f"# TYPE {family}_max gauge")
+        for (name, labels), timing in timings:
+            pairs = (("job", job), ("stage", name)) + labels
+            lines.append(f"{family}_max{_labels(pairs)} {timing[2]}")
+
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"{prefix}_{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_labels((('job', job),) + labels)} {value}")
+
+        metric = f"{prefix}_last_run_timestamp_seconds"
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f'{metric}{{job="{job}"}} {time.time()}')
+
+        return "\n".join(lines) + "\n"
+    # <-- End of to_prometheus()
+
+    def export(self, job: str, report_dir: str, textfile_dir: str = None):
+        """Write the JSON run report and the Prometheus textfile of a job,
+        each replaced atomically so readers never see half a file
+
+        Args:
+            job (str): Name of the run, e.g. "fetch"
+            report_dir (str): Directory of <job>.json
+            textfile_dir (str, optional): Directory of <prefix>_<job>.prom.
+            Defaults to None, which uses report_dir.
+
+        Returns:
+            tuple[str, str]: Paths of the report and the textfile
+        """
+        textfile_dir = textfile_dir or report_dir
+        report_path = os.path.join(report_dir, f"{job}.json")
+        textfile_path = os.path.join(textfile_dir, f"{prefix}_{job}.prom")
+
+        _write_atomic(report_path, json.dumps(self.report(job), indent=2))
+        _write_atomic(textfile_path, self.to_prometheus(job))
+        return report_path, textfile_path
+    # <-- End of export()
+
+# <-- End of class Metrics
+
+
+def _write_atomic(path: str, text: str) -> None:
+    """Replace a file with new content in one rename"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(text)
+    os.replace(temp_path, path)
+# <-- End of _write_atomic()
+
+
+# Registry of the process, every module records here
+metrics = Metrics()
@@ -0,0 +1,220 @@
+import calendar
+import datetime
+import threading
+from lxml import etree, html as lxml_html
+
+# Local packages
+from .metrics import metrics
+from .constants import default_avatar
+
+# -------------------------------------
+# Fast lxml parsing helpers
+# -------------------------------------
+#
+# Same extraction as the BeautifulSoup helpers, but with precompiled XPath
+# expressions run on a plain lxml tree. Only the nodes being read are
+# touched and no tree outlives the call.
+
+
+def _has_class(name: str) -> str:
+    """XPath predicate matching elements having given class token"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+# <-- End of _has_class()
+
+
+_video_cards = etree.XPath('//div[@class="col-6 col-sm-4 col-lg-3"]')
+_card_title = etree.XPath("(.//h6)[1]")
+_card_image = etree.XPath("(.//img)[1]/@data-src")
+_card_link = etree.XPath("(.//a)[1]/@href")
+_card_subtitle = etree.XPath(f"(.//p[{_has_class('sub-title')}])[1]")
+_avatar = etree.XPath(f"(//img[{_has_class('avatar')}])[1]")
+_tags = etree.XPath('(//h5[@class="tags h6-md"])[1]//a')
+_upload_time = etree.XPath(f"(//span[{_has_class('mr-3')}])[1]")
+_page_parameters = etree.XPath(
+    f"//ul[{_has_class('pagination')}]//a[{_has_class('page-link')}]"
+    "/@data-parameters"
+)
+
+# Parsers can't be shared between threads, each thread gets its own
+_local = threading.local()
+
+# Units of relative upload time
+_time_units = {
+    "小時前": datetime.timedelta(hours=1),
+    "天前": datetime.timedelta(days=1),
+    "星期前": datetime.timedelta(weeks=1),
+    "個月前": datetime.timedelta(days=30),
+    "年前": datetime.timedelta(days=365),
+}
+
+
+@metrics.timed("parse_html")
+def parse_html(content: bytes) -> etree._Element:
+    """Parse webpage content into a lxml tree
+
+    Args:
+        content (bytes): Webpage content
+
+    Returns:
+        etree._Element: Root of the document
+    """
+    if not hasattr(_local, "parser"):
+        # Jable.tv serves utf-8, async listing blocks come without a charset
+        _local.parser = lxml_html.HTMLParser(encoding="utf-8")
+
+    return lxml_html.document_fromstring(content, parser=_local.parser)
+# <-- End of parse_html()
+
+
+def parse_avatar(tree: etree._Element) -> str:
+    """Fast counterpart of helpers.fetch_model_avatar
+
+    Args:
+        tree (etree._Element): Webpage of the model
+
+    Returns:
+        str: Model avatar image source
+    """
+    html = _avatar(tree)
+
+    if len(html) == 0:  # When theres no avatar
+        return default_avatar
+    elif "src" in html[0].attrib:  # When it has src attribute
+        return html[0].attrib["src"]
+    elif "data-cfsrc" in html[0].attrib:  # When it has data-cfsrc attribute
+        return html[0].attrib["data-cfsrc"]
+
+    return default_avatar
+# <-- End of parse_avatar()
+
+
+def _count(text: str) -> int:
+    """Parse a spaced count like '1 234 567'"""
+    return int(text.replace(" ", "").strip("\n"))
+# <-- End of _count()
+
+
+@metrics.timed("parse_cards")
+def parse_cards(
+    tree: etree._Element, model: str, limit: int = 0
+) -> list[dict]:
+    """Fast counterpart of helpers.parse_video_cards
+
+    Args:
+        tree (etree._Element): Webpage of the model
+        model (str): Name of the model
+        limit (int, optional): Number of videos to parse. Defaults to 0.
+
+    Returns:
+        list[dict]: Videos without tags and upload time
+    """
+    content = list()
+
+    for card in _video_cards(tree):
+        if limit and len(content) >= limit:
+            break
+
+        # Title is the text of the first child of h6
+        raw_name = _card_title(card)[0][0].text.split(" ")
+        subtitle = _card_subtitle(card)[0]
+
+        content.append({
+            "model": model,
+            "id": raw_name[0],
+            "name": " ".join(raw_name[1:]),
+            "image": _card_image(card)[0],
+            "link": _card_link(card)[0],
+            # Counts are the text following each icon
+            "views": _count(subtitle[0].tail),
+            "likes": _count(subtitle[1].tail),
+        })
+
+    return content
+# <-- End of parse_cards()
+
+
+def parse_page_count(tree: etree._Element) -> int:
+    """Fast counterpart of helpers.get_page_count
+
+    Args:
+        tree (etree._Element): Webpage of the model
+
+    Returns:
+        int: Number of listing pages, 1 when there's no pagination
+    """
+    count = 1
+
+    for parameters in _page_parameters(tree):
+        for parameter in parameters.split(";"):
+            key, _, value = parameter.partition(":")
+            if key == "from" and value.isdigit():
+                count = max(count, int(value))
+
+    return count
+# <-- End of parse_page_count()
+
+
+def parse_tags(tree: etree._Element) -> list[str]:
+    """Fast counterpart of helpers.get_tags
+
+    Args:
+        tree (etree._Element): Webpage of the video
+
+    Returns:
+        list[str]: Tags for this video
+    """
+    return [tag.text for tag in _tags(tree)]
+# <-- End of parse_tags()
+
+
+def _upload_day(tree: etree._Element) -> datetime.datetime:
+    """Turn relative upload time of a video page into a datetime"""
+    now = datetime.datetime.now()
+    raw_time = _upload_time(tree)[0].text.split(" ")
+
+    x = int(raw_time[0])
+    unit = _time_units.get(raw_time[1])
+    return now if unit is None else now - unit * x
+# <-- End of _upload_day()
+
+
+def parse_date(tree: etree._Element) -> str:
+    """Fast counterpart of helpers.get_date
+
+    Args:
+        tree (etree._Element): Webpage of the video
+
+    Returns:
+        str: Upload time of this video in %m/%d/%Y
+    """
+    return _upload_day(tree).strftime("%m/%d/%Y")
+# <-- End of parse_date()
+
+
+def parse_uploaded(tree: etree._Element) -> int:
+    """Parse upload day of a video as schema.to_epoch would store it
+
+    Args:
+        tree (etree._Element): Webpage of the video
+
+    Returns:
+        int: Epoch seconds of the upload day at 00:00 UTC
+    """
+    return calendar.timegm(_upload_day(tree).date().timetuple())
+# <-- End of parse_uploaded()
+
+
+@metrics.timed("parse_video_details")
+def parse_video_details(content: bytes) -> tuple[list[str], int]:
+    """Parse tags and upload day from a video page
+
+    Args:
+        content (bytes): Webpage content of the video
+
+    Returns:
+        tuple[list[str], int]: Tags and upload day of the video in epoch
+        seconds
+    """
+    tree = parse_html(content)
+    return parse_tags(tree), parse_uploaded(tree)
+# <-- End of parse_video_details()
@@ -0,0 +1,109 @@
+from collections import deque
+from concurrent.futures import Executor
+from typing import Callable, Iterable, Iterator
+
+# -------------------------------------
+# Streaming fetch pipeline
+# -------------------------------------
+#
+# Videos flow through the pipeline one at a time: model pages produce
+# them, stages filter or enrich them, and a single upsert consumes the
+# stream and writes the whole fetch at once. No stage ever holds the whole
+# run.
+
+# A stage turns a stream of videos into another stream of videos
+Stage = Callable[[Iterator[dict]], Iterator[dict]]
+
+
+def bounded_map(
+    executor: Executor, func: Callable, items: Iterable, window: int
+) -> Iterator:
+    """Like Executor.map, but only keeps window calls in flight, so results
+    never pile up faster than they are consumed
+
+    Args:
+        executor (Executor): Executor running the calls
+        func (Callable): Function to call on every item
+        items (Iterable): Arguments of the calls
+        window (int): Maximum number of submitted but unconsumed calls
+
+    Yields:
+        Iterator: Results in the order of items
+    """
+    futures = deque()
+
+    for item in items:
+        futures.append(executor.submit(func, item))
+        if len(futures) >= window:
+            yield futures.popleft().result()
+
+    while len(futures) > 0:
+        yield futures.popleft().result()
+# <-- End of bounded_map()
+
+
+class Pipeline:
+    def __init__(self, stages: list[Stage] = None) -> None:
+        """Chain of stages applied to scraped videos before they are saved
+
+        Args:
+            stages (list[Stage], optional): Initial stages, applied in
+            order. Defaults to None.
+        """
+        self.stages: list[Stage] = list(stages or list())
+    # <-- End of __init__()
+
+    def add_stage(self, stage: Stage) -> "Pipeline":
+        """Append a stage taking and returning an iterator of videos
+
+        Args:
+            stage (Stage): Generator function
+
+        Returns:
+            Pipeline: self, for chaining
+        """
+        self.stages.append(stage)
+        return self
+    # <-- End of add_stage()
+
+    def add_filter(self, predicate: Callable[[dict], bool]) -> "Pipeline":
+        """Append a stage dropping videos for which predicate is False
+
+        Args:
+            predicate (Callable[[dict], bool]): Test of a video
+
+        Returns:
+            Pipeline: self, for chaining
+        """
+        return self.add_stage(lambda videos: filter(predicate, videos))
+    # <-- End of add_filter()
+
+    def add_enricher(self, enrich: Callable[[dict], dict]) -> "Pipeline":
+        """Append a stage replacing every video with enrich(video)
+
+        Args:
+            enrich (Callable[[dict], dict]): Function returning the video
+            to save, it may modify and return its argument
+
+        Returns:
+            Pipeline: self, for chaining
+        """
+        return self.add_stage(lambda videos: map(enrich, videos))
+    # <-- End of add_enricher()
+
+    def run(self, videos: Iterable[dict]) -> Iterator[dict]:
+        """Lazily apply every stage to a stream of videos
+
+        Args:
+            videos (Iterable[dict]): Scraped videos
+
+        Returns:
+            Iterator[dict]: Videos to save
+        """
+        videos = iter(videos)
+        for stage in self.stages:
+            videos = stage(videos)
+        return videos
+    # <-- End of run()
+
+# <-- End of class Pipeline
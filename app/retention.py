@@ -0,0 +1,150 @@
+import os
+import gzip
+import json
+import time
+from typing import Iterator
+
+# Local packages
+from . import database_helpers as db_h
+from .metrics import metrics
+from .constants import (
+    retention_per_model,
+    retention_max_age,
+    retention_outbox_age,
+    retention_runs_age,
+)
+
+# -------------------------------------
+# Catalog retention
+# -------------------------------------
+#
+# Videos falling out of retention are written to a gzipped JSON lines
+# archive, then removed from the live database in one bulk delete, and the
+# database file is compacted. The archive is synced before anything is
+# removed: a crash in between leaves videos both archived and live, never
+# lost.
+
+
+def archive_videos(docs: list[dict], directory: str) -> str:
+    """Write videos to a new gzipped JSON lines archive
+
+    Args:
+        docs (list[dict]): Videos to archive
+        directory (str): Archive directory, created when missing
+
+    Returns:
+        str: Path to the archive, None when there was nothing to write
+    """
+    if len(docs) == 0:
+        return None
+
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+    path = os.path.join(directory, f"videos-{stamp}.jsonl.gz")
+    suffix = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"videos-{stamp}-{suffix}.jsonl.gz")
+        suffix += 1
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as raw:
+        with gzip.open(raw, "wt", encoding="utf-8") as file:
+            for doc in docs:
+                file.write(json.dumps(doc, ensure_ascii=False))
+                file.write("\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    os.replace(tmp_path, path)
+    return path
+# <-- End of archive_videos()
+
+
+def read_archive(path: str) -> Iterator[dict]:
+    """Read videos back from an archive, e.g. to restore them with
+    db_insert_videos
+
+    Args:
+        path (str): Path to the archive
+
+    Yields:
+        Iterator[dict]: Archived videos in the order they were written
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            yield json.loads(line)
+# <-- End of read_archive()
+
+
+def _file_size(path: str) -> int:
+    """Size of a database file with its SQLite log"""
+    return sum(
+        os.path.getsize(name)
+        for name in (path, path + "-wal")
+        if os.path.exists(name)
+    )
+# <-- End of _file_size()
+
+
+@metrics.timed("retention")
+def apply_retention(
+    db,
+    models,
+    archive_dir: str,
+    per_model: int = retention_per_model,
+    max_age: int = retention_max_age,
+    outbox_age: int = retention_outbox_age,
+    runs_age: int = retention_runs_age,
+    now: float = None,
+) -> dict:
+    """Archive and remove expired videos and old emails, then compact the
+    database
+
+    Args:
+        db (DatabaseSession): Database session
+        models (Iterable[str]): Models still watched, videos of other
+        models expire
+        archive_dir (str): Directory of video archives
+        per_model (int, optional): Videos kept per model, 0 keeps all.
+        Defaults to retention_per_model.
+        max_age (int, optional): Seconds since upload a video is kept, 0
+        keeps all. Defaults to retention_max_age.
+        outbox_age (int, optional): Seconds a sent email is kept, 0 keeps
+        all. Defaults to retention_outbox_age.
+        runs_age (int, optional): Seconds a fetch run stays in the change
+        feed, 0 keeps all. Defaults to retention_runs_age.
+        now (float, optional): Current epoch time. Defaults to None, which
+        reads the clock.
+
+    Returns:
+        dict: archived videos, archive path, emails and runs pruned and
+        database size before and after in bytes
+    """
+    now = now or time.time()
+    videos = db.table("videos")
+    size_before = _file_size(db.db_path)
+
+    before = int(now - max_age) if max_age > 0 else 0
+    expired = db_h.db_expired_videos(videos, models, per_model, before)
+    archive = archive_videos(expired, archive_dir)
+
+    with db.transaction():
+        db_h.db_remove_videos(videos, [doc.doc_id for doc in expired])
+        emails = runs = 0
+        if outbox_age > 0:
+            emails = db_h.db_prune_outbox(db, now - outbox_age)
+        if runs_age > 0:
+            runs = db_h.db_prune_runs(db, now - runs_age)
+
+    db.compact()
+    metrics.add("videos_archived", len(expired))
+
+    return {
+        "archived": len(expired),
+        "archive": archive,
+        "emails_pruned": emails,
+        "runs_pruned": runs,
+        "size_before": size_before,
+        "size_after": _file_size(db.db_path),
+    }
+# <-- End of apply_retention()
@@ -0,0 +1,297 @@
+import os
+import heapq
+import logging
+import datetime
+import threading
+from typing import Callable
+
+# Local packages
+from .metrics import metrics
+from .constants import scheduler_jobs, scheduler_poll, fetch_options
+
+# -------------------------------------
+# Scheduler daemon
+# -------------------------------------
+#
+# One long lived process replaces the cron jobs: the built-in fetch, daily
+# and weekly jobs plus every record of the schedules table run on the same
+# Scraper, so sessions, templates and the catalog stay warm between jobs.
+
+logger = logging.getLogger(__name__)
+
+# Day of week names, python weekday numbers
+_days = {"MON": 0, "TUE": 1, "WED": 2, "THU": 3, "FRI": 4, "SAT": 5, "SUN": 6}
+
+
+def parse_dow(dow) -> frozenset[int]:
+    """Turn days of week of a schedule into python weekday numbers
+
+    Args:
+        dow (list[str | int]): Day names like "MON", or cron numbers where
+        0 and 7 are sunday. None or empty means every day.
+
+    Returns:
+        frozenset[int]: Weekdays, monday is 0
+    """
+    if not dow:
+        return frozenset(range(7))
+
+    days = set()
+    for day in dow:
+        if isinstance(day, str) and not day.isdigit():
+            days.add(_days[day.strip().upper()[:3]])
+        else:
+            days.add((int(day) - 1) % 7)
+    return frozenset(days)
+# <-- End of parse_dow()
+
+
+def next_fire(
+    minute: int, hour: int, days: frozenset[int], after: datetime.datetime
+) -> datetime.datetime:
+    """Get the first time strictly after given time matching a schedule
+
+    Args:
+        minute (int): Minute of the hour
+        hour (int): Hour of the day, None for every hour
+        days (frozenset[int]): Weekdays, see parse_dow
+        after (datetime.datetime): Search start
+
+    Returns:
+        datetime.datetime: Next fire time
+    """
+    if hour is None:
+        fire = after.replace(minute=minute, second=0, microsecond=0)
+        if fire <= after:
+            fire += datetime.timedelta(hours=1)
+    else:
+        fire = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if fire <= after:
+            fire += datetime.timedelta(days=1)
+
+    # At most a week ahead
+    while fire.weekday() not in days:
+        fire += datetime.timedelta(days=1)
+        if hour is None:
+            # First hour of the day
+            fire = fire.replace(hour=0)
+    return fire
+# <-- End of next_fire()
+
+
+class Job:
+    __slots__ = ("name", "minute", "hour", "days", "action")
+
+    def __init__(
+        self, name: str, minute: int, hour: int, dow, action: Callable
+    ) -> None:
+        """A callable fired at a minute of an hour on some days of week
+
+        Args:
+            name (str): Name shown in logs
+            minute (int): Minute of the hour
+            hour (int): Hour of the day, None for every hour
+            dow (list[str | int]): Days of week, see parse_dow
+            action (Callable): Function run without arguments
+        """
+        self.name = name
+        self.minute = minute
+        self.hour = hour
+        self.days = parse_dow(dow)
+        self.action = action
+    # <-- End of __init__()
+
+    def next_fire(self, after: datetime.datetime) -> datetime.datetime:
+        return next_fire(self.minute, self.hour, self.days, after)
+    # <-- End of next_fire()
+
+# <-- End of class Job
+
+
+class Scheduler:
+    def __init__(self, scraper, poll: float = scheduler_poll) -> None:
+        """Run fetch and email jobs of a Scraper at their scheduled times
+
+        Jobs wait in a heap ordered by next fire time, so each tick only
+        looks at the head. The database file is checked every poll seconds,
+        and jobs are rebuilt when the schedules table changed.
+
+        Args:
+            scraper (Scraper): Warm scraper shared by every job
+            poll (float, optional): Seconds between checks of the database.
+            Defaults to scheduler_poll.
+        """
+        self.scraper = scraper
+        self.poll = poll
+
+        self.jobs: list[Job] = list()
+        self._heap: list[tuple[datetime.datetime, int, Job]] = list()
+        self._schedules = None  # Snapshot of schedules table
+        self._stamp = None  # Modification stamp of database files
+        self._stop = threading.Event()
+    # <-- End of __init__()
+
+    def build_jobs(self) -> list[Job]:
+        """Build built-in jobs and one job per schedules record
+
+        Returns:
+            list[Job]: Every job of the daemon
+        """
+        scraper = self.scraper
+        actions = {
+            "daily": scraper.send_daily_email,
+            "weekly": scraper.send_weekly_email,
+        }
+        jobs = [
+            Job(
+                "fetch",
+                action=lambda: scraper.fetch(**fetch_options),
+                **scheduler_jobs["fetch"],
+            ),
+            Job("daily", action=actions["daily"], **scheduler_jobs["daily"]),
+            Job("weekly", action=actions["weekly"], **scheduler_jobs["weekly"]),
+            Job(
+                "retention",
+                action=scraper.apply_retention,
+                **scheduler_jobs["retention"],
+            ),
+            Job(
+                "dispatch",
+                action=scraper.dispatch_emails,
+                **scheduler_jobs["dispatch"],
+            ),
+        ]
+
+        for doc in self._schedules:
+            # Records older than templates were weekly emails
+            template = doc.get("template", "weekly")
+            send = actions[template]
+            jobs.append(
+                Job(
+                    f"{template} schedule {doc.doc_id}",
+                    doc["minute"],
+                    doc["hour"],
+                    doc["dow"],
+                    # Bind recipients now, the record may change later
+                    lambda send=send, emails=list(doc["emails"]): send(emails),
+                )
+            )
+
+        return jobs
+    # <-- End of build_jobs()
+
+    def _db_stamp(self) -> tuple:
+        """Modification times of the database file and its SQLite log"""
+        path = self.scraper._db_path
+        return tuple(
+            os.stat(name).st_mtime_ns if os.path.exists(name) else None
+            for name in (path, path + "-wal")
+        )
+    # <-- End of _db_stamp()
+
+    def reload(self, now: datetime.datetime = None) -> bool:
+        """Rebuild jobs when the schedules table changed since last time
+
+        Args:
+            now (datetime.datetime, optional): Current time. Defaults to
+            None, which reads the clock.
+
+        Returns:
+            bool: True if jobs were rebuilt
+        """
+        stamp = self._db_stamp()
+        if stamp == self._stamp and self._schedules is not None:
+            return False
+
+        if self._schedules is not None:
+            # Another process wrote the database, drop cached state
+            self.scraper.reload()
+        self._stamp = self._db_stamp()
+
+        schedules = self.scraper.db.table("schedules").all()
+        if schedules == self._schedules:
+            return False
+
+        self._schedules = schedules
+        self.jobs = self.build_jobs()
+
+        now = now or datetime.datetime.now()
+        self._heap = [
+            (job.next_fire(now), idx, job) for idx, job in enumerate(self.jobs)
+        ]
+        heapq.heapify(self._heap)
+        return True
+    # <-- End of reload()
+
+    def next_run(self) -> datetime.datetime:
+        """Get the fire time of the next job
+
+        Returns:
+            datetime.datetime: Next fire time, None without jobs
+        """
+        return self._heap[0][0] if len(self._heap) > 0 else None
+    # <-- End of next_run()
+
+    def run_pending(self, now: datetime.datetime = None) -> list[str]:
+        """Run every job whose fire time has come, one after another
+
+        Args:
+            now (datetime.datetime, optional): Current time. Defaults to
+            None, which reads the clock.
+
+        Returns:
+            list[str]: Names of jobs run
+        """
+        now = now or datetime.datetime.now()
+        ran = list()
+
+        while len(self._heap) > 0 and self._heap[0][0] <= now:
+            _, idx, job = self._heap[0]
+            logger.info("Running job %s", job.name)
+            # Every job reports its own run
+            metrics.reset()
+            try:
+                with metrics.timer("job"):
+                    job.action()
+            except Exception:
+                # A failed job must not stop the daemon
+                logger.exception("Job %s failed", job.name)
+                metrics.add("job_failures")
+            self._export(job)
+            ran.append(job.name)
+
+            heapq.heapreplace(self._heap, (job.next_fire(now), idx, job))
+
+        if len(ran) > 0:
+            # Jobs wrote the database, that is no outside change
+            self._stamp = self._db_stamp()
+        return ran
+    # <-- End of run_pending()
+
+    def _export(self, job: Job) -> None:
+        """Write metrics of a job run, failing to do so only gets logged"""
+        try:
+            self.scraper.export_metrics(job.name.replace(" ", "_"))
+        except OSError:
+            logger.exception("Metrics of job %s not written", job.name)
+    # <-- End of _export()
+
+    def run(self) -> None:
+        """Run jobs until stop() is called"""
+        while not self._stop.is_set():
+            self.reload()
+            self.run_pending()
+
+            wait = self.poll
+            if self.next_run() is not None:
+                until = self.next_run() - datetime.datetime.now()
+                wait = max(0, min(wait, until.total_seconds()))
+            self._stop.wait(wait)
+    # <-- End of run()
+
+    def stop(self) -> None:
+        """Make run() return after the current job"""
+        self._stop.set()
+    # <-- End of stop()
+
+# <-- End of class Scheduler
@@ -0,0 +1,103 @@
+import calendar
+import datetime
+
+# -------------------------------------
+# Video schema
+# -------------------------------------
+#
+# Version 1 videos carry "upload time" as a %m/%d/%Y string and the
+# subtitle flag under either "subtitle" or "subtitile". Version 2 videos
+# carry "uploaded", the upload day as epoch seconds at 00:00 UTC, and
+# "subtitle" only:
+#
+#   id (str), name (str), model (str), image (str), link (str),
+#   views (int), likes (int), tags (list[str]), uploaded (int),
+#   subtitle (bool)
+#
+# Videos refreshed from a model page only may lack tags, uploaded and
+# subtitle.
+
+SCHEMA_VERSION = 2
+
+# Field order of a version 2 video
+video_fields = (
+    "id",
+    "name",
+    "model",
+    "image",
+    "link",
+    "views",
+    "likes",
+    "tags",
+    "uploaded",
+    "subtitle",
+)
+
+
+def to_epoch(upload_time: str) -> int:
+    """Turn a %m/%d/%Y upload time into epoch seconds
+
+    Args:
+        upload_time (str): Upload day in %m/%d/%Y
+
+    Returns:
+        int: Epoch seconds of the day at 00:00 UTC
+    """
+    day = datetime.datetime.strptime(upload_time, "%m/%d/%Y")
+    return calendar.timegm(day.timetuple())
+# <-- End of to_epoch()
+
+
+def from_epoch(uploaded: int) -> datetime.datetime:
+    """Turn epoch seconds back into the upload day
+
+    Args:
+        uploaded (int): Epoch seconds of the upload day
+
+    Returns:
+        datetime.datetime: Upload day
+    """
+    return datetime.datetime.utcfromtimestamp(uploaded)
+# <-- End of from_epoch()
+
+
+def migrate_video(video: dict) -> dict:
+    """Convert a version 1 video into a version 2 video
+
+    Args:
+        video (dict): Video of any version
+
+    Returns:
+        dict: Version 2 video, fields in schema order
+    """
+    video = dict(video)
+
+    if "upload time" in video:
+        video["uploaded"] = to_epoch(video.pop("upload time"))
+
+    # Old videos saved the flag under a misspelled key
+    subtitle = video.pop("subtitile", None)
+    if subtitle is not None:
+        video["subtitle"] = subtitle
+
+    migrated = {key: video.pop(key) for key in video_fields if key in video}
+    migrated.update(video)
+    return migrated
+# <-- End of migrate_video()
+
+
+def video_upload_epoch(video: dict) -> int:
+    """Read upload day of a video of any version
+
+    Args:
+        video (dict): Video of any version
+
+    Returns:
+        int: Epoch seconds of the upload day, None if unknown
+    """
+    if "uploaded" in video:
+        return video["uploaded"]
+    if "upload time" in video:
+        return to_epoch(video["upload time"])
+    return None
+# <-- End of video_upload_epoch()
@@ -1,41 +1,162 @@
 import os
 import time
+import logging
 import random
-import cloudscraper
-import numpy as np
-from bs4 import BeautifulSoup
-from tinydb import TinyDB, Query
+import asyncio
+from itertools import chain
+from typing import Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 # Local packages
-from . import helpers as h, database_helpers as db_h
-from .constants import default_subjects, weekly_command, daily_command
+from . import database_helpers as db_h
+from .db_session import DatabaseSession
+from .catalog import Catalog
+from .changes import ChangeFeed
+from .templates import TemplateEngine, get_engine
+from .mailer import Mailer
+from .dispatch import Dispatcher, parse_recipients
+from .pipeline import Pipeline, bounded_map
+from .metrics import metrics
+from .journal import Journal
+from .shards import shard_models, shard_path, write_shard, read_shard
+from .constants import (
+    default_subjects,
+    max_requests_per_host,
+    fetch_rate,
+    db_files,
+)
+
+logger = logging.getLogger(__name__)
 
 
 class Scraper:
-    def __init__(self) -> None:
-        """Constructor for Scraper"""
+    def __init__(self, db_backend: str = None, data_path: str = None) -> None:
+        """Constructor for Scraper
+
+        Args:
+            db_backend (str, optional): "tinydb" or "sqlite". Defaults to
+            None, which reads db_backend environment variable, or tinydb
+            when it's not set.
+            data_path (str, optional): Data directory. Defaults to None,
+            which uses data directory of the project.
+        """
         # Set random seed
         random.seed(time.time())
 
-        # Initialize webscraping engine
-        self.scraper = cloudscraper.create_scraper()
+        # Webscraping engine and model buffer, loaded on first use so email
+        # runners never pay for them
+        self._scraper = None
+        self._models: dict[str, str] = None
 
         # Data paths
         self._runner_path = os.path.normpath(  # Set path to project directory
             os.path.join(os.path.dirname(__file__), "../")
         )
         self._data_path: str = os.path.normpath(  # Set path to data directory
-            os.path.join(os.path.dirname(__file__), "../data/")
+            data_path or os.path.join(os.path.dirname(__file__), "../data/")
         )
-        self._db_path: str = os.path.join(self._data_path, "db.json")
+        self._db_backend = db_backend or os.getenv("db_backend", "tinydb")
+        self._db_path: str = os.path.join(
+            self._data_path, db_files[self._db_backend]
+        )
+        self._cache_path: str = os.path.join(self._data_path, "cache")
+        self._metrics_path: str = os.path.join(self._data_path, "metrics")
+        self._archive_path: str = os.path.join(self._data_path, "archive")
+        self._shard_path: str = os.path.join(self._data_path, "shards")
+        self._journal_path: str = os.path.join(
+            self._data_path, "fetch_journal.jsonl"
+        )
+
+        # Open database session shared by the whole run
+        self.db = DatabaseSession(self._db_path)
 
-        # Load model buffer
-        self.models = db_h.read_models(self._db_path, "models")
+        # Bring saved videos to the current schema
+        if db_h.db_migrate(self.db) > 0:
+            self.db.commit()
+
+        # Stages applied to scraped videos before they are saved
+        self.pipeline = Pipeline()
+
+        # Videos catalog for rendering, built on first use
+        self._catalog: Catalog = None
 
-        # Load Scheduler class
-        # self.schedule = auto_h.Scheduler()
     # <-- End of __init__()
 
+    def close(self) -> None:
+        """Write pending changes and close database session"""
+        self.db.close()
+    # <-- End of close()
+
+    def reload(self) -> None:
+        """Reopen database session to see changes of other processes,
+        pending changes are written first"""
+        self.db.close()
+        self.db = DatabaseSession(self._db_path)
+        self._models = None
+        self._catalog = None
+    # <-- End of reload()
+
+    @property
+    def scraper(self):
+        """Webscraping engine, created on first use
+
+        Returns:
+            CloudScraper: Session solving Cloudflare challenges
+        """
+        if self._scraper is None:
+            # Pulls in requests, only fetches need it
+            import cloudscraper
+
+            self._scraper = cloudscraper.create_scraper()
+        return self._scraper
+    # <-- End of scraper()
+
+    @scraper.setter
+    def scraper(self, session) -> None:
+        self._scraper = session
+    # <-- End of scraper()
+
+    @property
+    def models(self) -> dict[str, str]:
+        """Models buffer, read from database on first use, default models
+        are saved when there's none
+
+        Returns:
+            dict[str, str]: [key]: model name, [value]: link to model webpage
+        """
+        if self._models is None:
+            self._models = db_h.read_models(self.db, "models")
+            self.db.commit()
+        return self._models
+    # <-- End of models()
+
+    @models.setter
+    def models(self, models: dict[str, str]) -> None:
+        self._models = models
+    # <-- End of models()
+
+    @property
+    def catalog(self) -> Catalog:
+        """Catalog of saved videos, rebuilt after each fetch
+
+        Returns:
+            Catalog: Read only videos
+        """
+        if self._catalog is None:
+            self._catalog = Catalog.from_table(self.db.table("videos"))
+        return self._catalog
+    # <-- End of catalog()
+
+    @property
+    def changes(self) -> ChangeFeed:
+        """Change feed of fetch runs, see changes.py
+
+        Returns:
+            ChangeFeed: Feed over database session
+        """
+        return ChangeFeed(self.db)
+    # <-- End of changes()
+
     def add_model(self, model: str, url: str) -> None:
         """Add a model to database models table
 
@@ -56,13 +177,12 @@ class Scraper:
             bool: True if removes successfully, False otherwise
         """
         flag = False
-        db = TinyDB(self._db_path).table("models")
-        query = Query()["model"] == model_name
+        db = self.db.table("models")
 
-        # Check if database contains model
-        if db.contains(query):
+        # Remove model if database contains it
+        if db_h.db_remove_model(db, model_name):
             flag = True
-            db.remove(query)  # If so remove it
+            self.db.commit()
 
         # Check if buffer contains model
         if model_name in self.models:
@@ -72,111 +192,569 @@ class Scraper:
         return flag
     # <-- End of remove_model()
 
-    def fetch(self) -> None:
-        """Fetch, parse and save data"""
-        # Set content to an empty list
-        content = np.array([])
+    @metrics.timed("fetch")
+    def fetch(
+        self,
+        workers: int = 1,
+        per_host: int = max_requests_per_host,
+        use_async: bool = False,
+        incremental: bool = False,
+        cache: bool = False,
+        offline: bool = False,
+        backfill: bool = False,
+        rate: float = fetch_rate,
+        resume: bool = False,
+    ) -> None:
+        """Fetch, parse and save data
+
+        Every host is paced by an adaptive rate controller, throttled
+        requests are retried and a model whose pages keep failing is
+        skipped, see fetcher.AdaptiveSession.
+
+        With resume, completed models are journaled as the fetch goes, see
+        journal.py. A fetch crashing half way is resumed by the next one,
+        which replays the journal and only fetches unfinished models.
+
+        Args:
+            workers (int, optional): Number of threads fetching model and
+            video pages, 1 fetches sequentially. Defaults to 1.
+            per_host (int, optional): Maximum concurrent requests per host.
+            Defaults to max_requests_per_host.
+            use_async (bool, optional): Run the asyncio engine instead of
+            threads. Defaults to False.
+            incremental (bool, optional): Skip video pages of videos already
+            in database, only refresh their views and likes. Defaults to
+            False.
+            cache (bool, optional): Keep responses in the on-disk cache of
+            data directory. Defaults to False.
+            offline (bool, optional): Serve every page from the on-disk
+            cache without touching the network. Defaults to False.
+            backfill (bool, optional): Crawl every listing page of every
+            model instead of stopping at the watermark. Defaults to False.
+            rate (float, optional): Starting requests per second per host,
+            adapted during the fetch. Defaults to fetch_rate.
+            resume (bool, optional): Journal completed models and resume
+            the journal of a crashed fetch. Defaults to False.
+
+        Raises:
+            ValueError: When use_async is combined with cache, offline,
+            backfill, rate or resume, which only the threaded engine has
+        """
+        if use_async:
+            unsupported = [
+                name
+                for name, value in (
+                    ("cache", cache),
+                    ("offline", offline),
+                    ("backfill", backfill),
+                    ("rate", rate != fetch_rate),
+                    ("resume", resume),
+                )
+                if value
+            ]
+            if len(unsupported) > 0:
+                raise ValueError(
+                    "The asyncio engine does not support "
+                    + ", ".join(unsupported)
+                )
+            return asyncio.run(self.fetch_async(per_host, incremental))
+
+        journal = Journal(self._journal_path) if resume else None
+        done = journal.replay(self.models) if resume else dict()
+        models = {
+            model: url
+            for model, url in self.models.items()
+            if model not in done
+        }
+        if len(done) > 0:
+            logger.info(
+                "Resuming fetch, %d models replayed from journal", len(done)
+            )
+
+        results = self._fetch_models(
+            models,
+            workers,
+            per_host,
+            incremental,
+            cache,
+            offline,
+            backfill,
+            rate,
+        )
+        if resume:
+            results = chain(done.values(), journal.record(models, results))
+            replayed = {model: self.models[model] for model in done}
+            models = {**replayed, **models}
+
+        self._save_fetch(results, models)
+
+        # Committed, the next fetch starts from scratch
+        if resume:
+            journal.truncate()
+    # <-- End of fetch()
+
+    def _fetch_models(
+        self,
+        models: dict[str, str],
+        workers: int = 1,
+        per_host: int = max_requests_per_host,
+        incremental: bool = False,
+        cache: bool = False,
+        offline: bool = False,
+        backfill: bool = False,
+        rate: float = fetch_rate,
+    ) -> Iterator[tuple[str, list[dict]]]:
+        """Fetch and parse pages of models without saving anything, see
+        fetch() for arguments
+
+        Args:
+            models (dict[str, str]): [key]: model name, [value]: link to
+            model webpage
+
+        Yields:
+            Iterator[tuple[str, list[dict]]]: Avatar and videos of every
+            model in the order of models, None for models which failed
+        """
+        # Parsers and http wrappers load only when a fetch happens
+        from . import helpers as h, parsers
+        from .cache import CachedSession
+        from .fetcher import AdaptiveSession, FetchError, MeteredSession
+
+        known = self._known_videos() if incremental else None
+        watermarks = db_h.db_model_watermarks(self.db.table("models"))
+
+        # Innermost, so only requests reaching the network are recorded.
+        # Throttled requests are retried and hosts paced even without
+        # threads.
+        session = AdaptiveSession(
+            MeteredSession(self.scraper), per_host, rate
+        )
+        pages = details = None
+
+        if workers > 1:
+            pages = ThreadPoolExecutor(workers)
+            details = ThreadPoolExecutor(workers)
+
+        if cache or offline:
+            # Cache hits do not wait for a free slot of the host
+            session = CachedSession(session, self._cache_path, offline=offline)
+
+        def fetch_model(item: tuple[str, str]) -> tuple[str, list[dict]]:
+            model, url = item
+            try:
+                # Fetch webpage data
+                page = session.get(url).content
+                avatar = parsers.parse_avatar(parsers.parse_html(page))
+                videos = h.crawl_model(
+                    session,
+                    page,
+                    url,
+                    model,
+                    watermark=watermarks.get(model),
+                    backfill=backfill,
+                    executor=details,
+                    known=known,
+                )
+            except FetchError as error:
+                # Other models are still saved, this one keeps its
+                # watermark and is caught up by the next run
+                logger.warning("Skipping model %s: %s", model, error)
+                return None
+            return avatar, videos
+
+        try:
+            if pages is None:
+                yield from map(fetch_model, models.items())
+            else:
+                # Model pages are fetched in parallel, results keep model
+                # order and only a few models are held ahead of the writer
+                yield from bounded_map(
+                    pages, fetch_model, models.items(), workers * 2
+                )
+        finally:
+            if pages is not None:
+                pages.shutdown()
+                details.shutdown()
+    # <-- End of _fetch_models()
+
+    @metrics.timed("fetch_shard")
+    def fetch_shard(
+        self, index: int, count: int, shard_dir: str = None, **options
+    ) -> str:
+        """Fetch the models of one shard into a shard file, nothing is
+        written to database until merge_shards(), see shards.py
+
+        Args:
+            index (int): Shard index, from 0 to count - 1
+            count (int): Number of shards
+            shard_dir (str, optional): Directory of shard files. Defaults
+            to None, which uses shards directory of data directory.
+            options: Arguments of fetch(), except use_async
+
+        Returns:
+            str: Path to the shard file
+        """
+        models = shard_models(self.models, index, count)
+        path = shard_path(shard_dir or self._shard_path, index, count)
+        written = write_shard(
+            path, models, self._fetch_models(models, **options)
+        )
+        logger.info("Shard %d of %d fetched %d models", index, count, written)
+        return path
+    # <-- End of fetch_shard()
+
+    def merge_shards(self, count: int, shard_dir: str = None) -> int:
+        """Save every shard file in one batch, then remove them
+
+        Args:
+            count (int): Number of shards
+            shard_dir (str, optional): Directory of shard files. Defaults
+            to None, which uses shards directory of data directory.
+
+        Raises:
+            FileNotFoundError: When a shard has not been fetched yet,
+            nothing is saved then
+
+        Returns:
+            int: Number of models merged
+        """
+        directory = shard_dir or self._shard_path
+        paths = [shard_path(directory, index, count) for index in range(count)]
+        missing = [path for path in paths if not os.path.exists(path)]
+        if len(missing) > 0:
+            raise FileNotFoundError(f"Missing shards: {', '.join(missing)}")
+
+        models, results = dict(), list()
+        for path in paths:
+            for record in read_shard(path):
+                models[record["model"]] = record["url"]
+                if record.get("failed"):
+                    results.append(None)
+                else:
+                    results.append((record["avatar"], record["videos"]))
+
+        self._save_fetch(results, models)
+
+        # Saved, a rerun of the merge must not find them again
+        for path in paths:
+            os.remove(path)
+        return len(models)
+    # <-- End of merge_shards()
+
+    @metrics.timed("fetch")
+    def fetch_sharded(
+        self,
+        processes: int,
+        session_factory=None,
+        shard_dir: str = None,
+        **options,
+    ) -> int:
+        """Fetch models in a pool of processes, one shard each, then merge
+        the shards into database
+
+        Parsing is CPU bound, so threads of a single process stop scaling
+        with a large models table. Each process still runs the threads of
+        fetch() for its own models.
+
+        Args:
+            processes (int): Number of processes, and shards
+            session_factory (Callable, optional): Picklable callable
+            creating the webscraping engine of a process. Defaults to None,
+            which creates a CloudScraper.
+            shard_dir (str, optional): Directory of shard files. Defaults
+            to None, which uses shards directory of data directory.
+            options: Arguments of fetch(), except use_async
+
+        Returns:
+            int: Number of models merged
+        """
+        directory = shard_dir or self._shard_path
+        # Default models are saved before processes read the database
+        models = dict(self.models)
+        self.db.commit()
+
+        with ProcessPoolExecutor(processes) as pool:
+            futures = [
+                pool.submit(
+                    _fetch_shard,
+                    self._db_backend,
+                    self._data_path,
+                    models,
+                    index,
+                    processes,
+                    directory,
+                    session_factory,
+                    options,
+                )
+                for index in range(processes)
+            ]
+            for future in futures:
+                future.result()
+
+        return self.merge_shards(processes, directory)
+    # <-- End of fetch_sharded()
+
+    async def fetch_async(
+        self, per_host: int = max_requests_per_host, incremental: bool = False
+    ) -> None:
+        """Fetch, parse and save data with the asyncio engine
+
+        Args:
+            per_host (int, optional): Maximum concurrent requests per host.
+            Defaults to max_requests_per_host.
+            incremental (bool, optional): Skip video pages of videos already
+            in database. Defaults to False.
+        """
+        from .async_fetcher import AsyncScraper, fetch_model_async
+        from .fetcher import FetchError
+
+        known = self._known_videos() if incremental else None
+
+        async def fetch_model(model: str, url: str) -> tuple[str, list]:
+            try:
+                return await fetch_model_async(scraper, model, url, known)
+            except FetchError as error:
+                # Other models are still saved, as with threads
+                logger.warning("Skipping model %s: %s", model, error)
+                return None
+
+        async with AsyncScraper(self.scraper, per_host) as scraper:
+            results = await asyncio.gather(
+                *(
+                    fetch_model(model, url)
+                    for model, url in self.models.items()
+                )
+            )
+
+        # Only the first listing page was read, older pages would be
+        # skipped for good behind a watermark
+        self._save_fetch(results, watermarks=False)
+    # <-- End of fetch_async()
+
+    def _known_videos(self) -> set[tuple[str, str]]:
+        """Load (id, link) of videos already in database
+
+        Returns:
+            set[tuple[str, str]]: (id, link) of all saved videos
+        """
+        return db_h.db_known_videos(self.db.table("videos"))
+    # <-- End of _known_videos()
+
+    @metrics.timed("save_fetch")
+    def _save_fetch(
+        self,
+        results,
+        models: dict[str, str] = None,
+        watermarks: bool = True,
+    ) -> int:
+        """Stream fetched models and videos into database
+
+        Videos go through the pipeline stages, then are streamed into a
+        single upsert, so the videos table is indexed and written once per
+        fetch however many videos it brings. Avatars and watermarks are
+        only written once every video is in: a fetch crashing half way
+        leaves no model ahead of its videos, on TinyDB too, where nothing
+        is rolled back. Inserted videos and views and likes deltas are
+        appended to the change feed as a new run, in the same transaction.
+
+        Args:
+            results (Iterable[tuple[str, list[dict]]]): Avatar and videos of
+            every model, in the order of models
+            models (dict[str, str], optional): Fetched models. Defaults to
+            None, which uses models buffer.
+            watermarks (bool, optional): Move the watermark of every model
+            to its newest video, only for crawls reaching the previous
+            watermark. Defaults to True.
+
+        Returns:
+            int: Run id in the change feed
+        """
+        models_db = self.db.table("models")
+        videos_db = self.db.table("videos")
+        changes = {"inserted": list(), "updated": list()}
+        fetched = list()
+        started = time.time()
+
+        # One transaction per fetch on SQLite
+        with self.db.transaction():
+            videos = self.pipeline.run(
+                self._model_videos(results, models, fetched)
+            )
+            db_h.db_upsert_videos(videos_db, videos, changes)
+            self._save_models(models_db, fetched, watermarks)
+            run_id = self.changes.append(changes, started)
+
+        self.db.commit()
+        self._catalog = None
+
+        metrics.add("videos_inserted", len(changes["inserted"]))
+        logger.info(
+            "Fetch run %d inserted %d videos and updated %d",
+            run_id,
+            len(changes["inserted"]),
+            len(changes["updated"]),
+        )
+        return run_id
+    # <-- End of _save_fetch()
+
+    def _model_videos(
+        self,
+        results,
+        models: dict[str, str] = None,
+        fetched: list = None,
+    ) -> Iterator[dict]:
+        """Yield videos of every model, nothing is written
 
-        models_db = TinyDB(self._db_path).table("models")
-        videos_db = TinyDB(self._db_path).table("videos")
+        Args:
+            results (Iterable[tuple[str, list[dict]]]): Avatar and videos of
+            every model, in the order of models, None for models which
+            failed to fetch
+            models (dict[str, str], optional): Fetched models. Defaults to
+            None, which uses models buffer.
+            fetched (list, optional): Collects model, url, avatar and videos
+            of every model whose videos were yielded, see _save_models().
+            Defaults to None.
+
+        Yields:
+            Iterator[dict]: Scraped videos, model by model
+        """
+        models = self.models if models is None else models
+
+        # Loop through all models in order
+        for (model, url), result in zip(models.items(), results):
+            if result is None:
+                metrics.add("models_failed")
+                continue
+            avatar, videos = result
+
+            metrics.add("models_fetched")
+            metrics.add("videos_fetched", len(videos))
+
+            yield from videos
+            if fetched is not None:
+                fetched.append((model, url, avatar, videos))
+    # <-- End of _model_videos()
+
+    def _save_models(
+        self, models_db, fetched: list, watermarks: bool = True
+    ) -> None:
+        """Save avatar and watermark of fetched models
 
-        # Loop through all models and scrape
-        for model, url in self.models.items():
-            # Fetch webpage data
-            response = BeautifulSoup(self.scraper.get(url).content, "lxml")
+        Args:
+            models_db (Table): Models table
+            fetched (list): Filled by _model_videos()
+            watermarks (bool, optional): Move watermarks. Defaults to True.
+        """
+        for model, url, avatar, videos in fetched:
             # Update model avatar
-            avatar = h.fetch_model_avatar(response)
             if not db_h.db_insert_model(models_db, model, url, avatar):
                 # When model already exists in database check if it needs
                 # to update avatar
                 db_h.db_update_model(models_db, model, avatar)
-            # Append data to content list
-            content = np.append(
-                content, h.get_videos(self.scraper, response, model)
-            )
+            # Newest video of the model stops the next crawl
+            if watermarks and len(videos) > 0:
+                db_h.db_update_watermark(models_db, model, videos[0]["link"])
+    # <-- End of _save_models()
 
-        db_h.db_insert_videos(videos_db, content.tolist())
-    # <-- End of fetch()
+    @property
+    def templates(self) -> TemplateEngine:
+        """Email templates of data directory, shared by the process
 
-    def format_daily_email(self) -> str:
-        # Load email templates
-        with open(
-            os.path.join(self._data_path, "daily_email_content.html"), "r"
-        ) as file:
-            template = file.read()
-        with open(os.path.join(self._data_path, "daily_email.html"), "r") as file:
-            body = file.read()
+        Returns:
+            TemplateEngine: Engine caching compiled templates
+        """
+        return get_engine(self._data_path)
+    # <-- End of templates()
 
+    def daily_context(self) -> dict:
+        """Pick a random video and two random models for a daily email
+
+        Returns:
+            dict: Context of format_daily_email
+        """
         # Get a random video
-        db = TinyDB(self._db_path).table("videos")
-        video = random.choice(db.all())
+        video = self.catalog.random_video()
 
         # Get two random models
-        db = TinyDB(self._db_path).table("models")
-        models = random.sample(db.all(), 2)
+        models = random.sample(self.db.table("models").all(), 2)
 
-        template = template.format(
+        return {
+            "email": "daily",
             # Recommend video
-            model=video["model"],
-            image=video["image"],
-            name=video["name"],
-            views=f'{video["views"]:,}',
-            likes=f'{video["likes"]:,}',
-            tags=", ".join(video["tags"]),
-            link=video["link"],
+            "model": video["model"],
+            "image": video["image"],
+            "name": video["name"],
+            "views": f'{video["views"]:,}',
+            "likes": f'{video["likes"]:,}',
+            "tags": ", ".join(video["tags"]),
+            "link": video["link"],
             # Suggest model 1
-            suggested_model_1=models[0]["model"],
-            avatar_1=models[0]["avatar"],
-            punchline_1=random.choice(default_subjects),
-            suggested_model_link_1=models[0]["link"],
+            "suggested_model_1": models[0]["model"],
+            "avatar_1": models[0]["avatar"],
+            "punchline_1": random.choice(default_subjects),
+            "suggested_model_link_1": models[0]["link"],
             # Suggest model 2
-            suggested_model_2=models[1]["model"],
-            avatar_2=models[1]["avatar"],
-            punchline_2=random.choice(default_subjects),
-            suggested_model_link_2=models[1]["link"],
-        )
+            "suggested_model_2": models[1]["model"],
+            "avatar_2": models[1]["avatar"],
+            "punchline_2": random.choice(default_subjects),
+            "suggested_model_link_2": models[1]["link"],
+        }
+    # <-- End of daily_context()
 
-        body = body.replace("{% content %}", template)
+    def format_daily_email(self, context: dict = None) -> str:
+        """Render daily email body
 
-        with open(os.path.join(self._data_path, "output.html"), "w") as file:
-            file.write(body)
+        Args:
+            context (dict, optional): Result of daily_context(). Defaults to
+            None, which picks a new one.
 
-        return body
+        Returns:
+            str: The email body in string
+        """
+        context = context or self.daily_context()
+        template = self.templates.get("daily_email_content.html")
+        body = self.templates.get("daily_email.html", blocks=True)
+
+        return body.render(content=template.render(**context))
     # <-- End of format_daily_email()
 
-    def format_weekly_email(self) -> str:
+    def weekly_context(self) -> dict:
+        """Select newest videos of every model for a weekly email
+
+        Returns:
+            dict: Context of format_weekly_email
+        """
+        return {
+            "email": "weekly",
+            "videos": db_h.db_select_videos(self.catalog, self.models.keys()),
+        }
+    # <-- End of weekly_context()
+
+    def format_weekly_email(self, context: dict = None) -> str:
         """Use email format in data directory to format email body
 
+        Args:
+            context (dict, optional): Result of weekly_context(). Defaults to
+            None, which selects the videos now.
+
         Returns:
             str: The email body in string
         """
-        # Fetch email headline template
-        with open(
-            os.path.join(self._data_path, "weekly_email_headline.html"), "r"
-        ) as file:
-            headline = file.read()
+        context = context or self.weekly_context()
+        videos = context["videos"]
 
-        # Fetch email video template
-        with open(
-            os.path.join(self._data_path, "weekly_email_content.html"), "r"
-        ) as file:
-            template = file.read()
+        headline = self.templates.get("weekly_email_headline.html", blocks=True)
+        template = self.templates.get("weekly_email_content.html")
 
-        htmls = np.array([])
-        videos_db = TinyDB(self._db_path).table("videos")
-        videos = db_h.db_select_videos(
-            videos_db, self.models.keys())
+        htmls = list()
 
         # Loop through data in a step of 2
-        for idx in np.arange(1, len(videos), 2):
+        for idx in range(1, len(videos), 2):
             # Append headline
-            htmls = np.append(
-                htmls, headline.replace("{% headline %}", videos[idx]["model"])
-            )
+            htmls.append(headline.render(headline=videos[idx]["model"]))
 
-            htmls = np.append(
-                htmls,
-                template.format(
+            htmls.append(
+                template.render(
                     # Left video box
                     image_1=videos[idx - 1]["image"],
                     name_1=videos[idx - 1]["name"],
@@ -189,28 +767,124 @@ class Scraper:
                     link_2=videos[idx]["link"],
                     # String format for , between numbers
                     views_2=f'{videos[idx]["views"]:,}',
-                ),
+                )
             )
 
         # Format email body, connect everything together
-        with open(os.path.join(self._data_path, "weekly_email.html"), "r") as file:
-            body = file.read()
-            body = body.replace("{% content %}", "\n".join(htmls))
-
-        return body
+        body = self.templates.get("weekly_email.html", blocks=True)
+        return body.render(content="\n".join(htmls))
     # <-- End of format_weekly_email()
 
-    def send_daily_email(self) -> None:
-        """Send daily email to recipients with random recommend video"""
-        body = self.format_daily_email()
-        h.send_email(os.getenv('recipients'), body)
+    @metrics.timed("render_many")
+    def render_many(
+        self, recipients: list[str], contexts: list[dict]
+    ) -> dict[str, str]:
+        """Render one email body per recipient
+
+        Templates are loaded once for the whole batch, and recipients
+        sharing the same context object share the same rendered body.
+
+        Args:
+            recipients (list[str]): Email addresses
+            contexts (list[dict]): Result of daily_context() or
+            weekly_context() for each recipient
+
+        Raises:
+            ValueError: When recipients and contexts differ in length
+
+        Returns:
+            dict[str, str]: [key]: email address, [value]: email body
+        """
+        if len(recipients) != len(contexts):
+            raise ValueError("Need exactly one context per recipient")
+
+        renderers = {
+            "daily": self.format_daily_email,
+            "weekly": self.format_weekly_email,
+        }
+        rendered = dict()  # [key]: id of context, [value]: body
+        bodies = dict()
+
+        for recipient, context in zip(recipients, contexts):
+            if id(context) not in rendered:
+                rendered[id(context)] = renderers[context["email"]](context)
+            bodies[recipient] = rendered[id(context)]
+
+        metrics.add("emails_rendered", len(rendered))
+        return bodies
+    # <-- End of render_many()
+
+    def send_daily_email(
+        self, recipients: list[str] = None
+    ) -> dict[str, int]:
+        """Send daily email to recipients with random recommend video
+
+        Args:
+            recipients (list[str], optional): Email addresses. Defaults to
+            None, which reads recipients environment variable.
+
+        Returns:
+            dict[str, int]: Number of queued emails per delivery status
+        """
+        if recipients is None:
+            recipients = parse_recipients(os.getenv("recipients"))
+        context = self.daily_context()
+        bodies = self.render_many(recipients, [context] * len(recipients))
+        self.queue_emails(bodies)
+        return self.dispatch_emails()
     # <-- End of send_daily_email()
 
-    def send_weekly_email(self) -> None:
-        body = self.format_weekly_email()
-        h.send_email(os.getenv('recipients'), body)
+    def send_weekly_email(
+        self, recipients: list[str] = None
+    ) -> dict[str, int]:
+        """Send weekly email with newest videos of every model to recipients
+
+        Args:
+            recipients (list[str], optional): Email addresses. Defaults to
+            None, which reads recipients environment variable.
+
+        Returns:
+            dict[str, int]: Number of queued emails per delivery status
+        """
+        if recipients is None:
+            recipients = parse_recipients(os.getenv("recipients"))
+        context = self.weekly_context()
+        bodies = self.render_many(recipients, [context] * len(recipients))
+        self.queue_emails(bodies)
+        return self.dispatch_emails()
     # <-- End of send_weekly_email()
 
+    def queue_emails(self, bodies: dict[str, str]) -> int:
+        """Save rendered emails in the dispatch queue
+
+        Args:
+            bodies (dict[str, str]): Result of render_many()
+
+        Returns:
+            int: Number of emails queued
+        """
+        count = db_h.db_enqueue_emails(self.db, bodies)
+        self.db.commit()
+        return count
+    # <-- End of queue_emails()
+
+    @metrics.timed("dispatch")
+    def dispatch_emails(self, mailer: Mailer = None) -> dict[str, int]:
+        """Send every pending email of the queue which is due, including
+        emails left over by a crashed run. Emails waiting for a retry are
+        sent by a later dispatch, e.g. the hourly job of the scheduler.
+
+        Args:
+            mailer (Mailer, optional): Mailer to send with. Defaults to None,
+            which opens one from environment variables.
+
+        Returns:
+            dict[str, int]: Number of queued emails per delivery status
+        """
+        with mailer or Mailer() as mailer:
+            return Dispatcher(self.db, mailer).run()
+    # <-- End of dispatch_emails()
+
     def add_schedule(
         self,
         email: str,
@@ -219,21 +893,93 @@ class Scraper:
         hour: int = 0,
         dow: list[str] = None
     ) -> None:
-        db = TinyDB(self._db_path).table("schedules")
-        db_h.db_insert_schedule(db, email, minute, hour, dow)
-        query = Query().fragment({'minute': minute, 'hour': hour, 'dow': dow})
-        comment = db.get(query).doc_id
-        emails = db.get(query)['emails']
-        # IN PROGRESS: check this!!!
-
-        command = daily_command if template in (
-            '--daily', '-d') else weekly_command
-        command.format(workspace=self._runner_path, emails=' '.join(emails))
-
-        self.schedule.remove_job(comment)
-        self.schedule.add_job(
-            ommand=command, comment=comment,
-            minute=minute, hour=hour, dow=dow)
+        """Subscribe an email address to a time slot, a running scheduler
+        daemon picks the change up on its next poll
+
+        Args:
+            email (str): Email address
+            template (str, optional): '-d' / '--daily' for the daily email,
+            weekly email otherwise. Defaults to '-w'.
+            minute (int, optional): At which minute email to be sent.
+            Defaults to 0.
+            hour (int, optional): At which hour email to be sent. Defaults
+            to 0.
+            dow (list[str], optional): At which days of the week email to be
+            sent. Defaults to None, every day.
+        """
+        template = "daily" if template in ('--daily', '-d') else "weekly"
+        db = self.db.table("schedules")
+        db_h.db_insert_schedule(db, email, minute, hour, dow, template)
+        self.db.commit()
     # <-- End of add_schedule()
 
+    def remove_schedule(self, email: str) -> None:
+        """Unsubscribe an email address from every time slot
+
+        Args:
+            email (str): Email address
+        """
+        db_h.db_remove_schedule(self.db.table("schedules"), email)
+        self.db.commit()
+    # <-- End of remove_schedule()
+
+    def apply_retention(self) -> dict:
+        """Archive videos falling out of retention and compact database,
+        see retention.py
+
+        Returns:
+            dict: Report of retention.apply_retention
+        """
+        from .retention import apply_retention
+
+        report = apply_retention(self.db, self.models, self._archive_path)
+        self._catalog = None
+        return report
+    # <-- End of apply_retention()
+
+    def export_metrics(self, job: str) -> tuple[str, str]:
+        """Write metrics recorded during a run, see metrics.py
+
+        The JSON report goes to metrics directory of data directory, the
+        Prometheus textfile to the directory of metrics_textfile_dir
+        environment variable, watched by node-exporter, or next to the
+        report when it's not set.
+
+        Args:
+            job (str): Name of the run, e.g. "fetch"
+
+        Returns:
+            tuple[str, str]: Paths of the report and the textfile
+        """
+        return metrics.export(
+            job, self._metrics_path, os.getenv("metrics_textfile_dir")
+        )
+    # <-- End of export_metrics()
+
 # <-- End of class Scraper
+
+
+def _fetch_shard(
+    db_backend: str,
+    data_path: str,
+    models: dict[str, str],
+    index: int,
+    count: int,
+    shard_dir: str,
+    session_factory,
+    options: dict,
+) -> str:
+    """Worker process of Scraper.fetch_sharded(), fetches one shard with a
+    read only scraper of its own and exports its metrics as fetch_shard_<i>
+    """
+    metrics.reset()
+    scraper = Scraper(db_backend, data_path)
+    try:
+        scraper.models = models
+        if session_factory is not None:
+            scraper.scraper = session_factory()
+        return scraper.fetch_shard(index, count, shard_dir, **options)
+    finally:
+        scraper.export_metrics(f"fetch_shard_{index}")
+        scraper.close()
+# <-- End of _fetch_shard()
@@ -0,0 +1,111 @@
+import os
+import json
+import zlib
+from typing import Iterable, Iterator
+
+# -------------------------------------
+# Sharded fetch
+# -------------------------------------
+#
+# Models are split across processes or containers by a stable hash of their
+# name, so every shard fetches the same models whatever the order of the
+# models table. A shard never writes the database: it leaves one JSON lines
+# file per shard, one line per model, and a single merge step upserts every
+# shard into the database in one transaction.
+
+
+def shard_of(model: str, count: int) -> int:
+    """Index of the shard fetching a model
+
+    Args:
+        model (str): Model name
+        count (int): Number of shards
+
+    Returns:
+        int: Shard index, from 0 to count - 1
+    """
+    return zlib.crc32(model.encode("utf-8")) % count
+# <-- End of shard_of()
+
+
+def shard_models(
+    models: dict[str, str], index: int, count: int
+) -> dict[str, str]:
+    """Models fetched by one shard
+
+    Args:
+        models (dict[str, str]): [key]: model name, [value]: link to model
+        webpage
+        index (int): Shard index, from 0 to count - 1
+        count (int): Number of shards
+
+    Raises:
+        ValueError: When index is not a shard of count
+
+    Returns:
+        dict[str, str]: Models of the shard, in the order of models
+    """
+    if not 0 <= index < count:
+        raise ValueError(f"Shard {index} out of {count} shards")
+    return {
+        model: url
+        for model, url in models.items()
+        if shard_of(model, count) == index
+    }
+# <-- End of shard_models()
+
+
+def shard_path(directory: str, index: int, count: int) -> str:
+    """Path to the file of a shard"""
+    return os.path.join(directory, f"shard-{index}-of-{count}.jsonl")
+# <-- End of shard_path()
+
+
+def write_shard(path: str, models: dict[str, str], results: Iterable) -> int:
+    """Write fetched models to a shard file, replaced atomically so a merge
+    never reads half a shard
+
+    Args:
+        path (str): Path to the shard file
+        models (dict[str, str]): Models of the shard
+        results (Iterable[tuple[str, list[dict]]]): Avatar and videos of
+        every model, in the order of models, None for models which failed
+
+    Returns:
+        int: Number of models written
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    count = 0
+
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        for (model, url), result in zip(models.items(), results):
+            record = {"model": model, "url": url}
+            if result is None:
+                record["failed"] = True
+            else:
+                record["avatar"], record["videos"] = result
+            file.write(json.dumps(record, ensure_ascii=False))
+            file.write("\n")
+            count += 1
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(tmp_path, path)
+    return count
+# <-- End of write_shard()
+
+
+def read_shard(path: str) -> Iterator[dict]:
+    """Read models back from a shard file
+
+    Args:
+        path (str): Path to the shard file
+
+    Yields:
+        Iterator[dict]: model, url and either avatar and videos, or failed
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            yield json.loads(line)
+# <-- End of read_shard()
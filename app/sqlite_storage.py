@@ -0,0 +1,512 @@
+import os
+import json
+import sqlite3
+from contextlib import contextmanager
+from tinydb import TinyDB
+from tinydb.table import Document
+
+# Local packages
+from .schema import video_upload_epoch
+
+# -------------------------------------
+# SQLite storage backend
+# -------------------------------------
+
+
+# Indexed columns of each table, [key]: column name, [value]: function
+# reading the column value from a document. Documents are stored whole as
+# json, columns only exist for lookups.
+table_columns = {
+    "videos": {
+        "id": lambda doc: doc.get("id"),
+        "link": lambda doc: doc.get("link"),
+        "model": lambda doc: doc.get("model"),
+        "upload_time": video_upload_epoch,
+    },
+    "models": {
+        "model": lambda doc: doc.get("model"),
+    },
+    "outbox": {
+        "status": lambda doc: doc.get("status"),
+    },
+    "email_bodies": {
+        "digest": lambda doc: doc.get("digest"),
+    },
+    "runs": {
+        "finished": lambda doc: doc.get("finished"),
+    },
+    "cursors": {
+        "reader": lambda doc: doc.get("reader"),
+    },
+}
+
+table_indexes = {
+    "videos": [("id", "link"), ("model", "upload_time")],
+    "models": [("model",)],
+    "outbox": [("status",)],
+    "email_bodies": [("digest",)],
+    "cursors": [("reader",)],
+}
+
+# Tables whose document ids are never handed out again, even once the
+# documents holding the highest ids are removed
+table_autoincrement = {"runs"}
+
+
+class SQLiteTable:
+    def __init__(self, db: "SQLiteDB", name: str) -> None:
+        """Table of json documents with TinyDB like interface
+
+        Args:
+            db (SQLiteDB): Database holding the table
+            name (str): Name of the table
+        """
+        self.db = db
+        self.name = name
+        self.columns: dict = table_columns.get(name, dict())
+
+        columns = "".join(f", {column}" for column in self.columns)
+        key = "INTEGER PRIMARY KEY"
+        if name in table_autoincrement:
+            key += " AUTOINCREMENT"
+        self.db.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {name} "
+            f"(doc_id {key}, doc TEXT NOT NULL{columns})"
+        )
+        for index in table_indexes.get(name, list()):
+            self.db.conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {name}_{'_'.join(index)} "
+                f"ON {name} ({', '.join(index)})"
+            )
+    # <-- End of __init__()
+
+    def _row(self, doc: dict) -> list:
+        """Build json text and indexed column values of a document"""
+        values = [json.dumps(doc, ensure_ascii=False)]
+        values.extend(read(doc) for read in self.columns.values())
+        return values
+    # <-- End of _row()
+
+    def _documents(self, sql: str, params=()) -> list[Document]:
+        """Run a select of doc_id and doc, return them as documents"""
+        return [
+            Document(json.loads(doc), doc_id)
+            for doc_id, doc in self.db.conn.execute(sql, params)
+        ]
+    # <-- End of _documents()
+
+    def __len__(self) -> int:
+        return self.db.conn.execute(
+            f"SELECT COUNT(*) FROM {self.name}"
+        ).fetchone()[0]
+    # <-- End of __len__()
+
+    def transaction(self):
+        """Shortcut to SQLiteDB.transaction"""
+        return self.db.transaction()
+    # <-- End of transaction()
+
+    def all(self) -> list[Document]:
+        """Read all documents of the table
+
+        Returns:
+            list[Document]: All documents in insertion order
+        """
+        return self._documents(f"SELECT doc_id, doc FROM {self.name}")
+    # <-- End of all()
+
+    def get(self, doc_id: int) -> Document:
+        """Read a document by its id
+
+        Args:
+            doc_id (int): Document id
+
+        Returns:
+            Document: The document, None if it does not exist
+        """
+        docs = self._documents(
+            f"SELECT doc_id, doc FROM {self.name} WHERE doc_id = ?", (doc_id,)
+        )
+        return docs[0] if len(docs) > 0 else None
+    # <-- End of get()
+
+    def select(self, *columns: str) -> list[tuple]:
+        """Read indexed columns of all documents without decoding them
+
+        Returns:
+            list[tuple]: Values of the columns for every document
+        """
+        return self.db.conn.execute(
+            f"SELECT {', '.join(columns)} FROM {self.name}"
+        ).fetchall()
+    # <-- End of select()
+
+    def find(self, **fields) -> list[Document]:
+        """Find documents whose fields equal given values, indexed columns
+        are matched in SQL, other fields are matched after decoding
+
+        Returns:
+            list[Document]: Matching documents
+        """
+        indexed = {k: v for k, v in fields.items() if k in self.columns}
+        others = {k: v for k, v in fields.items() if k not in self.columns}
+
+        sql = f"SELECT doc_id, doc FROM {self.name}"
+        if len(indexed) > 0:
+            sql += " WHERE " + " AND ".join(f"{k} = ?" for k in indexed)
+
+        return [
+            doc
+            for doc in self._documents(sql, tuple(indexed.values()))
+            if all(doc.get(k) == v for k, v in others.items())
+        ]
+    # <-- End of find()
+
+    def find_sorted(self, order_by: str, limit: int, **fields) -> list[Document]:
+        """Find documents by indexed columns, largest order_by value first,
+        ties keep insertion order
+
+        Args:
+            order_by (str): Indexed column to sort on
+            limit (int): Maximum number of documents
+
+        Returns:
+            list[Document]: Matching documents
+        """
+        sql = f"SELECT doc_id, doc FROM {self.name}"
+        if len(fields) > 0:
+            sql += " WHERE " + " AND ".join(f"{k} = ?" for k in fields)
+        sql += f" ORDER BY {order_by} DESC, doc_id LIMIT ?"
+
+        return self._documents(sql, tuple(fields.values()) + (limit,))
+    # <-- End of find_sorted()
+
+    def find_overflow(
+        self, group_by: str, order_by: str, keep: int
+    ) -> list[Document]:
+        """Find documents ranked after the keep first of their group, the
+        order of find_sorted, walking the index on (group_by, order_by)
+
+        Args:
+            group_by (str): Indexed column grouping documents
+            order_by (str): Indexed column to rank on, largest first
+            keep (int): Documents kept per group
+
+        Returns:
+            list[Document]: Documents beyond the first keep of each group
+        """
+        return self._documents(
+            f"SELECT doc_id, doc FROM (SELECT doc_id, doc, ROW_NUMBER() "
+            f"OVER (PARTITION BY {group_by} ORDER BY {order_by} DESC, doc_id)"
+            f" AS rank FROM {self.name}) WHERE rank > ?",
+            (keep,),
+        )
+    # <-- End of find_overflow()
+
+    def find_below(self, column: str, value) -> list[Document]:
+        """Find documents whose indexed column is less than value
+
+        Args:
+            column (str): Indexed column name
+            value (Any): Exclusive upper bound
+
+        Returns:
+            list[Document]: Matching documents
+        """
+        return self._documents(
+            f"SELECT doc_id, doc FROM {self.name} WHERE {column} < ?", (value,)
+        )
+    # <-- End of find_below()
+
+    def find_after(self, doc_id: int) -> list[Document]:
+        """Find documents inserted after a document, a range scan of the
+        primary key
+
+        Args:
+            doc_id (int): Exclusive lower bound of document ids
+
+        Returns:
+            list[Document]: Matching documents in insertion order
+        """
+        return self._documents(
+            f"SELECT doc_id, doc FROM {self.name} "
+            f"WHERE doc_id > ? ORDER BY doc_id",
+            (doc_id,),
+        )
+    # <-- End of find_after()
+
+    def find_not_in(self, column: str, values) -> list[Document]:
+        """Find documents whose indexed column is not one of values
+
+        Args:
+            column (str): Indexed column name
+            values (Iterable): Values to skip
+
+        Returns:
+            list[Document]: Matching documents
+        """
+        values = list(values)
+        marks = ", ".join("?" * len(values))
+        return self._documents(
+            f"SELECT doc_id, doc FROM {self.name} "
+            f"WHERE {column} NOT IN ({marks})",
+            values,
+        )
+    # <-- End of find_not_in()
+
+    def insert(self, doc: dict) -> int:
+        """Insert a document
+
+        Args:
+            doc (dict): Document to insert
+
+        Returns:
+            int: Id of the new document
+        """
+        marks = ", ".join("?" * (len(self.columns) + 1))
+        columns = "".join(f", {column}" for column in self.columns)
+        cursor = self.db.conn.execute(
+            f"INSERT INTO {self.name} (doc{columns}) VALUES ({marks})",
+            self._row(doc),
+        )
+        return cursor.lastrowid
+    # <-- End of insert()
+
+    def insert_multiple(self, docs: list[dict]) -> list[int]:
+        """Insert documents in one transaction
+
+        Args:
+            docs (list[dict]): Documents to insert
+
+        Returns:
+            list[int]: Ids of the new documents
+        """
+        with self.transaction():
+            return [self.insert(doc) for doc in docs]
+    # <-- End of insert_multiple()
+
+    def update(self, fields: dict, doc_ids: list[int]) -> list[int]:
+        """Update fields of documents
+
+        Args:
+            fields (dict): Fields to set
+            doc_ids (list[int]): Ids of documents to update
+
+        Returns:
+            list[int]: Ids of updated documents
+        """
+        assignments = "".join(f", {column} = ?" for column in self.columns)
+        updated = list()
+
+        with self.transaction():
+            for doc_id in doc_ids:
+                doc = self.get(doc_id)
+                if doc is None:
+                    continue
+
+                doc.update(fields)
+                self.db.conn.execute(
+                    f"UPDATE {self.name} SET doc = ?{assignments} "
+                    "WHERE doc_id = ?",
+                    self._row(doc) + [doc_id],
+                )
+                updated.append(doc_id)
+
+        return updated
+    # <-- End of update()
+
+    def replace(self, docs: dict[int, dict]) -> None:
+        """Overwrite whole documents, unlike update() fields missing from
+        the new document are dropped
+
+        Args:
+            docs (dict[int, dict]): [key]: document id, [value]: new document
+        """
+        assignments = "".join(f", {column} = ?" for column in self.columns)
+        with self.transaction():
+            self.db.conn.executemany(
+                f"UPDATE {self.name} SET doc = ?{assignments} WHERE doc_id = ?",
+                [self._row(doc) + [doc_id] for doc_id, doc in docs.items()],
+            )
+    # <-- End of replace()
+
+    def remove(self, doc_ids: list[int]) -> list[int]:
+        """Remove documents
+
+        Args:
+            doc_ids (list[int]): Ids of documents to remove
+
+        Returns:
+            list[int]: Ids of removed documents
+        """
+        doc_ids = list(doc_ids)
+        with self.transaction():
+            self.db.conn.executemany(
+                f"DELETE FROM {self.name} WHERE doc_id = ?",
+                [(doc_id,) for doc_id in doc_ids],
+            )
+        return doc_ids
+    # <-- End of remove()
+
+    def remove_not_in(self, column: str, values) -> None:
+        """Remove documents whose indexed column is not one of values
+
+        Args:
+            column (str): Indexed column name
+            values (Iterable): Values to keep
+        """
+        values = list(values)
+        marks = ", ".join("?" * len(values))
+        self.db.conn.execute(
+            f"DELETE FROM {self.name} WHERE {column} NOT IN ({marks})", values
+        )
+    # <-- End of remove_not_in()
+
+    def truncate(self) -> None:
+        """Remove all documents"""
+        self.db.conn.execute(f"DELETE FROM {self.name}")
+    # <-- End of truncate()
+
+# <-- End of class SQLiteTable
+
+
+class SQLiteDB:
+    def __init__(self, path: str) -> None:
+        """SQLite database with TinyDB like tables
+
+        Args:
+            path (str): Path to database file
+        """
+        self.path = path
+        # Autocommit, writes are grouped by transaction()
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+
+        self._tables: dict[str, SQLiteTable] = dict()
+        self._depth = 0
+    # <-- End of __init__()
+
+    def table(self, name: str) -> SQLiteTable:
+        """Get a table, creating it when missing
+
+        Args:
+            name (str): Name of the table
+
+        Returns:
+            SQLiteTable: The table
+        """
+        if name not in self._tables:
+            self._tables[name] = SQLiteTable(self, name)
+        return self._tables[name]
+    # <-- End of table()
+
+    def tables(self) -> set[str]:
+        """Get names of all tables in database
+
+        Returns:
+            set[str]: Table names
+        """
+        return {
+            name
+            for (name,) in self.conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' "
+                "AND name NOT LIKE 'sqlite_%'"
+            )
+        }
+    # <-- End of tables()
+
+    @contextmanager
+    def transaction(self):
+        """Group writes in one transaction, nested calls join the outer one"""
+        if self._depth == 0:
+            self.conn.execute("BEGIN")
+        self._depth += 1
+
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute("ROLLBACK")
+            raise
+
+        self._depth -= 1
+        if self._depth == 0:
+            self.conn.execute("COMMIT")
+    # <-- End of transaction()
+
+    def vacuum(self) -> None:
+        """Give space of deleted rows back to the file system"""
+        self.conn.execute("VACUUM")
+        # In WAL mode the rebuilt database lands in the log first, fold it
+        # into the database file and empty the log
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    # <-- End of vacuum()
+
+    def close(self) -> None:
+        self.conn.close()
+    # <-- End of close()
+
+# <-- End of class SQLiteDB
+
+
+def migrate_tinydb(json_path: str, db: SQLiteDB) -> int:
+    """Copy every table of a TinyDB json file into a SQLite database,
+    document ids are kept
+
+    The copy runs once per database. Its end is recorded in user_version
+    in the same transaction, so a copy failing half way is rolled back and
+    runs again on the next open.
+
+    Args:
+        json_path (str): Path to TinyDB json file
+        db (SQLiteDB): Destination database
+
+    Returns:
+        int: Number of documents copied
+    """
+    if db.conn.execute("PRAGMA user_version").fetchone()[0] > 0:
+        return 0
+
+    with db.transaction():
+        count = 0
+        # Databases filled before the version was recorded are done
+        if os.path.exists(json_path) and not _has_rows(db):
+            count = _copy_tinydb(json_path, db)
+        db.conn.execute("PRAGMA user_version = 1")
+
+    return count
+# <-- End of migrate_tinydb()
+
+
+def _has_rows(db: SQLiteDB) -> bool:
+    """Check if any table of a database holds a document"""
+    return any(
+        db.conn.execute(f"SELECT 1 FROM {name} LIMIT 1").fetchone()
+        for name in db.tables()
+    )
+# <-- End of _has_rows()
+
+
+def _copy_tinydb(json_path: str, db: SQLiteDB) -> int:
+    """Copy the tables of migrate_tinydb inside its transaction"""
+    source = TinyDB(json_path)
+    count = 0
+
+    try:
+        for name in source.tables():
+            table = db.table(name)
+            columns = "".join(f", {column}" for column in table.columns)
+            marks = ", ".join("?" * (len(table.columns) + 2))
+
+            for doc in source.table(name).all():
+                db.conn.execute(
+                    f"INSERT INTO {name} (doc_id, doc{columns}) "
+                    f"VALUES ({marks})",
+                    [doc.doc_id] + table._row(doc),
+                )
+                count += 1
+    finally:
+        source.close()
+    return count
+# <-- End of _copy_tinydb()
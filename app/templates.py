@@ -0,0 +1,139 @@
+import os
+import re
+import string
+import threading
+
+# -------------------------------------
+# Email template engine
+# -------------------------------------
+#
+# Templates come in two flavours, both found in data directory:
+#   - field templates, str.format syntax, e.g. "{views} views"
+#   - block templates, whole documents with "{% content %}" slots, whose
+#     other braces (css) are kept as they are
+# Both compile to a list of literal parts and slots, rendering joins them.
+
+_block = re.compile(r"{%\s*(\w+)\s*%}")
+
+
+class Template:
+    def __init__(self, source: str, blocks: bool = False) -> None:
+        """Compile template source into literal parts and slots
+
+        Args:
+            source (str): Template text
+            blocks (bool, optional): Only "{% name %}" slots are filled,
+            every other brace is literal. Defaults to False, str.format
+            syntax.
+        """
+        # (literal, slot name or None, format spec)
+        self.parts: list[tuple[str, str, str]] = list()
+
+        if blocks:
+            pieces = _block.split(source)
+            # Split alternates literal text and slot names
+            for idx in range(0, len(pieces), 2):
+                name = pieces[idx + 1] if idx + 1 < len(pieces) else None
+                self.parts.append((pieces[idx], name, ""))
+        else:
+            for literal, name, spec, _ in string.Formatter().parse(source):
+                self.parts.append((literal, name, spec or ""))
+    # <-- End of __init__()
+
+    def render(self, **context) -> str:
+        """Fill slots of the template
+
+        Raises:
+            KeyError: When a slot is missing from context
+
+        Returns:
+            str: Rendered text
+        """
+        chunks = list()
+
+        for literal, name, spec in self.parts:
+            chunks.append(literal)
+            if name is not None:
+                chunks.append(format(context[name], spec))
+
+        return "".join(chunks)
+    # <-- End of render()
+
+# <-- End of class Template
+
+
+class TemplateEngine:
+    def __init__(self, directory: str) -> None:
+        """Load templates of a directory, each file is read and compiled
+        once, then again only when its modification time changes
+
+        Args:
+            directory (str): Directory holding template files
+        """
+        self.directory = directory
+        # [key]: (file name, blocks), [value]: (mtime, template)
+        self._cache: dict[tuple[str, bool], tuple[int, Template]] = dict()
+        self._lock = threading.Lock()
+    # <-- End of __init__()
+
+    def get(self, name: str, blocks: bool = False) -> Template:
+        """Get a compiled template
+
+        Args:
+            name (str): File name in directory
+            blocks (bool, optional): Compile as block template. Defaults to
+            False.
+
+        Returns:
+            Template: Compiled template
+        """
+        path = os.path.join(self.directory, name)
+        mtime = os.stat(path).st_mtime_ns
+
+        with self._lock:
+            cached = self._cache.get((name, blocks))
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+            with open(path, "r") as file:
+                template = Template(file.read(), blocks)
+
+            self._cache[(name, blocks)] = (mtime, template)
+            return template
+    # <-- End of get()
+
+# <-- End of class TemplateEngine
+
+
+# One engine per directory for the whole process
+_engines: dict[str, TemplateEngine] = dict()
+_engines_lock = threading.Lock()
+
+
+def get_engine(directory: str) -> TemplateEngine:
+    """Get the shared template engine of a directory
+
+    Args:
+        directory (str): Directory holding template files
+
+    Returns:
+        TemplateEngine: Engine caching templates of the directory
+    """
+    directory = os.path.normpath(directory)
+
+    with _engines_lock:
+        if directory not in _engines:
+            _engines[directory] = TemplateEngine(directory)
+        return _engines[directory]
+# <-- End of get_engine()
+
+
+def format_video_names(videos: list[dict]) -> None:
+    CHAR_LIMIT = 30
+    CHAR_LIMIT_WITH_DOT = CHAR_LIMIT - 3
+    for video in videos:
+        video["name"] = (
+            video["name"] if len(video["name"]) < CHAR_LIMIT else
+            video["name"][:CHAR_LIMIT_WITH_DOT] + "..."
+        )
+# <-- End of format_video_names()
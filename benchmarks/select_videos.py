@@ -0,0 +1,91 @@
+"""Benchmark db_select_videos against the per-model search it replaced.
+
+Usage:
+    python -m benchmarks.select_videos [models] [videos]
+"""
+import sys
+import time
+import random
+import datetime
+import numpy as np
+from tinydb import TinyDB, Query
+from tinydb.storages import MemoryStorage
+
+from app.database_helpers import db_select_videos, db_migrate
+from app.templates import format_video_names
+
+
+def legacy_select_videos(db, models: list[str]) -> list[dict]:
+    """db_select_videos before the single pass selection"""
+    query = Query()
+    videos = np.array([])
+
+    for model in models:
+        model_videos = np.array(db.search(query.model == model))
+
+        # format videos
+        for video in model_videos:
+            video["upload time"] = datetime.datetime.strptime(
+                video["upload time"], "%m/%d/%Y"
+            )
+        format_video_names(model_videos)
+
+        model_videos = np.array(
+            sorted(model_videos, key=lambda v: v["upload time"], reverse=True)
+        )
+        videos = np.append(videos, model_videos[:2])
+
+    return videos
+# <-- End of legacy_select_videos()
+
+
+def make_catalog(models: int, videos: int) -> TinyDB:
+    """Build an in-memory database of version 1 videos with random upload
+    times"""
+    random.seed(0)
+    start = datetime.datetime(2018, 1, 1)
+    db = TinyDB(storage=MemoryStorage)
+    db.table("videos").insert_multiple(
+        {
+            "id": f"ID-{idx}",
+            "name": f"video name {idx}" * 3,
+            "model": f"model{idx % models}",
+            "link": f"https://jable.tv/videos/id-{idx}/",
+            "image": "image",
+            "views": idx,
+            "likes": idx,
+            "tags": ["tag"],
+            "upload time": (
+                start + datetime.timedelta(days=random.randrange(1500))
+            ).strftime("%m/%d/%Y"),
+        }
+        for idx in range(videos)
+    )
+    return db
+# <-- End of make_catalog()
+
+
+def timed(func, *args) -> tuple[float, list]:
+    begin = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - begin, result
+# <-- End of timed()
+
+
+if __name__ == "__main__":
+    n_models = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    n_videos = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+
+    db = make_catalog(n_models, n_videos)
+    models = [f"model{idx}" for idx in range(n_models)]
+
+    legacy_time, legacy = timed(legacy_select_videos, db.table("videos"), models)
+    db_migrate(db)
+    new_time, selected = timed(db_select_videos, db.table("videos"), models)
+
+    assert [v["id"] for v in legacy] == [v["id"] for v in selected]
+
+    print(f"{n_models} models / {n_videos} videos")
+    print(f"legacy db_select_videos: {legacy_time:.3f}s")
+    print(f"db_select_videos:        {new_time:.3f}s")
+    print(f"speedup:                 {legacy_time / new_time:.1f}x")
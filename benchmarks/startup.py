@@ -0,0 +1,150 @@
+"""Measure cold-start latency of every runner with python -X importtime.
+
+Each runner module is imported in a fresh interpreter, its __main__ block
+does not run. Reported per runner: total import time, wall time of the
+whole interpreter, the modules slowest to import themselves and which heavy
+dependencies got loaded.
+
+Usage:
+    python -m benchmarks.startup [--runs N] [--json PATH] [--compare PATH]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+root = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
+
+runners = [
+    "fetch_runner",
+    "daily_email_runner",
+    "weekly_email_runner",
+    "scheduler_runner",
+]
+
+# Dependencies only a fetch should load
+heavy_modules = ["bs4", "lxml", "cloudscraper", "requests", "aiohttp", "numpy"]
+
+# Slower than the baseline by this ratio counts as a regression
+regression_ratio = 1.2
+
+
+def import_times(runner: str) -> tuple[int, dict[str, int]]:
+    """Import a runner with -X importtime
+
+    Returns:
+        tuple[int, dict[str, int]]: Total microseconds, and microseconds
+        spent in each module itself
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {runner}"],
+        cwd=root, capture_output=True, text=True, check=True,
+    )
+
+    total = 0
+    own = dict()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        own[name.strip()] = int(self_us)
+        # Nested imports are indented under their parent
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return total, own
+# <-- End of import_times()
+
+
+def wall_time(runner: str) -> float:
+    """Seconds for a fresh interpreter to import a runner and exit"""
+    begin = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", f"import {runner}"], cwd=root, check=True
+    )
+    return time.perf_counter() - begin
+# <-- End of wall_time()
+
+
+def loaded_heavy(runner: str) -> list[str]:
+    """Heavy dependencies in sys.modules after importing a runner"""
+    code = (
+        f"import sys, json, {runner}; "
+        f"print(json.dumps([m for m in {heavy_modules!r} if m in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=root, capture_output=True,
+        text=True, check=True,
+    )
+    return json.loads(result.stdout)
+# <-- End of loaded_heavy()
+
+
+def measure(runs: int) -> dict[str, dict]:
+    """Measure every runner, keeping the fastest of runs attempts"""
+    report = dict()
+
+    for runner in runners:
+        total, own = min(
+            (import_times(runner) for _ in range(runs)), key=lambda x: x[0]
+        )
+        slowest = sorted(own.items(), key=lambda x: x[1], reverse=True)
+
+        report[runner] = {
+            "import_ms": total / 1000,
+            "wall_ms": min(wall_time(runner) for _ in range(runs)) * 1000,
+            "slowest": {name: us / 1000 for name, us in slowest[:5]},
+            "heavy": loaded_heavy(runner),
+        }
+
+    return report
+# <-- End of measure()
+
+
+def compare(report: dict, baseline: dict) -> list[str]:
+    """List runners whose import time regressed against a baseline"""
+    regressions = list()
+
+    for runner, result in report.items():
+        before = baseline.get(runner)
+        if before is None:
+            continue
+        if result["import_ms"] > before["import_ms"] * regression_ratio:
+            regressions.append(
+                f"{runner}: {before['import_ms']:.1f}ms -> "
+                f"{result['import_ms']:.1f}ms"
+            )
+
+    return regressions
+# <-- End of compare()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="Save report to this file")
+    parser.add_argument("--compare", help="Baseline report to compare with")
+    args = parser.parse_args()
+
+    report = measure(args.runs)
+
+    for runner, result in report.items():
+        print(
+            f"{runner:<22} import {result['import_ms']:7.1f}ms  "
+            f"wall {result['wall_ms']:7.1f}ms  "
+            f"heavy: {', '.join(result['heavy']) or '-'}"
+        )
+        for name, ms in result["slowest"].items():
+            print(f"{'':<24}{name:<28}{ms:7.1f}ms")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            regressions = compare(report, json.load(file))
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if len(regressions) > 0 else 0)
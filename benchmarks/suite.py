@@ -0,0 +1,383 @@
+"""Offline benchmark suite of the scraping, database and rendering stages.
+
+Stages:
+    parse_fixtures       get_videos, get_tags and get_date over the saved
+                         model and video pages of tests/fixtures
+    db_insert_videos     upsert a catalog into a half filled database, then
+                         commit, on every backend
+    db_select_videos     newest videos of every model, on every backend
+    format_weekly_email  render the weekly email of a selection
+
+Database and rendering stages run over generated catalogs of every size,
+one model per 100 videos. Each case reports its best time out of --repeat
+runs, items processed per second and the peak memory of Python allocations
+in one extra run traced with tracemalloc. Nothing touches the network or
+data/db files.
+
+Usage:
+    python -m benchmarks.suite [--sizes 1000,10000,100000] [--stages NAMES]
+        [--backends tinydb,sqlite] [--repeat N] [--json PATH]
+        [--compare PATH] [--ratio R]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import platform
+import tracemalloc
+from typing import Callable, Iterator
+from bs4 import BeautifulSoup
+
+from app.helpers import get_videos, get_tags, get_date
+from app.database_helpers import db_insert_videos, db_select_videos
+from app.db_session import DatabaseSession
+from app.catalog import Catalog
+from app.scraper import Scraper
+from app.schema import SCHEMA_VERSION
+from tests.fake_session import FixtureSession, fixtures_path
+
+root = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
+
+stages = [
+    "parse_fixtures",
+    "db_insert_videos",
+    "db_select_videos",
+    "format_weekly_email",
+]
+sizes = [1_000, 10_000, 100_000]
+backends = {"tinydb": "db.json", "sqlite": "db.sqlite3"}
+
+# Slower or hungrier than the baseline by this ratio counts as a regression
+regression_ratio = 1.2
+
+# Timed part of a case, returns the number of items it processed
+Run = Callable[[], int]
+
+
+# -------------------------------------
+# Synthetic data
+# -------------------------------------
+
+
+def make_videos(count: int, seed: int = 0) -> list[dict]:
+    """Generate videos of the current schema, one model per 100 videos
+
+    Args:
+        count (int): Number of videos
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        list[dict]: Videos with random names, counts and upload days
+    """
+    rng = random.Random(seed)
+    tags = ["中文字幕", "巨乳", "角色劇情", "制服", "美腿", "絲襪", "溫泉"]
+    # Upload days spread over four years, at UTC midnight like schema.to_epoch
+    first_day = 1_514_764_800
+
+    return [
+        {
+            "id": f"SYN-{idx}",
+            "name": f"video {idx} " + "name " * rng.randrange(2, 12),
+            "model": f"model{idx % max(1, count // 100)}",
+            "link": f"https://jable.tv/videos/syn-{idx}/",
+            "image": f"https://assets.jable.tv/contents/videos_screenshots/{idx}.jpg",
+            "views": rng.randrange(1_000_000),
+            "likes": rng.randrange(10_000),
+            "tags": rng.sample(tags, 3),
+            "uploaded": first_day + rng.randrange(1500) * 86_400,
+            "subtitle": rng.random() < 0.5,
+        }
+        for idx in range(count)
+    ]
+# <-- End of make_videos()
+
+
+def model_names(videos: list[dict]) -> list[str]:
+    """Models of a catalog in order of appearance"""
+    return list(dict.fromkeys(video["model"] for video in videos))
+# <-- End of model_names()
+
+
+def open_session(directory: str, backend: str) -> DatabaseSession:
+    """Open a new database of the current schema in a directory"""
+    db = DatabaseSession(os.path.join(directory, backends[backend]))
+    db.table("meta").insert({"schema": SCHEMA_VERSION})
+    db.commit()
+    return db
+# <-- End of open_session()
+
+
+# -------------------------------------
+# Stages
+# -------------------------------------
+#
+# A stage prepares its input outside of the timed part and hands back a
+# Run. Preparation is repeated before every run, so runs never see the
+# writes of the previous one.
+
+
+def read_fixtures(prefix: str) -> list[bytes]:
+    """Read every saved html fixture whose name starts with prefix"""
+    pages = list()
+    for name in sorted(os.listdir(fixtures_path)):
+        if name.startswith(prefix):
+            with open(os.path.join(fixtures_path, name), "rb") as file:
+                pages.append(file.read())
+    return pages
+# <-- End of read_fixtures()
+
+
+def prepare_parse(directory: str) -> Run:
+    """Parse model pages into videos, and video pages into tags and dates,
+    the way a fetch without incremental state does"""
+    model_pages = read_fixtures("model_page")
+    video_pages = read_fixtures("video_")
+    session = FixtureSession()
+
+    def run() -> int:
+        for page in model_pages:
+            get_videos(session, BeautifulSoup(page, "lxml"), "model")
+        for page in video_pages:
+            soup = BeautifulSoup(page, "lxml")
+            get_tags(soup)
+            get_date(soup)
+        return len(model_pages) + len(session.requests) + len(video_pages)
+
+    return run
+# <-- End of prepare_parse()
+
+
+def prepare_insert(directory: str, backend: str, size: int) -> Run:
+    """Upsert a whole catalog into a database holding half of it, so half
+    the videos are inserted and half refreshed"""
+    videos = make_videos(size)
+    db = open_session(directory, backend)
+    db_insert_videos(db.table("videos"), videos[::2])
+    db.commit()
+
+    def run() -> int:
+        db_insert_videos(db.table("videos"), videos)
+        db.close()
+        return len(videos)
+
+    return run
+# <-- End of prepare_insert()
+
+
+def prepare_select(directory: str, backend: str, size: int) -> Run:
+    """Select the newest videos of every model of a saved catalog"""
+    videos = make_videos(size)
+    models = model_names(videos)
+    db = open_session(directory, backend)
+    db_insert_videos(db.table("videos"), videos)
+    db.commit()
+
+    def run() -> int:
+        # TinyDB builds its catalog here, as the first email of a run does
+        db_select_videos(db.table("videos"), models)
+        db.close()
+        return len(videos)
+
+    return run
+# <-- End of prepare_select()
+
+
+def prepare_render(directory: str, size: int) -> Run:
+    """Render the weekly email of every model of a catalog"""
+    videos = make_videos(size)
+    catalog = Catalog(videos)
+    context = {
+        "email": "weekly",
+        "videos": db_select_videos(catalog, model_names(videos)),
+    }
+
+    # Only templates of the data directory are needed to render
+    scraper = Scraper.__new__(Scraper)
+    scraper._data_path = os.path.join(root, "data")
+
+    def run() -> int:
+        scraper.format_weekly_email(context)
+        return len(context["videos"])
+
+    return run
+# <-- End of prepare_render()
+
+
+def cases(
+    wanted: list[str], sizes: list[int], backends: list[str]
+) -> Iterator[tuple[str, Callable[[str], Run]]]:
+    """List benchmark cases as (name, prepare), prepare takes a scratch
+    directory"""
+    if "parse_fixtures" in wanted:
+        yield "parse_fixtures", prepare_parse
+
+    for size in sizes:
+        for backend in backends:
+            if "db_insert_videos" in wanted:
+                yield (
+                    f"db_insert_videos/{backend}/{size}",
+                    lambda path, b=backend, s=size: prepare_insert(path, b, s),
+                )
+            if "db_select_videos" in wanted:
+                yield (
+                    f"db_select_videos/{backend}/{size}",
+                    lambda path, b=backend, s=size: prepare_select(path, b, s),
+                )
+        if "format_weekly_email" in wanted:
+            yield (
+                f"format_weekly_email/{size}",
+                lambda path, s=size: prepare_render(path, s),
+            )
+# <-- End of cases()
+
+
+# -------------------------------------
+# Measuring and comparing
+# -------------------------------------
+
+
+def measure(prepare: Callable[[str], Run], repeat: int) -> dict:
+    """Time a case, then trace its memory in one more run
+
+    Args:
+        prepare (Callable[[str], Run]): Prepares one run in a directory
+        repeat (int): Timed runs, the fastest is kept
+
+    Returns:
+        dict: seconds, items, items per_second and peak_mb
+    """
+    best = float("inf")
+
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as directory:
+            run = prepare(directory)
+            begin = time.perf_counter()
+            items = run()
+            best = min(best, time.perf_counter() - begin)
+
+    with tempfile.TemporaryDirectory() as directory:
+        run = prepare(directory)
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "seconds": best,
+        "items": items,
+        "per_second": items / best,
+        "peak_mb": peak / 2**20,
+    }
+# <-- End of measure()
+
+
+def compare(
+    report: dict, baseline: dict, ratio: float = regression_ratio
+) -> list[str]:
+    """List cases whose throughput or peak memory regressed against a
+    baseline, cases missing from either report are skipped
+
+    Args:
+        report (dict): Results of this run
+        baseline (dict): Results to compare with
+        ratio (float, optional): Tolerated slowdown and memory growth.
+        Defaults to regression_ratio.
+
+    Returns:
+        list[str]: A line per regression
+    """
+    regressions = list()
+    before_results = baseline["results"]
+
+    for name, result in report["results"].items():
+        before = before_results.get(name)
+        if before is None:
+            continue
+        if result["per_second"] * ratio < before["per_second"]:
+            regressions.append(
+                f"{name}: {before['per_second']:,.0f}/s -> "
+                f"{result['per_second']:,.0f}/s"
+            )
+        if result["peak_mb"] > before["peak_mb"] * ratio:
+            regressions.append(
+                f"{name}: {before['peak_mb']:.1f}MB -> "
+                f"{result['peak_mb']:.1f}MB peak"
+            )
+
+    return regressions
+# <-- End of compare()
+
+
+def run_suite(
+    wanted: list[str] = stages,
+    sizes: list[int] = sizes,
+    backends: list[str] = list(backends),
+    repeat: int = 3,
+) -> dict:
+    """Run every case of the wanted stages
+
+    Returns:
+        dict: Environment of the run, and results by case name
+    """
+    results = dict()
+    for name, prepare in cases(wanted, sizes, backends):
+        results[name] = measure(prepare, repeat)
+
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "results": results,
+    }
+# <-- End of run_suite()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--sizes", default=",".join(map(str, sizes)),
+        help="Catalog sizes, separated by commas",
+    )
+    parser.add_argument(
+        "--stages", default=",".join(stages),
+        help="Stages to run, separated by commas",
+    )
+    parser.add_argument(
+        "--backends", default=",".join(backends),
+        help="Database backends, separated by commas",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Save report to this file")
+    parser.add_argument("--compare", help="Baseline report to compare with")
+    parser.add_argument("--ratio", type=float, default=regression_ratio)
+    args = parser.parse_args()
+
+    report = run_suite(
+        args.stages.split(","),
+        [int(size) for size in args.sizes.split(",")],
+        args.backends.split(","),
+        args.repeat,
+    )
+
+    for name, result in report["results"].items():
+        print(
+            f"{name:<36} {result['seconds'] * 1000:9.1f}ms  "
+            f"{result['per_second']:>12,.0f}/s  "
+            f"peak {result['peak_mb']:7.1f}MB"
+        )
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            regressions = compare(report, json.load(file), args.ratio)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if len(regressions) > 0 else 0)
@@ -2,4 +2,8 @@ from app.scraper import Scraper
 
 if __name__ == "__main__":
     s = Scraper()
-    s.send_daily_email()
+    try:
+        s.send_daily_email()
+    finally:
+        s.export_metrics("daily")
+        s.close()
@@ -1,5 +1,28 @@
+import os
+
 from app.scraper import Scraper
+from app.constants import fetch_options
 
 if __name__ == '__main__':
     s = Scraper()
-    s.fetch()
+    # Shards are saved by the merge, they have no journal to resume
+    options = {k: v for k, v in fetch_options.items() if k != 'resume'}
+    # Containers fetching one shard each set shard_index and shard_count,
+    # then one run with shard_count only merges the shards
+    shard_count = int(os.getenv('shard_count', '0'))
+    shard_index = os.getenv('shard_index')
+    processes = int(os.getenv('fetch_processes', '1'))
+    job = 'fetch'
+    try:
+        if shard_count > 0 and shard_index is not None:
+            job = f'fetch_shard_{shard_index}'
+            s.fetch_shard(int(shard_index), shard_count, **options)
+        elif shard_count > 0:
+            s.merge_shards(shard_count)
+        elif processes > 1:
+            s.fetch_sharded(processes, **options)
+        else:
+            s.fetch(**fetch_options)
+    finally:
+        s.export_metrics(job)
+        s.close()
@@ -0,0 +1,13 @@
+import logging
+
+from app.scraper import Scraper
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    s = Scraper()
+    try:
+        logging.info("Retention report: %s", s.apply_retention())
+    finally:
+        s.export_metrics("retention")
+        s.close()
@@ -0,0 +1,19 @@
+import logging
+import signal
+
+from app.scraper import Scraper
+from app.scheduler import Scheduler
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+
+    s = Scraper()
+    scheduler = Scheduler(s)
+    signal.signal(signal.SIGTERM, lambda *_: scheduler.stop())
+
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        s.close()
@@ -0,0 +1,144 @@
+import asyncio
+import pytest
+import requests
+from aiohttp import web
+from bs4 import BeautifulSoup
+
+from app.async_fetcher import AsyncScraper, get_videos_async
+from app.fetcher import FetchError
+from app.helpers import get_videos
+from tests.fake_scraper import make_scraper
+from tests.fake_session import FixtureSession
+
+
+class FixtureAsyncSession():
+    """Asyncio stand-in for AsyncScraper serving saved html fixtures"""
+
+    def __init__(self) -> None:
+        self.session = FixtureSession()
+
+    async def get(self, url: str) -> bytes:
+        await asyncio.sleep(0)
+        return self.session.get(url).content
+
+    async def __aenter__(self) -> 'FixtureAsyncSession':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+# <-- End of FixtureAsyncSession
+
+
+async def serve(handler, callback):
+    """Run callback against a local server answering with handler"""
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        return await callback(f'http://127.0.0.1:{port}')
+    finally:
+        await runner.cleanup()
+
+
+class TestAsyncFetcher():
+
+    model_url = 'https://jable.tv/models/yua-mikami/'
+
+    def test_get_videos_async(self):
+        session = FixtureSession()
+        page = BeautifulSoup(session.get(self.model_url).content, 'lxml')
+        expected = get_videos(session, page, model='三上悠亞')
+
+        videos = asyncio.run(
+            get_videos_async(FixtureAsyncSession(), page, model='三上悠亞'))
+
+        assert len(videos) == 3
+        assert videos == expected
+    # <-- End of test_get_videos_async()
+
+    def test_reuse_challenge_session(self):
+        async def handler(request):
+            if request.cookies.get('cf_clearance') != 'solved':
+                return web.Response(status=503)
+            return web.Response(body=request.headers['User-Agent'].encode())
+
+        async def callback(base):
+            blocking = requests.Session()
+            blocking.headers['User-Agent'] = 'jable-test-agent'
+            blocking.cookies.set('cf_clearance', 'solved')
+
+            async with AsyncScraper(blocking, per_host=2) as scraper:
+                return await asyncio.gather(
+                    *(scraper.get(f'{base}/videos/{i}/') for i in range(4)))
+
+        pages = asyncio.run(serve(handler, callback))
+        assert pages == [b'jable-test-agent'] * 4
+    # <-- End of test_reuse_challenge_session()
+
+    def test_solve_challenge(self):
+        solved = list()
+
+        async def handler(request):
+            if request.cookies.get('cf_clearance') != 'solved':
+                return web.Response(status=503)
+            return web.Response(body=b'ok')
+
+        class BlockingScraper(requests.Session):
+            def get(self, url, **kwargs):
+                # Pretend to solve the challenge, then fetch the page
+                solved.append(url)
+                self.cookies.set('cf_clearance', 'solved')
+                return super().get(url, **kwargs)
+
+        async def callback(base):
+            async with AsyncScraper(BlockingScraper(), per_host=2) as scraper:
+                first = await scraper.get(f'{base}/models/a/')
+                second = await scraper.get(f'{base}/models/b/')
+                return first, second
+
+        assert asyncio.run(serve(handler, callback)) == (b'ok', b'ok')
+        assert len(solved) == 1
+    # <-- End of test_solve_challenge()
+
+    def test_error_status(self):
+        async def handler(request):
+            return web.Response(status=404, body=b'<html>missing</html>')
+
+        async def callback(base):
+            async with AsyncScraper(requests.Session(), per_host=2) as scraper:
+                return await scraper.get(f'{base}/videos/missing/')
+
+        with pytest.raises(FetchError, match='status 404'):
+            asyncio.run(serve(handler, callback))
+    # <-- End of test_error_status()
+
+    def test_fetch_async_keeps_watermarks(self, tmp_path, monkeypatch):
+        monkeypatch.setattr('app.async_fetcher.AsyncScraper',
+                            lambda scraper, per_host: FixtureAsyncSession())
+        scraper = make_scraper(tmp_path, models={'model': self.model_url})
+
+        scraper.fetch(use_async=True)
+
+        # Only the first listing page was read, the next threaded crawl
+        # still reaches older pages
+        assert len(scraper.db.table('videos')) > 0
+        models = scraper.db.table('models').all()
+        assert [model.get('watermark') for model in models] == [None]
+        scraper.close()
+    # <-- End of test_fetch_async_keeps_watermarks()
+
+    def test_unsupported_options(self, tmp_path):
+        scraper = make_scraper(tmp_path)
+        for option in ('cache', 'offline', 'backfill', 'resume'):
+            with pytest.raises(ValueError, match=option):
+                scraper.fetch(use_async=True, **{option: True})
+        with pytest.raises(ValueError, match='rate'):
+            scraper.fetch(use_async=True, rate=1)
+        scraper.close()
+    # <-- End of test_unsupported_options()
+
+# <-- End of TestAsyncFetcher
@@ -0,0 +1,55 @@
+from app.schema import migrate_video
+from benchmarks import suite
+
+
+class TestBenchmarkSuite():
+
+    def test_make_videos(self):
+        videos = suite.make_videos(250)
+
+        assert len(videos) == 250
+        assert len({video['id'] for video in videos}) == 250
+        assert suite.model_names(videos) == ['model0', 'model1']
+        # Already the current schema
+        assert all(migrate_video(dict(video)) == video for video in videos)
+        assert suite.make_videos(250) == videos
+    # <-- End of test_make_videos()
+
+    def test_run_suite(self):
+        report = suite.run_suite(sizes=[200], repeat=1)
+
+        assert list(report['results']) == [
+            'parse_fixtures',
+            'db_insert_videos/tinydb/200',
+            'db_select_videos/tinydb/200',
+            'db_insert_videos/sqlite/200',
+            'db_select_videos/sqlite/200',
+            'format_weekly_email/200',
+        ]
+        for result in report['results'].values():
+            assert result['items'] > 0
+            assert result['per_second'] > 0
+            assert result['peak_mb'] >= 0
+
+        # Two models, two videos each
+        assert report['results']['format_weekly_email/200']['items'] == 4
+        assert suite.compare(report, report) == []
+    # <-- End of test_run_suite()
+
+    def test_compare(self):
+        baseline = {'results': {
+            'a': {'per_second': 100, 'peak_mb': 10},
+            'b': {'per_second': 100, 'peak_mb': 10},
+            'c': {'per_second': 100, 'peak_mb': 10},
+        }}
+        report = {'results': {
+            'a': {'per_second': 90, 'peak_mb': 11},  # within ratio
+            'b': {'per_second': 50, 'peak_mb': 30},
+            'd': {'per_second': 1, 'peak_mb': 99},  # not in baseline
+        }}
+
+        regressions = suite.compare(report, baseline)
+        assert len(regressions) == 2
+        assert all(line.startswith('b: ') for line in regressions)
+        assert suite.compare(report, baseline, ratio=4) == []
+    # <-- End of test_compare()
@@ -0,0 +1,136 @@
+import os
+import pytest
+
+from app.cache import CachedSession
+from app.fetcher import FetchError
+from tests.fake_scraper import make_scraper
+from tests.fake_session import FakeResponse, FixtureSession
+
+
+class RevalidatingSession():
+    """Stand-in server answering 304 when the ETag matches"""
+
+    def __init__(self) -> None:
+        self.requests = list()
+
+    def get(self, url: str, headers: dict = None, **kwargs) -> FakeResponse:
+        headers = headers or dict()
+        self.requests.append((url, headers))
+
+        if headers.get('If-None-Match') == 'etag-1':
+            return FakeResponse(b'', status_code=304)
+
+        response = FakeResponse(f'body of {url}'.encode())
+        response.headers['ETag'] = 'etag-1'
+        return response
+# <-- End of RevalidatingSession
+
+
+class TestCache():
+
+    video_url = 'https://jable.tv/videos/ssis-233/'
+    model_url = 'https://jable.tv/models/yua-mikami/'
+
+    def test_fresh_hit(self, tmp_path):
+        session = RevalidatingSession()
+        cache = CachedSession(session, str(tmp_path))
+
+        first = cache.get(self.video_url)
+        second = cache.get(self.video_url)
+
+        assert not first.from_cache and second.from_cache
+        assert first.content == second.content
+        assert len(session.requests) == 1
+    # <-- End of test_fresh_hit()
+
+    def test_revalidate(self, tmp_path):
+        session = RevalidatingSession()
+        cache = CachedSession(session, str(tmp_path), ttls={'/models/': 0})
+
+        cache.get(self.model_url)
+        response = cache.get(self.model_url)
+
+        assert response.from_cache
+        assert response.content == f'body of {self.model_url}'.encode()
+        assert len(session.requests) == 2
+        assert session.requests[1][1]['If-None-Match'] == 'etag-1'
+    # <-- End of test_revalidate()
+
+    def test_offline(self, tmp_path):
+        CachedSession(RevalidatingSession(), str(tmp_path), ttls={}) \
+            .get(self.model_url)
+
+        session = RevalidatingSession()
+        cache = CachedSession(session, str(tmp_path), offline=True)
+
+        assert cache.get(self.model_url).from_cache
+        with pytest.raises(FetchError, match='not cached'):
+            cache.get(self.video_url)
+        assert len(session.requests) == 0
+    # <-- End of test_offline()
+
+    def test_offline_fetch(self, tmp_path):
+        scraper = make_scraper(tmp_path, models={'cached': self.model_url})
+        scraper.fetch(cache=True)
+
+        # Pages of the second model were never cached, only it is skipped
+        scraper.db.table('videos').truncate()
+        scraper.models = {'cached': self.model_url,
+                          'missing': 'https://jable.tv/models/missing/'}
+        scraper.scraper = FixtureSession()
+        scraper.fetch(offline=True, backfill=True)
+
+        models = [doc['model'] for doc in scraper.db.table('models').all()]
+        assert models == ['cached']
+        assert len(scraper.db.table('videos')) == 5
+        assert scraper.scraper.requests == []
+        scraper.close()
+    # <-- End of test_offline_fetch()
+
+    def test_evict(self, tmp_path):
+        session = RevalidatingSession()
+        body_size = len(f'body of {self.video_url}0'.encode())
+        cache = CachedSession(session, str(tmp_path), max_size=body_size * 3)
+
+        for idx in range(5):
+            url = f'{self.video_url}{idx}'
+            cache.get(url)
+            # Make access times distinguishable
+            os.utime(cache._paths(url)[0], (idx, idx))
+
+        bodies = [name for name in os.listdir(tmp_path)
+                  if name.endswith('.body')]
+        assert len(bodies) == 3
+
+        # Oldest entries were evicted, newest is still served from disk
+        assert cache.get(f'{self.video_url}4').from_cache
+        assert not cache.get(f'{self.video_url}0').from_cache
+    # <-- End of test_evict()
+
+    def test_shared_directory(self, tmp_path, monkeypatch):
+        monkeypatch.setattr('app.cache.cache_resize_interval', 0)
+        body_size = len(f'body of {self.video_url}0'.encode())
+        first = CachedSession(RevalidatingSession(), str(tmp_path),
+                              max_size=body_size * 3, ttls={'/videos/': 0})
+        second = CachedSession(RevalidatingSession(), str(tmp_path),
+                               max_size=body_size * 3)
+
+        # Entries of the other session count towards the limit
+        for idx in range(3):
+            second.get(f'{self.video_url}{idx}')
+            os.utime(second._paths(f'{self.video_url}{idx}')[0], (idx, idx))
+        first.get(f'{self.video_url}3')
+        bodies = [name for name in os.listdir(tmp_path)
+                  if name.endswith('.body')]
+        assert len(bodies) == 3
+
+        # Evicted by the other session meanwhile, a miss and no error
+        url = f'{self.video_url}3'
+        os.remove(first._paths(url)[0])
+        assert first._load(url) == (None, None)
+        os.remove(first._paths(url)[1])
+        first._touch(url)
+        assert not first.get(url).from_cache
+    # <-- End of test_shared_directory()
+
+# <-- End of TestCache
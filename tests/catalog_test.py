@@ -0,0 +1,71 @@
+import sys
+from tinydb import TinyDB
+from tinydb.storages import MemoryStorage
+
+from app.catalog import Catalog, Video
+from app.database_helpers import db_select_videos
+
+
+def make_videos(count: int) -> list[dict]:
+    return [
+        {'id': f'ID-{idx}', 'name': f'video{idx}' * 10,
+            'model': ''.join(['model', str(idx % 3)]), 'image': 'image',
+            'link': f'link{idx}', 'views': idx, 'likes': 0,
+            'tags': [''.join(['tag', str(idx % 2)])], 'uploaded': idx % 2,
+            'subtitle': False}
+        for idx in range(count)
+    ]
+
+
+class TestCatalog():
+
+    def test_video(self):
+        doc = make_videos(1)[0]
+        video = Video(doc)
+
+        assert not hasattr(video, '__dict__')
+        assert video['link'] == 'link0'
+        assert video.tags == ('tag0',)
+        assert video.to_dict() == dict(doc, tags=('tag0',))
+        # Pages without details still make a video
+        assert Video({'id': 'x', 'name': 'x', 'model': 'm', 'link': 'l'}).tags \
+            == ()
+    # <-- End of test_video()
+
+    def test_interned(self):
+        catalog = Catalog(make_videos(12))
+        videos = list(catalog)
+
+        assert len(catalog) == 12
+        assert videos[0].model is videos[3].model
+        assert videos[0].model is sys.intern('model0')
+        assert videos[0].tags[0] is videos[2].tags[0]
+    # <-- End of test_interned()
+
+    def test_newest(self):
+        catalog = Catalog(make_videos(12))
+
+        # Ties on upload day keep database order
+        assert [v.id for v in catalog.newest('model0', 3)] == \
+            ['ID-3', 'ID-9', 'ID-0']
+        assert [v.id for v in catalog.newest('model1', 2)] == ['ID-1', 'ID-7']
+        assert catalog.newest('model3', 2) == []
+        assert catalog.newest('model0', 0) == []
+        assert catalog.random_video() in list(catalog)
+    # <-- End of test_newest()
+
+    def test_db_select_videos(self):
+        db = TinyDB(storage=MemoryStorage).table('videos')
+        db.insert_multiple(make_videos(12))
+        catalog = Catalog.from_table(db)
+
+        videos = db_select_videos(catalog, ['model1', 'model0'])
+        assert videos == db_select_videos(db, ['model1', 'model0'])
+        assert [video['id'] for video in videos] == \
+            ['ID-1', 'ID-7', 'ID-3', 'ID-9']
+        assert all(len(video['name']) == 30 for video in videos)
+        # Selection does not touch the catalog
+        assert len(catalog.newest('model1', 1)[0].name) == 60
+    # <-- End of test_db_select_videos()
+
+# <-- End of class TestCatalog
@@ -0,0 +1,113 @@
+import pytest
+
+from app.changes import ChangeFeed, new_videos, video_deltas
+from app.database_helpers import db_prune_runs, db_upsert_videos
+from app.db_session import DatabaseSession
+from tests.fake_scraper import make_scraper
+
+
+def make_video(idx: int, views: int, likes: int = 0) -> dict:
+    return {'id': f'id{idx}', 'name': f'video{idx}', 'model': 'model',
+            'link': f'link{idx}', 'image': 'image', 'views': views,
+            'likes': likes, 'tags': ['tag'], 'subtitle': False}
+
+
+def empty() -> dict:
+    return {'inserted': list(), 'updated': list()}
+
+
+class TestChanges():
+
+    @pytest.mark.parametrize('db_name', ['db.json', 'db.sqlite3'])
+    def test_upsert_records_changes(self, tmp_path, db_name):
+        db = DatabaseSession(str(tmp_path / db_name))
+        videos = db.table('videos')
+
+        changes = empty()
+        db_upsert_videos(videos, [make_video(0, 10), make_video(1, 20)],
+                         changes)
+        assert [video['id'] for video in changes['inserted']] == \
+            ['id0', 'id1']
+        assert changes['updated'] == []
+
+        changes = empty()
+        db_upsert_videos(videos, [make_video(0, 15, 2), make_video(1, 20),
+                                  make_video(2, 1)], changes)
+        assert changes['inserted'] == [make_video(2, 1)]
+        # Unchanged videos are left out
+        assert changes['updated'] == [{'id': 'id0', 'link': 'link0',
+                                       'model': 'model', 'views': 5,
+                                       'likes': 2}]
+        db.close()
+    # <-- End of test_upsert_records_changes()
+
+    @pytest.mark.parametrize('db_name', ['db.json', 'db.sqlite3'])
+    def test_cursor(self, tmp_path, db_name):
+        db = DatabaseSession(str(tmp_path / db_name))
+        feed = ChangeFeed(db)
+
+        first = feed.append({'inserted': [make_video(0, 10)], 'updated': []},
+                            started=100, finished=110)
+        second = feed.append({'inserted': [make_video(1, 5)], 'updated': [
+            {'id': 'id0', 'link': 'link0', 'model': 'model', 'views': 3,
+             'likes': 1}]}, started=200, finished=210)
+        assert second > first
+
+        runs = feed.read('weekly_email')
+        assert [run.doc_id for run in runs] == [first, second]
+        assert [video['id'] for video in new_videos(runs)] == ['id0', 'id1']
+        feed.checkpoint('weekly_email', runs)
+        assert feed.read('weekly_email') == []
+        feed.checkpoint('weekly_email', [])
+        assert feed.cursor('weekly_email') == second
+
+        third = feed.append({'inserted': [], 'updated': [
+            {'id': 'id0', 'link': 'link0', 'model': 'model', 'views': 4,
+             'likes': 0}]}, started=300, finished=310)
+        db.commit()
+
+        # Readers move on their own
+        assert [run.doc_id for run in feed.read('weekly_email')] == [third]
+        assert [run.doc_id for run in feed.read('report')] == \
+            [first, second, third]
+        assert video_deltas(feed.read('report')) == \
+            {('id0', 'link0'): {'model': 'model', 'views': 7, 'likes': 1}}
+
+        # A reader behind pruned runs skips to the oldest run left
+        feed.checkpoint('report', feed.since()[:1])
+        assert db_prune_runs(db, 250) == 2
+        assert [run.doc_id for run in feed.read('report')] == [third]
+        assert feed.since(third) == []
+        db.close()
+
+        # Cursors survive the session
+        db = DatabaseSession(str(tmp_path / db_name))
+        assert ChangeFeed(db).cursor('weekly_email') == second
+        # Run ids are not handed out again once every run is pruned
+        assert db_prune_runs(db, 1000) == 1
+        assert ChangeFeed(db).since() == []
+        assert ChangeFeed(db).append(empty(), started=400) > third
+        db.close()
+    # <-- End of test_cursor()
+
+    @pytest.mark.parametrize('db_backend', ['tinydb', 'sqlite'])
+    def test_fetch_appends_run(self, tmp_path, db_backend):
+        scraper = make_scraper(tmp_path, db_backend,
+                               {'model': 'https://jable.tv/models/model/'})
+
+        scraper.fetch(rate=1000)
+        runs = scraper.changes.read('report')
+        assert len(runs) == 1
+        assert len(new_videos(runs)) == len(scraper.db.table('videos'))
+        scraper.changes.checkpoint('report', runs)
+
+        # Same pages again, nothing new and nothing gained
+        scraper.fetch(rate=1000)
+        runs = scraper.changes.read('report')
+        assert len(runs) == 1
+        assert runs[0]['inserted'] == [] and runs[0]['updated'] == []
+        assert runs[0]['finished'] >= runs[0]['started']
+        scraper.close()
+    # <-- End of test_fetch_appends_run()
+
+# <-- End of class TestChanges
@@ -1,13 +1,28 @@
 import os
 from tinydb import TinyDB, Query
+from tinydb.storages import MemoryStorage
 
 from app.database_helpers import (
     db_insert_schedule,
     db_remove_schedule,
     db_insert_videos,
+    db_upsert_videos,
+    db_select_videos,
     db_insert_model,
+    db_known_videos,
     db_cleanup
 )
+from app.schema import to_epoch, from_epoch
+
+
+class CountingStorage(MemoryStorage):
+    """Memory storage counting full database writes"""
+    writes = 0
+
+    def write(self, data):
+        CountingStorage.writes += 1
+        super().write(data)
+# <-- End of CountingStorage
 
 
 class TestDatabaseHelpers():
@@ -81,6 +96,94 @@ class TestDatabaseHelpers():
         assert len(db) == 4
     # <-- End of test_db_insert_video()
 
+    def test_db_insert_video_incremental(self):
+        db = TinyDB(self.db_loc).table('videos')
+        db.truncate()
+
+        test = [
+            {'id': 1, 'name': 'video1', 'link': 'link1', 'views': 0,
+                'likes': 0, 'tags': ['tag1']},
+            {'id': 2, 'name': 'video2', 'link': 'link2', 'views': 0,
+                'likes': 0, 'tags': ['tag2']}
+        ]
+        assert db_insert_videos(db, test)
+        assert db_known_videos(db) == {(1, 'link1'), (2, 'link2')}
+
+        # Known videos only come with data of the model page
+        refresh = [
+            {'id': 1, 'name': 'video1', 'link': 'link1', 'views': 10,
+                'likes': 3},
+            {'id': 2, 'name': 'video2', 'link': 'link2', 'views': 20,
+                'likes': 4}
+        ]
+        assert not db_insert_videos(db, refresh)
+        assert len(db) == 2
+
+        video = db.get(Query()['id'] == 1)
+        assert video['views'] == 10 and video['likes'] == 3
+        assert video['tags'] == ['tag1']
+    # <-- End of test_db_insert_video_incremental()
+
+    def test_db_upsert_videos(self):
+        db = TinyDB(storage=CountingStorage).table('videos')
+
+        test = [
+            {'id': idx, 'name': f'video{idx}', 'link': f'link{idx}',
+                'views': 0, 'likes': 0}
+            for idx in range(100)
+        ]
+        CountingStorage.writes = 0
+        assert db_upsert_videos(db, test)
+        assert CountingStorage.writes == 1
+        assert len(db) == 100
+
+        # Views and likes refreshed, one new video, still a single write
+        refresh = [dict(video, views=1, likes=2) for video in test]
+        refresh.append({'id': 100, 'name': 'video100', 'link': 'link100',
+                        'views': 5, 'likes': 5})
+        CountingStorage.writes = 0
+        assert db_upsert_videos(db, refresh)
+        assert CountingStorage.writes == 1
+        assert len(db) == 101
+        assert all(doc['views'] == 1 for doc in db.all()[:100])
+
+        CountingStorage.writes = 0
+        assert not db_upsert_videos(db, refresh)
+        assert CountingStorage.writes == 1
+        assert not db_upsert_videos(db, [])
+        assert CountingStorage.writes == 1
+
+        # Document ids keep counting after the batch
+        assert db.insert({'id': 'x', 'link': 'x'}) == 102
+    # <-- End of test_db_upsert_videos()
+
+    def test_db_select_videos(self):
+        db = TinyDB(storage=MemoryStorage).table('videos')
+        dates = [to_epoch(date) for date in ['01/02/2022', '03/04/2021',
+                                             '01/02/2022', '12/31/2022',
+                                             '05/06/2020']]
+        db.insert_multiple([
+            {'id': idx, 'name': f'video{idx}' * 10, 'model': f'model{idx % 2}',
+                'link': f'link{idx}', 'views': 0,
+                'uploaded': dates[idx % len(dates)]}
+            for idx in range(10)
+        ])
+
+        videos = db_select_videos(db, ['model1', 'model0', 'model2'])
+        assert isinstance(videos, list)
+        # Ties on upload time keep database order
+        assert [video['id'] for video in videos] == [3, 5, 8, 0]
+        assert all(len(video['name']) == 30 for video in videos)
+        assert from_epoch(videos[0]['uploaded']).year == 2022
+
+        videos = db_select_videos(db, ['model0'], k=4)
+        assert [video['id'] for video in videos] == [8, 0, 2, 6]
+        assert db_select_videos(db, ['model0'], k=0) == []
+
+        # Selection does not touch saved videos
+        assert db.get(doc_id=1)['name'] == 'video0' * 10
+    # <-- End of test_db_select_videos()
+
     def test_db_insert_model(self):
         db = TinyDB(self.db_loc).table('models')
         db.truncate()
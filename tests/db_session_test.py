@@ -0,0 +1,92 @@
+import json
+import pytest
+from tinydb import TinyDB
+
+from app.database_helpers import db_insert_model, db_upsert_videos
+from app.db_session import AtomicJSONStorage, DatabaseSession
+
+
+class CountingStorage(AtomicJSONStorage):
+    """Atomic json storage counting file reads and writes"""
+    reads = 0
+    writes = 0
+
+    def read(self):
+        CountingStorage.reads += 1
+        return super().read()
+
+    def write(self, data):
+        CountingStorage.writes += 1
+        super().write(data)
+# <-- End of CountingStorage
+
+
+class TestDatabaseSession():
+
+    def test_deferred_writes(self, tmp_path):
+        db_path = str(tmp_path / 'db.json')
+
+        with DatabaseSession(db_path) as session:
+            models = session.table('models')
+            for idx in range(10):
+                db_insert_model(models, f'model{idx}', f'link{idx}')
+            db_upsert_videos(session.table('videos'), [
+                {'id': 1, 'link': 'link1', 'model': 'model1', 'views': 0}])
+
+            # Nothing written until commit
+            assert TinyDB(db_path).tables() == set()
+
+            session.commit()
+            assert len(TinyDB(db_path).table('models')) == 10
+
+            db_insert_model(models, 'model10', 'link10')
+
+        # Closing the session commits too
+        assert len(TinyDB(db_path).table('models')) == 11
+    # <-- End of test_deferred_writes()
+
+    def test_single_read_and_write(self, tmp_path, monkeypatch):
+        db_path = str(tmp_path / 'db.json')
+        monkeypatch.setattr(
+            'app.db_session.AtomicJSONStorage', CountingStorage)
+        CountingStorage.reads = CountingStorage.writes = 0
+
+        session = DatabaseSession(db_path)
+        for idx in range(10):
+            db_insert_model(session.table('models'), f'model{idx}', 'link')
+            assert len(session.table('videos').all()) == 0
+        session.close()
+
+        assert CountingStorage.reads == 1
+        assert CountingStorage.writes == 1
+    # <-- End of test_single_read_and_write()
+
+    def test_crash_safe_flush(self, tmp_path):
+        db_path = str(tmp_path / 'db.json')
+
+        with DatabaseSession(db_path) as session:
+            db_insert_model(session.table('models'), 'model1', 'link1')
+
+        session = DatabaseSession(db_path)
+        db_insert_model(session.table('models'), 'model2', object())
+
+        # Serializing fails halfway, the database file stays intact
+        with pytest.raises(TypeError):
+            session.commit()
+
+        with open(db_path, 'r') as file:
+            assert len(json.load(file)['models']) == 1
+    # <-- End of test_crash_safe_flush()
+
+    def test_sqlite_session(self, tmp_path):
+        db_path = str(tmp_path / 'db.sqlite3')
+
+        with DatabaseSession(db_path) as session:
+            with session.transaction():
+                db_insert_model(session.table('models'), 'model1', 'link1')
+
+        with DatabaseSession(db_path) as session:
+            assert len(session.table('models')) == 1
+    # <-- End of test_sqlite_session()
+
+# <-- End of TestDatabaseSession
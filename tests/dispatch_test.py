@@ -0,0 +1,110 @@
+import time
+import pytest
+
+from app.database_helpers import (
+    db_enqueue_emails,
+    db_pending_emails,
+    db_email_status
+)
+from app.db_session import DatabaseSession
+from app.dispatch import Dispatcher, RateLimiter, parse_recipients
+from app.mailer import Mailer
+from tests.fake_smtp import FakeSMTPServer
+
+
+def make_mailer(server: FakeSMTPServer) -> Mailer:
+    return Mailer('me@example.com', 'password', '127.0.0.1', server.port,
+                  starttls=False, timeout=5)
+
+
+def make_bodies(count: int) -> dict[str, str]:
+    return {f'user{idx}@example.com': f'<p>body {idx % 2}</p>'
+            for idx in range(count)}
+
+
+class TestDispatch():
+
+    def test_parse_recipients(self):
+        assert parse_recipients('a@x.com, b@x.com;c@x.com  a@x.com') == \
+            ['a@x.com', 'b@x.com', 'c@x.com']
+        assert parse_recipients("['a@x.com', 'b@x.com']") == \
+            ['a@x.com', 'b@x.com']
+        assert parse_recipients(None) == []
+    # <-- End of test_parse_recipients()
+
+    def test_rate_limiter(self):
+        limiter = RateLimiter(50)
+        begin = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        assert time.monotonic() - begin >= 0.09
+    # <-- End of test_rate_limiter()
+
+    @pytest.mark.parametrize('db_name', ['db.json', 'db.sqlite3'])
+    def test_enqueue(self, tmp_path, db_name):
+        with DatabaseSession(str(tmp_path / db_name)) as db:
+            assert db_enqueue_emails(db, make_bodies(10), 'subject') == 10
+            # Shared bodies are saved once
+            assert len(db.table('email_bodies')) == 2
+            assert len(db_pending_emails(db)) == 10
+            assert db_email_status(db) == \
+                {'pending': 10, 'sent': 0, 'failed': 0}
+    # <-- End of test_enqueue()
+
+    @pytest.mark.parametrize('db_name', ['db.json', 'db.sqlite3'])
+    def test_dispatch(self, tmp_path, db_name):
+        with FakeSMTPServer(refused=('user3@',)) as server, \
+                DatabaseSession(str(tmp_path / db_name)) as db:
+            db_enqueue_emails(db, make_bodies(20), 'subject')
+
+            with make_mailer(server) as mailer:
+                status = Dispatcher(db, mailer, workers=4, rate=0).run()
+
+            assert status == {'pending': 0, 'sent': 19, 'failed': 1}
+            assert sorted(message['To'] for message in server.messages) == \
+                sorted(f'user{idx}@example.com' for idx in range(20)
+                       if idx != 3)
+            failed = db.table('outbox').get(doc_id=4)
+            assert failed['recipient'] == 'user3@example.com'
+            assert failed['attempts'] == 1 and '550' in failed['error']
+    # <-- End of test_dispatch()
+
+    def test_retry_and_resume(self, tmp_path):
+        db_path = str(tmp_path / 'db.json')
+
+        # Nothing listens on the port, every attempt fails
+        with FakeSMTPServer() as server:
+            port = server.port
+        with DatabaseSession(db_path) as db:
+            db_enqueue_emails(db, make_bodies(3), 'subject')
+            mailer = Mailer('me@example.com', 'password', '127.0.0.1', port,
+                            starttls=False, timeout=1)
+            dispatcher = Dispatcher(db, mailer, rate=0, max_attempts=3,
+                                    backoff=0.01)
+
+            # One pass, emails waiting for a retry are left to the next one
+            status = dispatcher.run()
+            assert status == {'pending': 3, 'sent': 0, 'failed': 0}
+            assert all(email['attempts'] == 1
+                       for email in db.table('outbox').all())
+            while status['pending'] > 0:
+                time.sleep(0.02)
+                status = dispatcher.run()
+
+            assert status == {'pending': 0, 'sent': 0, 'failed': 3}
+            assert all(email['attempts'] == 3
+                       for email in db.table('outbox').all())
+
+        # A crashed run left pending emails behind, the next run sends them
+        with DatabaseSession(db_path) as db:
+            db.table('outbox').update({'status': 'pending'}, doc_ids=[1, 2])
+
+        with FakeSMTPServer() as server, DatabaseSession(db_path) as db:
+            with make_mailer(server) as mailer:
+                status = Dispatcher(db, mailer, rate=0).run()
+
+            assert status == {'pending': 0, 'sent': 2, 'failed': 1}
+            assert len(server.messages) == 2
+    # <-- End of test_retry_and_resume()
+
+# <-- End of class TestDispatch
@@ -0,0 +1,32 @@
+import os
+
+from app.constants import db_files
+from app.db_session import DatabaseSession
+from app.scraper import Scraper
+from tests.fake_session import FixtureSession
+
+
+def make_scraper(data_path, db_backend: str = 'tinydb', models: dict = None,
+                 session=None) -> Scraper:
+    """Scraper over a data directory of its own, fetching saved fixtures
+    instead of the network"""
+    os.makedirs(data_path, exist_ok=True)
+    scraper = Scraper(db_backend, str(data_path))
+    if models is not None:
+        scraper.models = dict(models)
+    scraper.scraper = FixtureSession() if session is None else session
+    return scraper
+# <-- End of make_scraper()
+
+
+def dump(data_path, db_backend: str = 'tinydb') -> tuple[list, list]:
+    """Videos and models saved in the database of a data directory, sorted
+    so fetches of the same pages compare equal"""
+    db = DatabaseSession(os.path.join(data_path, db_files[db_backend]))
+    videos = sorted((doc['model'], doc['link'], doc['views'])
+                    for doc in db.table('videos').all())
+    saved = sorted((doc['model'], doc['avatar'], doc.get('watermark'))
+                   for doc in db.table('models').all())
+    db.close()
+    return videos, saved
+# <-- End of dump()
@@ -0,0 +1,56 @@
+import os
+import threading
+
+fixtures_path = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+class FakeResponse():
+    def __init__(self, content: bytes, status_code: int = 200) -> None:
+        self.content = content
+        self.status_code = status_code
+        self.headers = dict()
+# <-- End of FakeResponse
+
+
+class FixtureSession():
+    """Offline stand-in for CloudScraper serving saved html fixtures"""
+
+    def __init__(self, delay: float = 0, statuses: list = None) -> None:
+        self.delay = delay
+        # Statuses answered before serving fixtures, e.g. [429, 503]
+        self.statuses = list(statuses or [])
+        self.requests = list()
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def get(self, url: str, **kwargs) -> FakeResponse:
+        with self._lock:
+            self.requests.append(url)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+        try:
+            if self.delay:
+                threading.Event().wait(self.delay)
+
+            with self._lock:
+                status = self.statuses.pop(0) if self.statuses else 200
+            if status != 200:
+                return FakeResponse(b'<html>error</html>', status)
+
+            if '/videos/' in url:
+                slug = url.rstrip('/').split('/')[-1]
+                name = f'video_{slug}.html'
+            elif 'from=' in url:
+                page = url.split('from=')[-1].split('&')[0]
+                name = f'model_page_{page}.html'
+            else:
+                name = 'model_page.html'
+
+            with open(os.path.join(fixtures_path, name), 'rb') as file:
+                return FakeResponse(file.read())
+        finally:
+            with self._lock:
+                self.active -= 1
+# <-- End of FixtureSession
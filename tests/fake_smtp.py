@@ -0,0 +1,93 @@
+import threading
+import socketserver
+from email import message_from_bytes
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """One smtp session, just enough of the protocol for smtplib"""
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self) -> None:
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        sent = 0
+
+        self.reply('220 localhost ESMTP stand-in')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command.split(' ')[0].upper()
+
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250-localhost')
+                self.reply('250 AUTH PLAIN')
+            elif verb == 'AUTH':
+                with server.lock:
+                    server.logins += 1
+                self.reply('235 Authentication successful')
+            elif verb == 'MAIL':
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                if any(bad in command for bad in server.refused):
+                    self.reply('550 No such user')
+                else:
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = b''
+                while True:
+                    chunk = self.rfile.readline()
+                    if chunk in (b'.\r\n', b''):
+                        break
+                    data += chunk
+                with server.lock:
+                    server.messages.append(message_from_bytes(data))
+                self.reply('250 OK queued')
+
+                sent += 1
+                if server.drop_after and sent >= server.drop_after:
+                    # Server hangs up without saying goodbye
+                    return
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+# <-- End of SMTPHandler
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """Local stand-in smtp server recording every received email"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, drop_after: int = 0, refused: tuple = ()) -> None:
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.drop_after = drop_after
+        self.refused = refused
+        self.lock = threading.Lock()
+        self.messages = list()
+        self.connections = 0
+        self.logins = 0
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def __enter__(self) -> 'FakeSMTPServer':
+        threading.Thread(target=self.serve_forever, args=(0.05,),
+                         daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+        self.server_close()
+# <-- End of FakeSMTPServer
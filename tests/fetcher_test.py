@@ -0,0 +1,256 @@
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from bs4 import BeautifulSoup
+
+from app.fetcher import (
+    AdaptiveSession,
+    FetchError,
+    HostController,
+)
+from app.helpers import crawl_model, get_page_count, get_videos
+from tests.fake_scraper import make_scraper
+from tests.fake_session import FakeResponse, FixtureSession
+
+
+class TestFetcher():
+
+    model_url = 'https://jable.tv/models/yua-mikami/'
+
+    def test_per_host_limit(self):
+        session = FixtureSession(delay=0.05)
+        adaptive = AdaptiveSession(session, per_host=2, rate=1000)
+
+        urls = [self.model_url] * 8
+        with ThreadPoolExecutor(8) as executor:
+            responses = list(executor.map(adaptive.get, urls))
+
+        assert len(responses) == 8
+        assert all(r.status_code == 200 for r in responses)
+        assert session.max_active == 2
+    # <-- End of test_per_host_limit()
+
+    def test_get_videos_concurrent(self):
+        session = FixtureSession()
+        page = BeautifulSoup(session.get(self.model_url).content, 'lxml')
+        expected = get_videos(session, page, model='三上悠亞')
+
+        adaptive = AdaptiveSession(FixtureSession(delay=0.01), per_host=2,
+                                   rate=1000)
+        with ThreadPoolExecutor(4) as executor:
+            videos = get_videos(adaptive, page, model='三上悠亞',
+                                executor=executor)
+
+        assert len(videos) == 3
+        assert videos == expected
+        assert [video['id'] for video in videos] == \
+            ['SSIS-233', 'SSIS-204', 'SSIS-177']
+    # <-- End of test_get_videos_concurrent()
+
+    def test_get_videos_incremental(self):
+        session = FixtureSession()
+        page = BeautifulSoup(session.get(self.model_url).content, 'lxml')
+        known = {('SSIS-233', 'https://jable.tv/videos/ssis-233/'),
+                 ('SSIS-177', 'https://jable.tv/videos/ssis-177/')}
+
+        session = FixtureSession()
+        videos = get_videos(session, page, model='三上悠亞', known=known)
+
+        assert session.requests == ['https://jable.tv/videos/ssis-204/']
+        assert [video['id'] for video in videos] == \
+            ['SSIS-233', 'SSIS-204', 'SSIS-177']
+        assert 'tags' not in videos[0] and 'tags' not in videos[2]
+        assert videos[0]['views'] == 1234567 and videos[0]['likes'] == 4321
+        assert videos[1]['tags'] == ['巨乳', '出軌']
+    # <-- End of test_get_videos_incremental()
+
+    def test_get_page_count(self):
+        session = FixtureSession()
+        page = BeautifulSoup(session.get(self.model_url).content, 'lxml')
+        assert get_page_count(page) == 2
+
+        page = BeautifulSoup(
+            session.get(self.model_url + '?from=2').content, 'lxml')
+        assert get_page_count(page) == 1
+
+        page = BeautifulSoup(
+            session.get('https://jable.tv/videos/ssis-233/').content, 'lxml')
+        assert get_page_count(page) == 1
+    # <-- End of test_get_page_count()
+
+    def test_crawl_model_watermark(self):
+        page = FixtureSession().get(self.model_url).content
+
+        # Watermark on the first page, no more listing pages are fetched
+        session = FixtureSession()
+        videos = crawl_model(session, page, self.model_url, '三上悠亞',
+                             watermark='https://jable.tv/videos/ssis-204/')
+        assert len(videos) == 3
+        assert not any('from=' in url for url in session.requests)
+
+        # Watermark on the second page
+        session = FixtureSession()
+        videos = crawl_model(session, page, self.model_url, '三上悠亞',
+                             watermark='https://jable.tv/videos/ssis-120/')
+        assert [video['id'] for video in videos] == \
+            ['SSIS-233', 'SSIS-204', 'SSIS-177', 'SSIS-150', 'SSIS-120']
+        assert sum('from=2' in url for url in session.requests) == 1
+        assert videos[3]['tags'] == ['中文字幕', '學生']
+    # <-- End of test_crawl_model_watermark()
+
+    def test_crawl_model_backfill(self):
+        session = FixtureSession()
+        page = session.get(self.model_url).content
+        expected = crawl_model(session, page, self.model_url, '三上悠亞')
+        assert len(expected) == 5
+
+        session = FixtureSession(delay=0.01)
+        with ThreadPoolExecutor(4) as executor:
+            videos = crawl_model(session, page, self.model_url, '三上悠亞',
+                                 watermark='https://jable.tv/videos/ssis-233/',
+                                 backfill=True, executor=executor)
+
+        assert videos == expected
+    # <-- End of test_crawl_model_backfill()
+
+    def test_host_controller_aimd(self):
+        controller = HostController(4, rate=10, step=1, decrease=0.5,
+                                    failures=3, cooldown=0.2)
+
+        controller.acquire()
+        controller.release('throttled')
+        assert controller.concurrency == 2 and controller.rate == 5
+        controller.acquire()
+        controller.release('ok')
+        # Additive increase, half a slot at a concurrency of 2
+        assert controller.concurrency == 2.5 and controller.rate == 6
+
+        # Failures in a row open the breaker, the host is then probed by
+        # one request at a time
+        for _ in range(3):
+            controller.acquire()
+            controller.release('failed')
+        assert controller.concurrency == 1
+        begin = time.monotonic()
+        controller.acquire()
+        assert time.monotonic() - begin >= 0.15
+        controller.release('ok')
+        assert controller.trips == 0 and controller.failures == 0
+    # <-- End of test_host_controller_aimd()
+
+    def test_adaptive_session_retries(self):
+        session = FixtureSession(statuses=[429, 503, 522])
+        adaptive = AdaptiveSession(session, rate=1000, retries=3, backoff=0)
+
+        response = adaptive.get(self.model_url)
+        assert response.status_code == 200
+        assert len(session.requests) == 4
+        controller = adaptive.controller(self.model_url)
+        # Cut twice by throttling, then grown back by one response
+        assert controller.rate < 1000 / 4 + 1
+
+        # Other error statuses are answers of a healthy host, not retried
+        session = FixtureSession(statuses=[404])
+        adaptive = AdaptiveSession(session, rate=1000, backoff=0)
+        with pytest.raises(FetchError, match='status 404'):
+            adaptive.get(self.model_url)
+        assert len(session.requests) == 1
+        assert adaptive.controller(self.model_url).failures == 0
+
+        session = FixtureSession(statuses=[503] * 10)
+        adaptive = AdaptiveSession(session, rate=1000, retries=2, backoff=0)
+        with pytest.raises(FetchError, match='status 503'):
+            adaptive.get(self.model_url)
+        assert len(session.requests) == 3
+    # <-- End of test_adaptive_session_retries()
+
+    def test_adaptive_session_cloudflare(self):
+        class Cloudflare():
+            def __init__(self):
+                self.requests = list()
+
+            def get(self, url, **kwargs):
+                self.requests.append(url)
+                response = FakeResponse(b'<html>denied</html>', 403)
+                response.headers['Server'] = 'cloudflare'
+                return response
+
+        session = Cloudflare()
+        adaptive = AdaptiveSession(session, rate=1000, retries=2, backoff=0)
+        with pytest.raises(FetchError, match='status 403'):
+            adaptive.get(self.model_url)
+        # Retried, and the host slowed down like a throttled one
+        assert len(session.requests) == 3
+        assert adaptive.controller(self.model_url).rate < 1000
+    # <-- End of test_adaptive_session_cloudflare()
+
+    def test_adaptive_session_retry_after(self):
+        class Throttled():
+            def __init__(self):
+                self.times = list()
+
+            def get(self, url, **kwargs):
+                self.times.append(time.monotonic())
+                if len(self.times) == 1:
+                    response = FakeResponse(b'', 429)
+                    response.headers['Retry-After'] = '0.2'
+                    return response
+                return FakeResponse(b'ok')
+
+        session = Throttled()
+        adaptive = AdaptiveSession(session, rate=1000, backoff=0)
+        assert adaptive.get(self.model_url).content == b'ok'
+        assert session.times[1] - session.times[0] >= 0.19
+    # <-- End of test_adaptive_session_retry_after()
+
+    def test_fetch_skips_failing_model(self, tmp_path, monkeypatch):
+        # Retry right away
+        monkeypatch.setattr('app.fetcher.random.uniform', lambda a, b: 0)
+
+        class Blocked(FixtureSession):
+            def get(self, url, **kwargs):
+                if 'blocked' in url:
+                    self.requests.append(url)
+                    return FakeResponse(b'<html>error</html>', 503)
+                return super().get(url, **kwargs)
+
+        # Another host, its breaker leaves jable.tv alone
+        scraper = make_scraper(tmp_path, models={
+            'blocked': 'https://blocked.tv/models/blocked/',
+            'model': self.model_url}, session=Blocked())
+
+        scraper.fetch(rate=1000)
+        models = [doc['model'] for doc in scraper.db.table('models').all()]
+        videos = scraper.db.table('videos').all()
+        scraper.db.close()
+
+        assert models == ['model']
+        assert len(videos) == 5
+        assert scraper.scraper.requests.count(
+            'https://blocked.tv/models/blocked/') == 5
+    # <-- End of test_fetch_skips_failing_model()
+
+    def test_fetch_skips_forbidden_video(self, tmp_path):
+        class Forbidden(FixtureSession):
+            def get(self, url, **kwargs):
+                if url.endswith('/ssis-204/'):
+                    self.requests.append(url)
+                    return FakeResponse(b'<html>forbidden</html>', 403)
+                return super().get(url, **kwargs)
+
+        scraper = make_scraper(tmp_path, models={'model': self.model_url},
+                               session=Forbidden())
+
+        # The error page never reaches the parsers, only the model whose
+        # page is missing is skipped
+        scraper.fetch(workers=2, rate=1000)
+        models = scraper.db.table('models').all()
+        videos = scraper.db.table('videos').all()
+        scraper.db.close()
+
+        assert models == [] and videos == []
+        assert scraper.scraper.requests.count(
+            'https://jable.tv/videos/ssis-204/') == 1
+    # <-- End of test_fetch_skips_forbidden_video()
+
+# <-- End of TestFetcher
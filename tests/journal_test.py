@@ -0,0 +1,81 @@
+import os
+import pytest
+
+from app.journal import Journal
+from tests.fake_scraper import dump, make_scraper
+from tests.fake_session import FixtureSession
+
+models = {f'model{idx}': f'https://jable.tv/models/model{idx}/'
+          for idx in range(4)}
+
+
+class CrashingSession(FixtureSession):
+    """Fixture session dying on the page of one model"""
+
+    def __init__(self, crash: str) -> None:
+        super().__init__()
+        self.crash = crash
+
+    def get(self, url: str, **kwargs):
+        if self.crash in url:
+            raise RuntimeError('Process killed')
+        return super().get(url, **kwargs)
+# <-- End of CrashingSession
+
+
+class TestJournal():
+
+    def test_record_and_replay(self, tmp_path):
+        journal = Journal(str(tmp_path / 'journal' / 'fetch.jsonl'))
+        results = [('avatar0', [{'id': '1', 'name': '日本'}]), None,
+                   ('avatar2', [])]
+
+        assert journal.replay(models) == {}
+        assert list(journal.record(models, iter(results))) == results
+
+        # Failed models are fetched again, models no longer watched dropped
+        done = journal.replay({'model0': '', 'model1': '', 'model3': ''})
+        assert done == {'model0': ('avatar0', [{'id': '1', 'name': '日本'}])}
+
+        # A record torn by a crash is cut off before the next append
+        with open(journal.path, 'a') as file:
+            file.write('{"model": "model3", "ur')
+        assert list(journal.replay(models)) == ['model0', 'model2']
+        list(journal.record({'model3': ''}, [('avatar3', [])]))
+        assert list(journal.replay(models)) == ['model0', 'model2', 'model3']
+
+        # A stale journal is not resumed
+        os.utime(journal.path, (0, 0))
+        assert journal.replay(models) == {}
+        assert not os.path.exists(journal.path)
+        journal.truncate()
+    # <-- End of test_record_and_replay()
+
+    @pytest.mark.parametrize('db_backend', ['tinydb', 'sqlite'])
+    def test_resume_after_crash(self, tmp_path, db_backend):
+        plain = make_scraper(tmp_path / 'plain', db_backend, models)
+        plain.fetch(rate=1000)
+        plain.close()
+
+        crashed = make_scraper(tmp_path, db_backend, models,
+                               CrashingSession('model2'))
+        with pytest.raises(RuntimeError):
+            crashed.fetch(rate=1000, resume=True)
+        # The process died, nothing was committed
+        assert dump(tmp_path, db_backend) == ([], [])
+
+        resumed = make_scraper(tmp_path, db_backend, models)
+        resumed.fetch(rate=1000, resume=True)
+        resumed.close()
+
+        # Only unfinished models were fetched again
+        model_pages = [url for url in resumed.scraper.requests
+                       if url.rstrip('/') in
+                       [link.rstrip('/') for link in models.values()]]
+        assert sorted(model_pages) == [models['model2'], models['model3']]
+        assert dump(tmp_path, db_backend) == \
+            dump(tmp_path / 'plain', db_backend)
+        assert not (tmp_path / 'fetch_journal.jsonl').exists()
+    # <-- End of test_resume_after_crash()
+
+# <-- End of class TestJournal
@@ -0,0 +1,79 @@
+import smtplib
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+from app.mailer import Mailer, make_message
+from tests.fake_smtp import FakeSMTPServer
+
+
+def make_mailer(server: FakeSMTPServer, **kwargs) -> Mailer:
+    return Mailer('me@example.com', 'password', '127.0.0.1', server.port,
+                  starttls=False, timeout=5, **kwargs)
+
+
+def make_messages(count: int) -> list:
+    return [
+        make_message('me@example.com', [f'user{idx}@example.com'],
+                     f'<p>email {idx}</p>', 'subject')
+        for idx in range(count)
+    ]
+
+
+class TestMailer():
+
+    def test_reuse_connection(self):
+        with FakeSMTPServer() as server:
+            with make_mailer(server) as mailer:
+                assert mailer.send_many(make_messages(20)) == 20
+
+            assert server.connections == 1
+            assert server.logins == 1
+            assert len(server.messages) == 20
+            assert server.messages[3]['To'] == 'user3@example.com'
+            assert 'email 3' in server.messages[3].get_payload(decode=True) \
+                .decode()
+    # <-- End of test_reuse_connection()
+
+    def test_renew_connection(self):
+        with FakeSMTPServer() as server:
+            with make_mailer(server, max_messages=5) as mailer:
+                mailer.send_many(make_messages(12))
+
+            assert server.connections == 3
+            assert len(server.messages) == 12
+    # <-- End of test_renew_connection()
+
+    def test_reconnect_on_drop(self):
+        with FakeSMTPServer(drop_after=3) as server:
+            with make_mailer(server) as mailer:
+                assert mailer.send_many(make_messages(10)) == 10
+
+            assert server.connections == 4
+            assert len(server.messages) == 10
+    # <-- End of test_reconnect_on_drop()
+
+    def test_refused_recipient(self):
+        with FakeSMTPServer(refused=('user1@',)) as server:
+            with make_mailer(server) as mailer:
+                messages = make_messages(3)
+                mailer.send(messages[0])
+                with pytest.raises(smtplib.SMTPRecipientsRefused):
+                    mailer.send(messages[1])
+                mailer.send(messages[2])
+
+            # Refusal does not cost the connection
+            assert server.connections == 1
+            assert len(server.messages) == 2
+    # <-- End of test_refused_recipient()
+
+    def test_pool(self):
+        with FakeSMTPServer() as server:
+            with make_mailer(server, pool_size=3) as mailer:
+                with ThreadPoolExecutor(6) as executor:
+                    list(executor.map(mailer.send, make_messages(30)))
+
+            assert server.connections <= 3
+            assert len(server.messages) == 30
+    # <-- End of test_pool()
+
+# <-- End of class TestMailer
@@ -0,0 +1,134 @@
+import json
+import time
+import threading
+import pytest
+
+from app.database_helpers import db_upsert_videos
+from app.db_session import DatabaseSession
+from app.metrics import Metrics, metrics
+from tests.fake_scraper import make_scraper
+
+
+class TestMetrics():
+
+    def test_timings_and_counters(self):
+        registry = Metrics()
+
+        with registry.timer('fetch'):
+            pass
+        with pytest.raises(ValueError):
+            with registry.timer('fetch'):
+                raise ValueError()
+
+        @registry.timed('db', op='select')
+        def select(x):
+            return x * 2
+        assert select(21) == 42
+        assert select.__name__ == 'select'
+
+        def count():
+            for _ in range(1000):
+                registry.add('http_requests', status=200)
+        threads = [threading.Thread(target=count) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        registry.add('http_bytes', 512)
+
+        assert registry.counter('http_requests', status=200) == 4000
+        assert registry.counter('http_requests', status=404) == 0
+
+        report = registry.report('fetch')
+        assert report['job'] == 'fetch'
+        stages = {stage['stage']: stage for stage in report['stages']}
+        assert stages['fetch']['count'] == 2
+        assert stages['db']['labels'] == {'op': 'select'}
+        assert stages['db']['max_seconds'] <= stages['db']['seconds']
+        assert {'name': 'http_bytes', 'labels': {}, 'value': 512} in \
+            report['counters']
+
+        registry.reset()
+        assert registry.report()['stages'] == []
+    # <-- End of test_timings_and_counters()
+
+    @pytest.mark.parametrize('db_name', ['db.json', 'db.sqlite3'])
+    def test_timer_exclude(self, tmp_path, db_name):
+        def fetched():
+            for idx in range(5):
+                # Network time of the fetch feeding the upsert
+                time.sleep(0.02)
+                yield {'id': f'id{idx}', 'link': f'link{idx}', 'views': 0,
+                       'model': 'model'}
+
+        metrics.reset()
+        with DatabaseSession(str(tmp_path / db_name)) as db:
+            assert db_upsert_videos(db.table('videos'), fetched())
+            assert len(db.table('videos')) == 5
+
+        stages = {(stage['stage'], stage['labels'].get('op')): stage
+                  for stage in metrics.report()['stages']}
+        assert stages[('db', 'upsert_videos')]['seconds'] < 0.05
+    # <-- End of test_timer_exclude()
+
+    def test_prometheus(self):
+        registry = Metrics()
+        registry.observe('fetch', 1.5)
+        registry.observe('db', 0.25, op='upsert_videos')
+        registry.add('http_requests', 3, status=200)
+        registry.add('http_requests', status=503)
+
+        lines = registry.to_prometheus('fetch').splitlines()
+        assert 'jable_stage_seconds_sum{job="fetch",stage="fetch"} 1.5' in lines
+        assert 'jable_stage_seconds_count{job="fetch",stage="db",' \
+            'op="upsert_videos"} 1' in lines
+        assert 'jable_stage_seconds_max{job="fetch",stage="fetch"} 1.5' in lines
+        assert 'jable_http_requests_total{job="fetch",status="200"} 3' in lines
+        assert 'jable_http_requests_total{job="fetch",status="503"} 1' in lines
+        # One type line per family
+        assert lines.count('# TYPE jable_http_requests_total counter') == 1
+        assert lines[-1].startswith(
+            'jable_last_run_timestamp_seconds{job="fetch"} ')
+    # <-- End of test_prometheus()
+
+    def test_export(self, tmp_path):
+        registry = Metrics()
+        registry.add('videos_fetched', 7)
+
+        report_path, textfile_path = registry.export(
+            'fetch', str(tmp_path / 'reports'), str(tmp_path / 'textfiles'))
+
+        with open(report_path, 'r') as file:
+            assert json.load(file)['counters'][0]['value'] == 7
+        with open(textfile_path, 'r') as file:
+            assert 'jable_videos_fetched_total{job="fetch"} 7' in file.read()
+        assert textfile_path.endswith('jable_fetch.prom')
+        assert [path.name for path in tmp_path.glob('*/*.tmp')] == []
+    # <-- End of test_export()
+
+    def test_fetch_is_instrumented(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('metrics_textfile_dir', str(tmp_path / 'prom'))
+        scraper = make_scraper(tmp_path, models={
+            'model': 'https://jable.tv/models/model/'})
+
+        metrics.reset()
+        scraper.fetch(rate=1000)
+        report = metrics.report('fetch')
+        scraper.db.close()
+
+        stages = {stage['stage'] for stage in report['stages']}
+        assert {'fetch', 'http_request', 'parse_html', 'crawl_model',
+                'save_fetch', 'db'} <= stages
+        requests = len(scraper.scraper.requests)
+        assert metrics.counter('http_requests', status=200) == requests
+        assert metrics.counter('http_bytes') > 0
+        videos = metrics.counter('videos_fetched')
+        assert videos > 0
+        assert metrics.counter('db_rows_written', op='insert_videos') == videos
+
+        scraper.export_metrics('fetch')
+        assert (tmp_path / 'metrics' / 'fetch.json').exists()
+        assert (tmp_path / 'prom' / 'jable_fetch.prom').exists()
+    # <-- End of test_fetch_is_instrumented()
+
+# <-- End of class TestMetrics
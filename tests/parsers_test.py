@@ -0,0 +1,71 @@
+import os
+from bs4 import BeautifulSoup
+
+from app import parsers
+from app.helpers import (
+    fetch_model_avatar,
+    get_date,
+    get_page_count,
+    get_tags,
+    parse_video_cards
+)
+from app.schema import to_epoch
+from tests.fake_session import fixtures_path
+
+
+def read_fixtures(prefix: str) -> list[bytes]:
+    """Read every saved html fixture whose name starts with prefix"""
+    pages = list()
+    for name in sorted(os.listdir(fixtures_path)):
+        if name.startswith(prefix):
+            with open(os.path.join(fixtures_path, name), 'rb') as file:
+                pages.append(file.read())
+    return pages
+
+
+class TestParsers():
+
+    def test_model_page_parity(self):
+        pages = read_fixtures('model_page')
+        assert len(pages) == 2
+
+        for page in pages:
+            soup = BeautifulSoup(page, 'lxml')
+            tree = parsers.parse_html(page)
+
+            assert parsers.parse_cards(tree, 'model') == \
+                parse_video_cards(soup, 'model')
+            assert parsers.parse_cards(tree, 'model', limit=1) == \
+                parse_video_cards(soup, 'model', limit=1)
+            assert parsers.parse_page_count(tree) == get_page_count(soup)
+            assert parsers.parse_avatar(tree) == fetch_model_avatar(soup)
+    # <-- End of test_model_page_parity()
+
+    def test_avatar_parity(self):
+        pages = [
+            b'<html><body><img class="avatar" src="src.jpg"></body></html>',
+            b'<html><body><img class="avatar" data-cfsrc="cf.jpg"></body></html>',
+            b'<html><body><img class="avatar"></body></html>',
+            b'<html><body><img class="cover" src="src.jpg"></body></html>',
+        ]
+
+        for page in pages:
+            assert parsers.parse_avatar(parsers.parse_html(page)) == \
+                fetch_model_avatar(BeautifulSoup(page, 'lxml'))
+    # <-- End of test_avatar_parity()
+
+    def test_video_page_parity(self):
+        pages = read_fixtures('video_')
+        assert len(pages) == 5
+
+        for page in pages:
+            soup = BeautifulSoup(page, 'lxml')
+            tree = parsers.parse_html(page)
+
+            assert parsers.parse_tags(tree) == get_tags(soup)
+            assert parsers.parse_date(tree) == get_date(soup)
+            assert parsers.parse_video_details(page) == \
+                (get_tags(soup), to_epoch(get_date(soup)))
+    # <-- End of test_video_page_parity()
+
+# <-- End of TestParsers
@@ -0,0 +1,114 @@
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+from app.constants import db_files
+from app.pipeline import Pipeline, bounded_map
+from app.database_helpers import (
+    db_insert_model,
+    db_model_watermarks,
+    db_update_watermark,
+    db_upsert_videos,
+)
+from app.db_session import DatabaseSession
+from tests.fake_scraper import make_scraper
+
+
+def make_videos(model: str, count: int) -> list[dict]:
+    return [
+        {'id': f'{model}-{idx}', 'name': f'video{idx}', 'model': model,
+            'link': f'link-{model}-{idx}', 'views': idx, 'likes': 0}
+        for idx in range(count)
+    ]
+
+
+class TestPipeline():
+
+    def test_bounded_map(self):
+        running = list()
+        lock = threading.Lock()
+
+        def square(x):
+            with lock:
+                running.append(x)
+            return x * x
+
+        with ThreadPoolExecutor(4) as executor:
+            results = bounded_map(executor, square, range(100), 3)
+            assert next(results) == 0
+            # Nothing runs ahead of the window
+            assert len(running) <= 3
+            assert list(results) == [x * x for x in range(1, 100)]
+    # <-- End of test_bounded_map()
+
+    def test_stages(self):
+        pipeline = Pipeline()
+        pipeline.add_filter(lambda video: video['views'] % 2 == 0)
+        pipeline.add_enricher(lambda video: dict(video, checked=True))
+
+        videos = pipeline.run(make_videos('model1', 6))
+        assert not isinstance(videos, list)
+        videos = list(videos)
+        assert [video['views'] for video in videos] == [0, 2, 4]
+        assert all(video['checked'] for video in videos)
+        assert list(Pipeline().run(make_videos('model1', 2))) == \
+            make_videos('model1', 2)
+    # <-- End of test_stages()
+
+    def test_save_fetch(self, tmp_path, monkeypatch):
+        scraper = make_scraper(tmp_path,
+                               models={'model1': 'url1', 'model2': 'url2'})
+        scraper.pipeline = Pipeline().add_filter(
+            lambda video: video['views'] < 8)
+
+        writes = list()
+        videos_db = scraper.db.table('videos')
+        update_table = videos_db._update_table
+        monkeypatch.setattr(
+            videos_db, '_update_table',
+            lambda updater: writes.append(1) or update_table(updater))
+
+        results = iter([('avatar1', make_videos('model1', 10)),
+                        ('avatar2', make_videos('model2', 3))])
+        scraper._save_fetch(results)
+
+        # 8 + 3 videos pass the filter, the table is written once per fetch
+        assert writes == [1]
+        assert len(videos_db) == 11
+        models = scraper.db.table('models').all()
+        assert [model['watermark'] for model in models] == \
+            ['link-model1-0', 'link-model2-0']
+        scraper.close()
+    # <-- End of test_save_fetch()
+
+    @pytest.mark.parametrize('db_backend', ['tinydb', 'sqlite'])
+    def test_save_fetch_crash(self, tmp_path, db_backend):
+        db_path = str(tmp_path / db_files[db_backend])
+        with DatabaseSession(db_path) as db:
+            db_insert_model(db.table('models'), 'model1', 'url1', 'old')
+            db_update_watermark(db.table('models'), 'model1', 'link-model1-0')
+            db_upsert_videos(db.table('videos'), make_videos('model1', 1))
+
+        scraper = make_scraper(tmp_path, db_backend,
+                               {'model1': 'url1', 'model2': 'url2'})
+
+        def results():
+            yield ('new', [dict(video, views=100)
+                           for video in make_videos('model1', 3)[::-1]])
+            raise RuntimeError('crash on model2')
+
+        with pytest.raises(RuntimeError):
+            scraper._save_fetch(results())
+        # Closing flushes whatever the crashed fetch left in the session
+        scraper.close()
+
+        # Nothing of model1 moved ahead of its videos
+        with DatabaseSession(db_path) as db:
+            assert db_model_watermarks(db.table('models')) == \
+                {'model1': 'link-model1-0'}
+            assert db.table('models').all()[0]['avatar'] == 'old'
+            videos = db.table('videos').all()
+            assert [video['views'] for video in videos] == [0]
+    # <-- End of test_save_fetch_crash()
+
+# <-- End of class TestPipeline
@@ -0,0 +1,123 @@
+import pytest
+
+from app.database_helpers import (
+    db_enqueue_emails,
+    db_expired_videos,
+    db_insert_videos,
+    db_select_videos,
+    db_update_email,
+)
+from app.db_session import DatabaseSession
+from app.retention import apply_retention, archive_videos, read_archive
+
+day = 86400
+now = 1700000000
+
+
+def make_videos(model: str, ages: list[int]) -> list[dict]:
+    """Videos of a model uploaded given days ago, in order of ages"""
+    return [
+        {'id': f'{model}{idx}', 'name': f'video{idx}', 'model': model,
+            'link': f'{model}/link{idx}', 'image': 'image', 'views': age,
+            'likes': 0, 'tags': ['tag'], 'uploaded': now - age * day,
+            'subtitle': False}
+        for idx, age in enumerate(ages)
+    ]
+
+
+def fill(db: DatabaseSession) -> None:
+    db_insert_videos(db.table('videos'),
+                     make_videos('a', [50, 40, 30, 20, 10, 10])
+                     + make_videos('b', [900, 5])
+                     + make_videos('gone', [1]))
+    db.commit()
+
+
+class TestRetention():
+
+    @pytest.mark.parametrize('db_name', ['db.json', 'db.sqlite3'])
+    def test_expired_videos(self, tmp_path, db_name):
+        db = DatabaseSession(str(tmp_path / db_name))
+        fill(db)
+        videos = db.table('videos')
+
+        def expired(**kwargs):
+            return [doc['id'] for doc in db_expired_videos(
+                videos, ['a', 'b'], **kwargs)]
+
+        assert expired() == ['gone0']
+        assert expired(per_model=3) == ['a0', 'a1', 'a2', 'gone0']
+        assert expired(before=now - 100 * day) == ['b0', 'gone0']
+        # Ties keep database order, the first saved one stays
+        assert expired(per_model=1, before=now - 100 * day) == \
+            ['a0', 'a1', 'a2', 'a3', 'a5', 'b0', 'gone0']
+        db.close()
+    # <-- End of test_expired_videos()
+
+    def test_archive(self, tmp_path):
+        videos = make_videos('a', [1, 2]) + make_videos('日本', [3])
+
+        assert archive_videos([], str(tmp_path)) is None
+        first = archive_videos(videos, str(tmp_path / 'archive'))
+        second = archive_videos(videos[:1], str(tmp_path / 'archive'))
+
+        assert first != second
+        assert first.endswith('.jsonl.gz')
+        assert list(read_archive(first)) == videos
+        assert list(read_archive(second)) == videos[:1]
+        assert not list((tmp_path / 'archive').glob('*.tmp'))
+    # <-- End of test_archive()
+
+    @pytest.mark.parametrize('db_name', ['db.json', 'db.sqlite3'])
+    def test_apply_retention(self, tmp_path, db_name):
+        db = DatabaseSession(str(tmp_path / db_name))
+        fill(db)
+        newest = db_select_videos(db.table('videos'), ['a', 'b'])
+
+        db_enqueue_emails(db, {'x@x.com': 'old', 'y@y.com': 'new'})
+        db_update_email(db, 1, {'status': 'sent', 'sent_at': now - 60 * day})
+        db_update_email(db, 2, {'status': 'sent', 'sent_at': now - day})
+        db.commit()
+
+        report = apply_retention(db, ['a', 'b'], str(tmp_path / 'archive'),
+                                 per_model=2, max_age=365 * day,
+                                 outbox_age=30 * day, now=now)
+
+        assert report['archived'] == 6
+        assert report['emails_pruned'] == 1
+        assert [video['id'] for video in read_archive(report['archive'])] == \
+            ['a0', 'a1', 'a2', 'a3', 'b0', 'gone0']
+        assert [video['id'] for video in db.table('videos').all()] == \
+            ['a4', 'a5', 'b1']
+        # Newest videos of a model within the cap are kept
+        assert db_select_videos(db.table('videos'), ['a']) == newest[:2]
+        assert [doc['recipient'] for doc in db.table('outbox').all()] == \
+            ['y@y.com']
+        assert [doc['body'] for doc in db.table('email_bodies').all()] == \
+            ['new']
+
+        # Nothing left to expire
+        report = apply_retention(db, ['a', 'b'], str(tmp_path / 'archive'),
+                                 per_model=2, now=now)
+        assert report['archived'] == 0 and report['archive'] is None
+        db.close()
+
+        db = DatabaseSession(str(tmp_path / db_name))
+        assert len(db.table('videos')) == 3
+        db.close()
+    # <-- End of test_apply_retention()
+
+    def test_compact_sqlite(self, tmp_path):
+        db = DatabaseSession(str(tmp_path / 'db.sqlite3'))
+        db_insert_videos(db.table('videos'),
+                         make_videos('a', list(range(1, 3001))))
+
+        report = apply_retention(db, ['a'], str(tmp_path / 'archive'),
+                                 per_model=10, now=now)
+        db.close()
+
+        assert report['archived'] == 2990
+        assert report['size_after'] < report['size_before'] / 4
+    # <-- End of test_compact_sqlite()
+
+# <-- End of class TestRetention
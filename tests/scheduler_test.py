@@ -0,0 +1,168 @@
+import os
+import datetime
+
+from app.constants import fetch_options
+from app.database_helpers import db_insert_schedule
+from app.db_session import DatabaseSession
+from app.metrics import metrics
+from app.scheduler import Scheduler, next_fire, parse_dow
+
+
+class FakeScraper():
+    """Scraper stand-in recording jobs instead of running them"""
+
+    def __init__(self, db_path: str) -> None:
+        self._db_path = db_path
+        self.db = DatabaseSession(db_path)
+        self.calls = list()
+        self.reloads = 0
+        self.exports = list()
+
+    def fetch(self, **kwargs) -> None:
+        self.calls.append(('fetch', None))
+        self.fetch_options = kwargs
+
+    def send_daily_email(self, recipients=None) -> None:
+        self.calls.append(('daily', recipients))
+
+    def send_weekly_email(self, recipients=None) -> None:
+        self.calls.append(('weekly', recipients))
+
+    def apply_retention(self) -> None:
+        self.calls.append(('retention', None))
+
+    def dispatch_emails(self) -> None:
+        self.calls.append(('dispatch', None))
+
+    def export_metrics(self, job: str) -> None:
+        self.exports.append((job, metrics.counter('job_failures')))
+
+    def reload(self) -> None:
+        self.reloads += 1
+        self.db.close()
+        self.db = DatabaseSession(self._db_path)
+# <-- End of FakeScraper
+
+
+def touch(path: str) -> None:
+    """Move modification time forward, as a later write would"""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+class TestScheduler():
+
+    def test_parse_dow(self):
+        assert parse_dow(None) == frozenset(range(7))
+        assert parse_dow(['MON', 'sun']) == {0, 6}
+        # Cron numbers, 0 and 7 are sunday
+        assert parse_dow([0, '1', 7]) == {6, 0}
+    # <-- End of test_parse_dow()
+
+    def test_next_fire(self):
+        # 2022-08-03 is a wednesday
+        now = datetime.datetime(2022, 8, 3, 12, 0)
+        every_day = parse_dow(None)
+
+        assert next_fire(30, 12, every_day, now) == \
+            datetime.datetime(2022, 8, 3, 12, 30)
+        assert next_fire(0, 12, every_day, now) == \
+            datetime.datetime(2022, 8, 4, 12, 0)
+        assert next_fire(0, 0, parse_dow(['SUN']), now) == \
+            datetime.datetime(2022, 8, 7, 0, 0)
+        assert next_fire(0, 13, parse_dow(['WED']), now) == \
+            datetime.datetime(2022, 8, 3, 13, 0)
+        assert next_fire(0, 11, parse_dow(['WED']), now) == \
+            datetime.datetime(2022, 8, 10, 11, 0)
+        # Every hour
+        assert next_fire(30, None, every_day, now) == \
+            datetime.datetime(2022, 8, 3, 12, 30)
+        assert next_fire(0, None, every_day, now) == \
+            datetime.datetime(2022, 8, 3, 13, 0)
+        assert next_fire(0, None, parse_dow(['SUN']), now) == \
+            datetime.datetime(2022, 8, 7, 0, 0)
+    # <-- End of test_next_fire()
+
+    def test_run_pending(self, tmp_path):
+        db_path = str(tmp_path / 'db.json')
+        scraper = FakeScraper(db_path)
+        db_insert_schedule(scraper.db.table('schedules'), 'a@x.com', 15, 8,
+                           ['WED'], 'daily')
+        scraper.db.commit()
+
+        scheduler = Scheduler(scraper)
+        # Wednesday morning
+        now = datetime.datetime(2022, 8, 3, 8, 0)
+        assert scheduler.reload(now)
+        assert len(scheduler.jobs) == 6
+        assert scheduler.next_run() == datetime.datetime(2022, 8, 3, 8, 15)
+
+        assert scheduler.run_pending(now) == []
+        assert scheduler.run_pending(now.replace(minute=15)) == \
+            ['daily schedule 1']
+        assert scheduler.run_pending(now.replace(hour=23, minute=30)) == \
+            ['dispatch', 'fetch']
+        # Built-in daily email at midnight, weekly one on sunday only
+        assert scheduler.run_pending(datetime.datetime(2022, 8, 4, 0, 0)) == \
+            ['dispatch', 'daily']
+        assert scraper.calls == [('daily', ['a@x.com']), ('dispatch', None),
+                                 ('fetch', None), ('dispatch', None),
+                                 ('daily', None)]
+        assert scheduler.next_run() == datetime.datetime(2022, 8, 4, 0, 45)
+        # Same options as fetch_runner, a crashed fetch is resumed
+        assert scraper.fetch_options == fetch_options
+        assert scraper.fetch_options['resume']
+        assert scraper.exports == [('daily_schedule_1', 0), ('dispatch', 0),
+                                   ('fetch', 0), ('dispatch', 0),
+                                   ('daily', 0)]
+        scraper.db.close()
+    # <-- End of test_run_pending()
+
+    def test_hot_reload(self, tmp_path):
+        db_path = str(tmp_path / 'db.json')
+        scraper = FakeScraper(db_path)
+        scraper.db.table('schedules').truncate()
+        scraper.db.commit()
+
+        scheduler = Scheduler(scraper)
+        assert scheduler.reload()
+        assert len(scheduler.jobs) == 5
+        assert not scheduler.reload()
+
+        # Another process subscribes an email
+        with DatabaseSession(db_path) as other:
+            db_insert_schedule(other.table('schedules'), 'b@x.com', 0, 9,
+                               None)
+        touch(db_path)
+
+        assert scheduler.reload()
+        assert scraper.reloads == 1
+        assert [job.name for job in scheduler.jobs][-1] == 'weekly schedule 1'
+
+        # Writes that leave schedules alone keep the jobs
+        with DatabaseSession(db_path) as other:
+            other.table('models').insert({'model': 'm', 'link': 'l'})
+        touch(db_path)
+        assert not scheduler.reload()
+        assert scraper.reloads == 2
+        scraper.db.close()
+    # <-- End of test_hot_reload()
+
+    def test_failed_job(self, tmp_path):
+        scraper = FakeScraper(str(tmp_path / 'db.json'))
+
+        def fail(**kwargs):
+            raise RuntimeError('network down')
+        scraper.fetch = fail
+
+        scheduler = Scheduler(scraper)
+        now = datetime.datetime(2022, 8, 3, 22, 0)
+        scheduler.reload(now)
+        assert scheduler.run_pending(now.replace(hour=23)) == \
+            ['dispatch', 'fetch']
+        assert scheduler.next_run() == datetime.datetime(2022, 8, 3, 23, 45)
+        assert scraper.exports == [('dispatch', 0), ('fetch', 1)]
+        scraper.db.close()
+    # <-- End of test_failed_job()
+
+# <-- End of class TestScheduler
@@ -0,0 +1,91 @@
+import json
+from tinydb import TinyDB
+
+from app.database_helpers import (
+    open_db,
+    db_migrate,
+    db_schema_version,
+    db_select_videos
+)
+from app.db_session import DatabaseSession
+from app.schema import SCHEMA_VERSION, migrate_video, to_epoch, from_epoch
+
+
+def make_v1_videos(count: int) -> list[dict]:
+    return [
+        {'model': 'model1', 'id': f'ID-{idx}', 'name': f'影片{idx}',
+            'image': 'image', 'link': f'link{idx}', 'views': idx, 'likes': 0,
+            'tags': ['中文字幕'] if idx % 2 else ['tag'],
+            'upload time': f'01/{idx + 1:02d}/2022',
+            **({'subtitile': True} if idx % 2 else {'subtitle': False})}
+        for idx in range(count)
+    ]
+
+
+class TestSchema():
+
+    def test_epoch(self):
+        assert to_epoch('01/02/2022') == 1641081600
+        assert from_epoch(to_epoch('12/31/2022')).strftime('%m/%d/%Y') == \
+            '12/31/2022'
+    # <-- End of test_epoch()
+
+    def test_migrate_video(self):
+        old, new = make_v1_videos(2)
+
+        assert migrate_video(old) == {
+            'id': 'ID-0', 'name': '影片0', 'model': 'model1', 'image': 'image',
+            'link': 'link0', 'views': 0, 'likes': 0, 'tags': ['tag'],
+            'uploaded': 1640995200, 'subtitle': False}
+        assert migrate_video(new)['subtitle'] is True
+        assert 'subtitile' not in migrate_video(new)
+        # Migrating twice changes nothing
+        assert migrate_video(migrate_video(new)) == migrate_video(new)
+    # <-- End of test_migrate_video()
+
+    def test_db_migrate(self, tmp_path):
+        db_path = str(tmp_path / 'db.json')
+        db = TinyDB(db_path)
+        db.table('videos').insert_multiple(make_v1_videos(10))
+        db.close()
+        size = (tmp_path / 'db.json').stat().st_size
+
+        with DatabaseSession(db_path) as session:
+            assert db_schema_version(session) == 1
+            assert db_migrate(session) == 10
+            assert db_schema_version(session) == SCHEMA_VERSION
+            assert db_migrate(session) == 0
+
+            videos = db_select_videos(session.table('videos'), ['model1'])
+            assert [video['id'] for video in videos] == ['ID-9', 'ID-8']
+
+        with open(db_path, encoding='utf-8') as file:
+            saved = json.load(file)
+        assert all('uploaded' in video and 'upload time' not in video
+                   for video in saved['videos'].values())
+        assert (tmp_path / 'db.json').stat().st_size < size
+    # <-- End of test_db_migrate()
+
+    def test_db_migrate_sqlite(self, tmp_path):
+        db = TinyDB(str(tmp_path / 'db.json'))
+        db.table('videos').insert_multiple(make_v1_videos(10))
+        db.close()
+
+        # A new SQLite database is copied from the json file, then migrated
+        db = open_db(str(tmp_path / 'db.sqlite3'))
+        assert db_migrate(db) == 10
+        assert db_schema_version(db) == SCHEMA_VERSION
+
+        videos = db_select_videos(db.table('videos'), ['model1'], k=3)
+        assert [video['id'] for video in videos] == ['ID-9', 'ID-8', 'ID-7']
+        assert videos[0]['subtitle'] is True
+    # <-- End of test_db_migrate_sqlite()
+
+    def test_db_migrate_new_database(self, tmp_path):
+        db = open_db(str(tmp_path / 'db.json'))
+
+        assert db_migrate(db) == 0
+        assert db_schema_version(db) == SCHEMA_VERSION
+    # <-- End of test_db_migrate_new_database()
+
+# <-- End of class TestSchema
@@ -0,0 +1,90 @@
+import pytest
+
+from app.shards import shard_models, shard_path, read_shard
+from tests.fake_scraper import dump, make_scraper
+from tests.fake_session import FixtureSession
+
+models = {f'model{idx}': f'https://jable.tv/models/model{idx}/'
+          for idx in range(6)}
+
+
+class TestShards():
+
+    def test_shard_models(self):
+        shards = [shard_models(models, idx, 3) for idx in range(3)]
+
+        # Every model in exactly one shard, in models order
+        assert sorted(model for shard in shards for model in shard) == \
+            sorted(models)
+        assert sum(len(shard) for shard in shards) == len(models)
+        for shard in shards:
+            assert list(shard) == [model for model in models if model in shard]
+        # Stable whatever the order of models
+        reverse = dict(reversed(list(models.items())))
+        assert set(shard_models(reverse, 1, 3)) == set(shards[1])
+        assert shard_models(models, 0, 1) == models
+
+        with pytest.raises(ValueError):
+            shard_models(models, 3, 3)
+    # <-- End of test_shard_models()
+
+    @pytest.mark.parametrize('db_backend', ['tinydb', 'sqlite'])
+    def test_merge_equals_fetch(self, tmp_path, db_backend):
+        plain = make_scraper(tmp_path / 'plain', db_backend, models)
+        plain.fetch(rate=1000)
+        plain.close()
+
+        sharded = make_scraper(tmp_path, db_backend, models)
+        shard_dir = str(tmp_path / 'shards')
+        for idx in range(3):
+            path = sharded.fetch_shard(idx, 3, shard_dir, rate=1000)
+            assert path == shard_path(shard_dir, idx, 3)
+        # Shards do not write database
+        assert len(sharded.db.table('videos')) == 0
+
+        assert sharded.merge_shards(3, shard_dir) == len(models)
+        sharded.close()
+
+        assert dump(tmp_path, db_backend) == \
+            dump(tmp_path / 'plain', db_backend)
+        assert list((tmp_path / 'shards').iterdir()) == []
+    # <-- End of test_merge_equals_fetch()
+
+    def test_merge_needs_every_shard(self, tmp_path, monkeypatch):
+        monkeypatch.setattr('app.fetcher.random.uniform', lambda a, b: 0)
+        scraper = make_scraper(tmp_path, models=models)
+        # Every attempt at the first model fails, on a host of its own so
+        # its open breaker does not hold the others
+        first = next(iter(shard_models(models, 0, 2)))
+        scraper.models[first] = f'https://blocked.tv/models/{first}/'
+        scraper.scraper = FixtureSession(statuses=[500] * 5)
+        shard_dir = str(tmp_path / 'shards')
+        path = scraper.fetch_shard(0, 2, shard_dir, rate=1000)
+
+        # Failed models are kept in the shard and skipped by the merge
+        records = list(read_shard(path))
+        assert records[0].get('failed') is True
+        assert all('videos' in record for record in records[1:])
+
+        with pytest.raises(FileNotFoundError):
+            scraper.merge_shards(2, shard_dir)
+        assert (tmp_path / 'shards' / 'shard-0-of-2.jsonl').exists()
+        scraper.close()
+    # <-- End of test_merge_needs_every_shard()
+
+    def test_fetch_sharded(self, tmp_path):
+        scraper = make_scraper(tmp_path, models=models)
+
+        assert scraper.fetch_sharded(2, FixtureSession, rate=1000) == \
+            len(models)
+        scraper.close()
+
+        videos, saved = dump(tmp_path)
+        assert len(videos) > 0
+        assert [model[0] for model in saved] == sorted(models)
+        # Every process exports its own run report
+        assert (tmp_path / 'metrics' / 'fetch_shard_0.json').exists()
+        assert (tmp_path / 'metrics' / 'fetch_shard_1.json').exists()
+    # <-- End of test_fetch_sharded()
+
+# <-- End of class TestShards
@@ -0,0 +1,168 @@
+import os
+from tinydb import TinyDB
+
+from app.database_helpers import (
+    open_db,
+    db_transaction,
+    db_insert_model,
+    db_update_model,
+    db_remove_model,
+    db_known_videos,
+    db_upsert_videos,
+    db_cleanup,
+    db_select_videos,
+    db_insert_schedule,
+    db_remove_schedule,
+    db_find_schedule
+)
+from app.sqlite_storage import SQLiteDB, SQLiteTable
+
+
+def make_videos(count: int, model: str = 'model1') -> list[dict]:
+    return [
+        {'id': f'ID-{idx}', 'name': f'video{idx}', 'model': model,
+            'link': f'link{idx}', 'image': 'image', 'views': idx, 'likes': 0,
+            'tags': ['tag'], 'uploaded': 1641000000 + idx % 28 * 86400}
+        for idx in range(count)
+    ]
+
+
+class TestSQLiteStorage():
+
+    def test_models(self, tmp_path):
+        db = open_db(str(tmp_path / 'db.sqlite3')).table('models')
+
+        assert db_insert_model(db, 'model1', 'link1')
+        assert db_insert_model(db, 'model2', 'link2', 'avatar2')
+        assert not db_insert_model(db, 'model1', 'link1')
+        assert len(db) == 2
+
+        assert db_update_model(db, 'model1', 'avatar1')
+        assert not db_update_model(db, 'model1', 'avatar1')
+        assert db.find(model='model1')[0]['avatar'] == 'avatar1'
+
+        assert db_remove_model(db, 'model2')
+        assert not db_remove_model(db, 'model2')
+        assert len(db) == 1
+    # <-- End of test_models()
+
+    def test_videos(self, tmp_path):
+        db = open_db(str(tmp_path / 'db.sqlite3')).table('videos')
+        videos = make_videos(10)
+
+        assert db_upsert_videos(db, videos)
+        assert not db_upsert_videos(db, videos)
+        assert len(db) == 10
+        assert len(db_known_videos(db)) == 10
+
+        refresh = [dict(video, views=100) for video in videos[:3]]
+        assert not db_upsert_videos(db, refresh)
+        assert db.find(id='ID-1', link='link1')[0]['views'] == 100
+
+        other = [dict(video, link=f'other{idx}', model='model2')
+                 for idx, video in enumerate(videos[:4])]
+        assert db_upsert_videos(db, other)
+
+        selected = db_select_videos(db, ['model1', 'model2'])
+        assert len(selected) == 4
+        assert [video['id'] for video in selected] == \
+            ['ID-9', 'ID-8', 'ID-3', 'ID-2']
+
+        db_cleanup(db, {'model1': ''})
+        assert len(db) == 10
+        db_cleanup(db, {})
+        assert len(db) == 0
+    # <-- End of test_videos()
+
+    def test_indexes(self, tmp_path):
+        db = open_db(str(tmp_path / 'db.sqlite3'))
+        db.table('videos')
+        db.table('models')
+
+        plans = {
+            'SELECT doc FROM videos WHERE id = 1 AND link = 1':
+                'videos_id_link',
+            'SELECT doc FROM videos WHERE model = 1 ORDER BY upload_time':
+                'videos_model_upload_time',
+            'SELECT doc FROM models WHERE model = 1': 'models_model',
+        }
+        for sql, index in plans.items():
+            plan = db.conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+            assert any(index in row[-1] for row in plan)
+    # <-- End of test_indexes()
+
+    def test_transaction(self, tmp_path):
+        db = open_db(str(tmp_path / 'db.sqlite3'))
+        videos = db.table('videos')
+
+        try:
+            with db_transaction(db):
+                db_upsert_videos(videos, make_videos(3))
+                raise RuntimeError('fetch failed')
+        except RuntimeError:
+            pass
+
+        assert len(videos) == 0
+    # <-- End of test_transaction()
+
+    def test_schedules(self, tmp_path):
+        db = open_db(str(tmp_path / 'db.sqlite3')).table('schedules')
+
+        db_insert_schedule(db, 'email1', 0, 0, ['MON'])
+        db_insert_schedule(db, 'email2', 0, 0, ['MON'])
+        db_insert_schedule(db, 'email3', 30, 8, ['SUN'])
+        assert len(db) == 2
+        assert db_find_schedule(db, 0, 0, ['MON'])['emails'] == \
+            ['email1', 'email2']
+
+        db_remove_schedule(db, 'email1')
+        db_remove_schedule(db, 'email3')
+        assert len(db) == 1
+        assert db_find_schedule(db, 30, 8, ['SUN']) is None
+    # <-- End of test_schedules()
+
+    def test_migrate(self, tmp_path):
+        source = TinyDB(str(tmp_path / 'db.json'))
+        source.table('models').insert(
+            {'model': 'model1', 'link': 'link1', 'avatar': 'avatar1'})
+        source.table('videos').insert_multiple(make_videos(20))
+        source.table('videos').remove(doc_ids=[1, 2])
+        source.close()
+
+        db = open_db(str(tmp_path / 'db.sqlite3'))
+        assert isinstance(db, SQLiteDB)
+
+        videos = TinyDB(str(tmp_path / 'db.json')).table('videos').all()
+        assert db.table('videos').all() == videos
+        assert [doc.doc_id for doc in db.table('videos').all()] == \
+            [doc.doc_id for doc in videos]
+        assert db.table('models').find(model='model1')[0]['avatar'] == \
+            'avatar1'
+
+        # Migration only runs for a new database
+        db.table('videos').truncate()
+        db.close()
+        assert len(open_db(str(tmp_path / 'db.sqlite3')).table('videos')) == 0
+        assert os.path.exists(str(tmp_path / 'db.json'))
+    # <-- End of test_migrate()
+
+    def test_migrate_retried(self, tmp_path, monkeypatch):
+        source = TinyDB(str(tmp_path / 'db.json'))
+        source.table('videos').insert_multiple(make_videos(5))
+        source.close()
+
+        def fail(self, doc):
+            raise RuntimeError('disk full')
+        with monkeypatch.context() as patch:
+            patch.setattr(SQLiteTable, '_row', fail)
+            try:
+                open_db(str(tmp_path / 'db.sqlite3'))
+            except RuntimeError:
+                pass
+        assert os.path.exists(str(tmp_path / 'db.sqlite3'))
+
+        # The failed copy left an empty file, the next open copies again
+        assert len(open_db(str(tmp_path / 'db.sqlite3')).table('videos')) == 5
+    # <-- End of test_migrate_retried()
+
+# <-- End of TestSQLiteStorage
@@ -0,0 +1,95 @@
+import os
+import shutil
+
+from app.scraper import Scraper
+from app.templates import Template, TemplateEngine, get_engine
+from tests.fake_scraper import make_scraper
+
+data_path = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def make_email_scraper(tmp_path) -> Scraper:
+    """Scraper rendering the email templates of the project from a few
+    saved videos, no network"""
+    for name in os.listdir(data_path):
+        if name.endswith('.html'):
+            shutil.copy(os.path.join(data_path, name), tmp_path)
+
+    scraper = make_scraper(tmp_path,
+                           models={'model0': 'url0', 'model1': 'url1'})
+    scraper.db.table('videos').insert_multiple([
+        {'id': f'ID-{idx}', 'name': f'video{idx}', 'model': f'model{idx % 2}',
+            'image': f'image{idx}', 'link': f'link{idx}', 'views': 1000 * idx,
+            'likes': idx, 'tags': ['tag'], 'uploaded': idx, 'subtitle': False}
+        for idx in range(6)
+    ])
+    return scraper
+# <-- End of make_email_scraper()
+
+
+class TestTemplates():
+
+    def test_field_template(self):
+        source = '<p style="a: b;">{{x}} {name} has {views:,} views</p>'
+        context = {'name': 'video', 'views': 1234567}
+
+        assert Template(source).render(**context) == source.format(**context)
+    # <-- End of test_field_template()
+
+    def test_block_template(self):
+        source = '<style>p { color: red; }</style>{% content %}<p>{%  end %}'
+        template = Template(source, blocks=True)
+
+        assert template.render(content='hi', end='!') == \
+            '<style>p { color: red; }</style>hi<p>!'
+    # <-- End of test_block_template()
+
+    def test_engine_cache(self, tmp_path):
+        path = tmp_path / 'email.html'
+        path.write_text('{name}')
+        engine = TemplateEngine(str(tmp_path))
+
+        template = engine.get('email.html')
+        assert engine.get('email.html') is template
+        assert template.render(name='a') == 'a'
+
+        # Edited templates are compiled again
+        path.write_text('<b>{name}</b>')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        assert engine.get('email.html').render(name='a') == '<b>a</b>'
+
+        assert get_engine(str(tmp_path)) is get_engine(str(tmp_path) + '/')
+    # <-- End of test_engine_cache()
+
+    def test_weekly_email(self, tmp_path):
+        scraper = make_email_scraper(tmp_path)
+        body = scraper.format_weekly_email()
+
+        assert '{% content %}' not in body
+        assert body.count('{% headline %}') == 0
+        assert 'link5' in body and 'link3' in body and 'link1' not in body
+        assert '5,000 views' in body
+        scraper.close()
+    # <-- End of test_weekly_email()
+
+    def test_render_many(self, tmp_path, monkeypatch):
+        scraper = make_email_scraper(tmp_path)
+        weekly = scraper.weekly_context()
+        calls = list()
+        render = scraper.format_weekly_email
+        monkeypatch.setattr(scraper, 'format_weekly_email',
+                            lambda context: calls.append(context) or
+                            render(context))
+
+        recipients = [f'user{idx}@example.com' for idx in range(5)]
+        bodies = scraper.render_many(recipients, [weekly] * 5)
+
+        assert list(bodies) == recipients
+        assert len(set(bodies.values())) == 1
+        # Shared context is rendered once
+        assert len(calls) == 1
+        scraper.close()
+    # <-- End of test_render_many()
+
+# <-- End of class TestTemplates
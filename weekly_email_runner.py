@@ -2,4 +2,8 @@ from app.scraper import Scraper
 
 if __name__ == "__main__":
     s = Scraper()
-    s.send_weekly_email()
+    try:
+        s.send_weekly_email()
+    finally:
+        s.export_metrics("weekly")
+        s.close()